@@ -0,0 +1,95 @@
+"""
+比较 get_file_metadata 原来的线性查找, 逐次查询数据库和界面使用的 FileIndex 的查找耗时;
+FileIndex 和界面加载历史时一样, 先从数据库载入每个路径最早的元数据, 再加入最近一页分组
+
+    python benchmarks/bench_file_index.py [--groups 10000] [--files 5]
+"""
+import os
+import sys
+import random
+import shutil
+import argparse
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins.prompt_manager_core import FileIndex, HistoryStore, PromptGroup
+
+# 与 PromptManagerWidget.HISTORY_PAGE_SIZE 一致
+PAGE_SIZE = 50
+
+
+def make_groups(count, files_per_group, distinct_paths):
+    random.seed(0)
+    groups = []
+    for group_id in range(1, count + 1):
+        group = PromptGroup()
+        group.id = group_id
+        for _ in range(files_per_group):
+            path = f"C:/work/project/src/module_{random.randrange(distinct_paths)}.py"
+            group.files.append(path)
+            group.file_metadata[path] = {"hash": "0" * 64, "size": 1024, "name": os.path.basename(path)}
+        groups.append(group)
+    return groups
+
+
+def linear_lookup(groups, file_path):
+    for group in groups:
+        if file_path in group.files:
+            return group.file_metadata.get(file_path)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--groups", type=int, default=10000)
+    parser.add_argument("--files", type=int, default=5, help="每个分组的附件数")
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    distinct_paths = args.groups * args.files // 2
+    groups = make_groups(args.groups, args.files, distinct_paths)
+    # 最坏情况是只出现在最新分组中或从未出现过的文件
+    targets = groups[-1].files[:1] + ["C:/work/project/missing.py"]
+    targets += [random.choice(random.choice(groups).files) for _ in range(args.lookups - len(targets))]
+
+    workdir = tempfile.mkdtemp()
+    try:
+        store = HistoryStore(os.path.join(workdir, "history.db"))
+        with store.conn:
+            for group in groups:
+                store.add_group(group)
+                for path in group.files:
+                    store.add_file(group, path, group.file_metadata[path])
+
+        # 与 load_first_page 相同: 载入最早的元数据, 再加入最近一页分组
+        start = timeit.default_timer()
+        index = FileIndex()
+        index.seed(store.earliest_file_metadata())
+        for group in groups[-PAGE_SIZE:]:
+            index.add_group(group)
+        build = timeit.default_timer() - start
+
+        for path in targets:
+            assert index.metadata(path) == linear_lookup(groups, path) == store.find_file_metadata(path)
+
+        linear = timeit.timeit(lambda: [linear_lookup(groups, p) for p in targets], number=1)
+        query = min(timeit.repeat(lambda: [store.find_file_metadata(p) for p in targets], number=1, repeat=3))
+        indexed = min(timeit.repeat(lambda: [index.metadata(p) for p in targets], number=1, repeat=5))
+        using = min(timeit.repeat(lambda: [store.find_groups_using(p) for p in targets], number=1, repeat=3))
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    n = len(targets)
+    print(f"{args.groups} groups, {args.files} files each, {len(index)} distinct paths, {n} lookups")
+    print(f"index seed + page:  {build * 1000:10.2f} ms")
+    print(f"linear lookup:      {linear / n * 1e6:10.2f} us/lookup")
+    print(f"database lookup:    {query / n * 1e6:10.2f} us/lookup")
+    print(f"indexed lookup:     {indexed / n * 1e6:10.2f} us/lookup")
+    print(f"groups_using (db):  {using / n * 1e6:10.2f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""
+在合成的文件夹树和历史记录上运行基准测试, 结果保存为JSON并与上一次结果比较
+
+    python benchmarks/run_benchmarks.py [--files 2000] [--groups 5000] [--only file_reader]
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/20240101-120000.json
+
+界面相关的测试使用 offscreen 平台运行, 没有安装 PyQt6 时跳过
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+# 必须在导入Qt之前设置
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_folder_tree, make_history, random_text
+from plugins.file_reader_core import ContentCache, ReaderSettings, dump_folder
+from plugins.prompt_manager_core import (BlobStore, FileIndex, HistoryStore, HistoryWriter, PromptGroup,
+                                         RecallIndex, compile_template)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+class Measurement:
+    """一项测试多次运行的耗时(秒)和每次处理的条目数, 字节数"""
+    def __init__(self, name, times, items=0, nbytes=0):
+        self.name = name
+        self.times = times
+        self.items = items
+        self.bytes = nbytes
+
+    @property
+    def median(self):
+        return statistics.median(self.times)
+
+    def to_dict(self):
+        return {
+            "runs": len(self.times),
+            "min": min(self.times),
+            "median": self.median,
+            "mean": statistics.fmean(self.times),
+            "items": self.items,
+            "bytes": self.bytes,
+        }
+
+
+class Suite:
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.results = []
+
+    def enabled(self, name):
+        return not self.args.only or any(name.startswith(prefix) for prefix in self.args.only)
+
+    def measure(self, name, func, setup=None, repeat=None):
+        """
+        运行 func 若干次, setup 在每次运行前调用且不计时, 它的返回值传给 func;
+        func 返回 (条目数, 字节数) 或 None
+        """
+        if not self.enabled(name):
+            return None
+        times = []
+        counts = (0, 0)
+        for _ in range(repeat or self.args.repeat):
+            state = setup() if setup is not None else None
+            start = time.perf_counter()
+            counts = (func(state) if setup is not None else func()) or (0, 0)
+            times.append(time.perf_counter() - start)
+        measurement = Measurement(name, times, *counts)
+        self.results.append(measurement)
+        print(f"{name:40s} {measurement.median * 1000:10.2f} ms  (min {min(times) * 1000:.2f} ms)")
+        return measurement
+
+    def path(self, *parts):
+        return os.path.join(self.workdir, *parts)
+
+
+def bench_file_reader(suite):
+    args = suite.args
+    folder = suite.path("tree")
+    files, total = make_folder_tree(folder, args.files, args.depth, args.fanout, args.mean_size,
+                                    args.size_sigma, args.binary_ratio, args.seed)
+    print(f"# folder tree: {files} files, {total / 1024 / 1024:.1f} MB")
+    settings = ReaderSettings()
+    settings.cache_max_mb = 0
+    reader = settings.create_reader()
+
+    def walk():
+        count = sum(1 for result in reader.iter_entries(folder) if result.kind == result.FILE)
+        return count, 0
+
+    suite.measure("file_reader.walk_filter", walk)
+
+    def dump(current_reader):
+        stats = dump_folder(folder, io.StringIO(), current_reader)
+        return stats.files, stats.bytes
+
+    suite.measure("file_reader.read", lambda: dump(reader))
+
+    # 第一次读取填充缓存, 之后测量全部命中缓存时的耗时
+    cache = ContentCache(suite.path("file_reader_cache.db"))
+    cached_reader = settings.create_reader(cache=cache)
+    dump(cached_reader)
+    cache.commit()
+    suite.measure("file_reader.read_cached", lambda: dump(cached_reader))
+    cache.close()
+
+
+def bench_prompt_manager(suite):
+    args = suite.args
+    json_path = suite.path("prompt_history.json")
+    make_history(json_path, args.groups, args.prompts, args.attachments,
+                 attachment_mean_size=args.attachment_size, attachment_size_sigma=args.attachment_sigma,
+                 seed=args.seed)
+    size = os.path.getsize(json_path)
+    print(f"# history: {args.groups} groups, {size / 1024 / 1024:.1f} MB of JSON")
+
+    def fresh_store():
+        db_path = suite.path("migrate.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        shutil.copy(json_path, suite.path("migrate.json"))
+        return HistoryStore(db_path)
+
+    def migrate(store):
+        count = store.migrate_json(suite.path("migrate.json"))
+        store.close()
+        return count, size
+
+    suite.measure("prompt_manager.migrate_json", migrate, setup=fresh_store)
+
+    def migrated_store():
+        store = fresh_store()
+        store.migrate_json(suite.path("migrate.json"))
+        shutil.rmtree(suite.path("migrate_blobs"), ignore_errors=True)
+        return store
+
+    def migrate_blobs(store):
+        count = store.migrate_inline_blobs(BlobStore(suite.path("migrate_blobs")))
+        store.close()
+        return count, size
+
+    # 把内嵌的base64附件转存为blob, 与启动时的迁移相同
+    suite.measure("prompt_manager.migrate_inline_blobs", migrate_blobs, setup=migrated_store)
+
+    # 之后的测试都使用同一个数据库
+    db_path = suite.path("prompt_history.db")
+    store = HistoryStore(db_path)
+    shutil.copy(json_path, suite.path("history.json"))
+    store.migrate_json(suite.path("history.json"))
+    store.migrate_inline_blobs(BlobStore(suite.path("blobs")))
+    store.commit()
+
+    def load_page():
+        return len(store.load_groups(limit=50)), 0
+
+    def load_all():
+        return len(store.load_groups()), 0
+
+    suite.measure("prompt_manager.load_first_page", load_page)
+    suite.measure("prompt_manager.load_all_groups", load_all)
+
+    rng = random.Random(args.seed)
+    queries = ["render", "cache index", "token budget worker", "history"]
+
+    def search():
+        return sum(len(store.search(query)) for query in queries), 0
+
+    suite.measure("prompt_manager.search", search)
+
+    def save(writer):
+        group = PromptGroup()
+        store.reserve_group_id(group)
+        writer.add_group(group)
+        for _ in range(args.save_prompts):
+            writer.add_prompt(group, random_text(rng, 200))
+        writer.flush()
+        writer.close()
+        return args.save_prompts, 0
+
+    suite.measure("prompt_manager.save_prompts", save, setup=lambda: HistoryWriter(db_path))
+
+    groups = store.load_groups()
+    page = store.load_groups(limit=50)
+    index = FileIndex()
+
+    def build_index():
+        # 与界面加载第一页历史时相同: 从数据库载入每个路径最早的元数据, 再加入已加载的分组
+        index.clear()
+        index.seed(store.earliest_file_metadata())
+        for group in page:
+            index.add_group(group)
+        return len(index), 0
+
+    suite.measure("prompt_manager.index_build", build_index)
+    with_files = [group for group in groups if group.files]
+    targets = [rng.choice(rng.choice(with_files).files) for _ in range(10000)]
+    suite.measure("prompt_manager.file_lookup", lambda: (sum(1 for p in targets if index.metadata(p)), 0))
+    suite.measure("prompt_manager.groups_using",
+                  lambda: (sum(len(store.find_groups_using(p)) for p in targets[:1000]), 0))
+    store.close()
+
+    prompts = [prompt for group in groups for prompt in group.prompts][:args.recall_prompts]
+    recall = RecallIndex()
+
+    def record(recall_index):
+        for prompt in prompts:
+            recall_index.record(prompt)
+        return len(prompts), sum(len(prompt) for prompt in prompts)
+
+    suite.measure("prompt_manager.recall_record", record, setup=RecallIndex)
+    record(recall)
+    prefixes = [prompt[:rng.randint(2, 12)] for prompt in rng.sample(prompts, min(1000, len(prompts)))]
+    suite.measure("prompt_manager.recall_suggest", lambda: (sum(len(recall.suggest(p)) for p in prefixes), 0))
+
+    dump_text = random_text(rng, args.render_kb * 1024)
+    template_text = "Review {{language}} code:\n{{dump}}\nFiles:\n{{files}}\n" * 4
+
+    def render():
+        template = compile_template(template_text)
+        values = {"language": "Python", "dump": dump_text, "files": "\n".join(targets[:50])}
+        text = template.render(lambda name, arg: values.get(name))
+        return 1, len(text)
+
+    suite.measure("prompt_manager.render_template", render)
+
+
+def bench_qt(suite):
+    """在 offscreen 平台上创建界面, 测量加载历史, 重建历史视图和读取文件夹"""
+    try:
+        from PyQt6.QtWidgets import QApplication
+        from PyQt6.QtCore import QEventLoop
+    except ImportError:
+        print("# PyQt6 is not installed, skipping UI benchmarks")
+        return
+    app = QApplication.instance() or QApplication([])
+    from plugins.prompt_manager import PromptManagerWidget
+    from plugins.file_reader import FileReaderWidget
+
+    # 界面使用工作目录中的数据文件, 在单独的目录中运行
+    ui_dir = suite.path("ui")
+    os.makedirs(ui_dir, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(ui_dir)
+    try:
+        widget = None
+
+        def prepare_history():
+            if widget is not None:
+                widget.close_history()
+                widget.deleteLater()
+                app.processEvents()
+            for name in os.listdir(ui_dir):
+                path = os.path.join(ui_dir, name)
+                shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+            shutil.copy(suite.path("prompt_history.json"), os.path.join(ui_dir, "prompt_history.json"))
+
+        def create_widget(_):
+            nonlocal widget
+            widget = PromptManagerWidget()
+            return len(widget.groups), 0
+
+        suite.measure("ui.prompt_manager_startup", create_widget, setup=prepare_history)
+
+        # 启动后只加载了第一页历史, 查找的文件大多只出现在未加载的分组中
+        rng = random.Random(suite.args.seed)
+        paths = [path for group in widget.store.load_groups() for path in group.files]
+        lookups = [rng.choice(paths) for _ in range(10000)] if paths else []
+        suite.measure("ui.prompt_manager_get_file_metadata",
+                      lambda: (sum(1 for p in lookups if widget.get_file_metadata(p)), 0))
+
+        def update_history():
+            widget.update_history()
+            return len(widget.groups), 0
+
+        suite.measure("ui.prompt_manager_update_history", update_history)
+
+        def add_prompts():
+            for _ in range(100):
+                widget.current_group.prompts.append("benchmark prompt")
+                widget.writer.add_prompt(widget.current_group, "benchmark prompt")
+            widget.save_history()
+            return 100, 0
+
+        suite.measure("ui.prompt_manager_save_history", add_prompts)
+        widget.close_history()
+
+        reader = FileReaderWidget()
+
+        def read_folder():
+            loop = QEventLoop()
+            reader.read_folder_content(suite.path("tree"))
+            reader.worker.finished.connect(loop.quit)
+            if reader.worker.isRunning():
+                loop.exec()
+            app.processEvents()
+            return reader.worker.stats.files, reader.worker.stats.bytes
+
+        suite.measure("ui.file_reader_read_folder", read_folder)
+        reader.cancel_reading()
+    finally:
+        os.chdir(cwd)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def latest_result(directory, exclude=None):
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    paths = [os.path.join(directory, name) for name in names]
+    paths = [path for path in paths if path != exclude]
+    return paths[-1] if paths else None
+
+
+def compare(results, baseline_path, threshold):
+    """打印和基线结果相比中位数的变化, 超过阈值的标记出来"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {os.path.basename(baseline_path)} ({baseline.get('revision') or 'unknown revision'})")
+    previous = baseline.get("results", {})
+    for name, current in results.items():
+        before = previous.get(name)
+        if before is None:
+            print(f"{name:40s} {'new':>10s}")
+            continue
+        change = (current["median"] - before["median"]) / before["median"] * 100 if before["median"] else 0.0
+        mark = ""
+        if change > threshold:
+            mark = "  slower"
+        elif change < -threshold:
+            mark = "  faster"
+        print(f"{name:40s} {before['median'] * 1000:10.2f} -> {current['median'] * 1000:10.2f} ms "
+              f"{change:+7.1f}%{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000, help="合成文件夹中的文件数")
+    parser.add_argument("--depth", type=int, default=4, help="目录的最大层数")
+    parser.add_argument("--fanout", type=int, default=4, help="每个目录最多的子目录数")
+    parser.add_argument("--mean-size", type=int, default=4096, help="文件的平均大小(字节)")
+    parser.add_argument("--size-sigma", type=float, default=1.0, help="文件大小对数正态分布的sigma, 0表示大小相同")
+    parser.add_argument("--binary-ratio", type=float, default=0.1, help="二进制文件的比例")
+    parser.add_argument("--groups", type=int, default=5000, help="合成历史的分组数")
+    parser.add_argument("--prompts", type=int, default=3, help="每个分组的提示词数")
+    parser.add_argument("--attachments", type=int, default=2, help="每个分组的附件数")
+    parser.add_argument("--attachment-size", type=int, default=4096, help="附件的平均大小(字节)")
+    parser.add_argument("--attachment-sigma", type=float, default=1.0,
+                        help="附件大小对数正态分布的sigma, 0表示大小相同")
+    parser.add_argument("--save-prompts", type=int, default=500, help="保存测试写入的提示词数")
+    parser.add_argument("--recall-prompts", type=int, default=1000, help="召回测试记录的提示词数")
+    parser.add_argument("--render-kb", type=int, default=1024, help="模板渲染测试中dump的大小(KB)")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测试的运行次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", action="append", help="只运行名字以此开头的测试, 可以指定多次")
+    parser.add_argument("--no-ui", action="store_true", help="不运行界面相关的测试")
+    parser.add_argument("--output-dir", default=RESULTS_DIR, help="保存结果的目录")
+    parser.add_argument("--no-save", action="store_true", help="不保存结果")
+    parser.add_argument("--compare", help="与这个结果文件比较, 默认与输出目录中最新的结果比较")
+    parser.add_argument("--threshold", type=float, default=10.0, help="标记为变快或变慢的变化百分比")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    suite = Suite(args, workdir)
+    try:
+        bench_file_reader(suite)
+        bench_prompt_manager(suite)
+        if not args.no_ui:
+            bench_qt(suite)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {m.name: m.to_dict() for m in suite.results}
+    report = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {key: value for key, value in vars(args).items()
+                       if key not in ("output_dir", "no_save", "compare", "threshold", "only", "no_ui")},
+        "results": results,
+    }
+
+    output_path = None
+    if not args.no_save:
+        os.makedirs(args.output_dir, exist_ok=True)
+        output_path = os.path.join(args.output_dir, time.strftime("%Y%m%d-%H%M%S") + ".json")
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {output_path}")
+
+    baseline = args.compare or latest_result(args.output_dir, exclude=output_path)
+    if baseline:
+        compare(results, baseline, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
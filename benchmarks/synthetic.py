@@ -0,0 +1,105 @@
+"""
+生成基准测试用的合成数据: 文件夹树和旧格式的 prompt_history.json,
+相同的参数和种子总是生成相同的数据
+"""
+import os
+import json
+import math
+import base64
+import random
+from datetime import datetime, timedelta
+
+# 文本文件使用的扩展名, 二进制文件使用的扩展名不在默认排除列表中, 需要靠内容识别
+TEXT_EXTENSIONS = [".py", ".js", ".ts", ".md", ".txt", ".json", ".html", ".css", ".c", ".go"]
+BINARY_EXTENSIONS = [".dat", ".bin", ".blob"]
+WORDS = ("def class return import value result file path group prompt render index cache "
+         "load save read write filter token budget worker thread queue history template").split()
+
+
+def random_text(rng, size):
+    """由单词组成的多行文本, 长度约为 size 字节"""
+    lines = []
+    total = 0
+    while total < size:
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)[:size]
+
+
+def file_size(rng, mean_size, size_sigma):
+    """对数正态分布的文件大小, 少量大文件和大量小文件, 平均值约为 mean_size"""
+    if size_sigma <= 0:
+        return mean_size
+    mu = math.log(max(1, mean_size)) - size_sigma ** 2 / 2
+    return max(1, int(rng.lognormvariate(mu, size_sigma)))
+
+
+def make_folder_tree(root, files=1000, depth=4, fanout=4, mean_size=4096, size_sigma=1.0,
+                     binary_ratio=0.1, seed=0):
+    """
+    在 root 下生成 files 个文件, 目录最多 depth 层, 每个目录最多 fanout 个子目录;
+    binary_ratio 比例的文件是二进制内容; 返回 (文件数, 总字节数)
+    """
+    rng = random.Random(seed)
+    directories = [root]
+    frontier = [(root, 0)]
+    while frontier:
+        directory, level = frontier.pop(0)
+        if level >= depth:
+            continue
+        for index in range(rng.randint(1, fanout)):
+            child = os.path.join(directory, f"dir_{level}_{index}")
+            directories.append(child)
+            frontier.append((child, level + 1))
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    total = 0
+    for index in range(files):
+        directory = rng.choice(directories)
+        size = file_size(rng, mean_size, size_sigma)
+        if rng.random() < binary_ratio:
+            name = f"file_{index}{rng.choice(BINARY_EXTENSIONS)}"
+            data = bytes([0]) + rng.randbytes(size - 1) if size > 1 else bytes([0])
+        else:
+            name = f"file_{index}{rng.choice(TEXT_EXTENSIONS)}"
+            data = random_text(rng, size).encode("utf-8")
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        total += len(data)
+    return files, total
+
+
+def make_history(path, groups=2000, prompts=3, attachments=2, distinct_files=500, prompt_chars=200,
+                 attachment_mean_size=4096, attachment_size_sigma=1.0, seed=0):
+    """
+    生成旧格式的 prompt_history.json: groups 个分组, 每个分组 prompts 条提示词和
+    attachments 个附件, 附件路径从 distinct_files 个路径中选取; 与旧版本保存的一样,
+    附件内容以base64内嵌在元数据中, 同一路径的内容相同, 大小按对数正态分布; 返回分组数
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    paths = [f"C:/work/project/src/module_{index}.py" for index in range(distinct_files)]
+    contents = {}
+    data = []
+    for index in range(groups):
+        timestamp = (start + timedelta(minutes=37 * index)).strftime("%Y-%m-%d %H:%M:%S")
+        files = rng.sample(paths, min(attachments, len(paths)))
+        metadata = {}
+        for file in files:
+            if file not in contents:
+                content = random_text(rng, file_size(rng, attachment_mean_size, attachment_size_sigma))
+                contents[file] = content.encode("utf-8")
+            content = contents[file]
+            metadata[file] = {"content": base64.b64encode(content).decode("ascii"), "size": len(content),
+                              "name": os.path.basename(file)}
+        data.append({
+            "prompts": [random_text(rng, rng.randint(prompt_chars // 4, prompt_chars * 2)) for _ in range(prompts)],
+            "files": files,
+            "file_metadata": metadata,
+            "timestamp": timestamp,
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    return groups
@@ -1,10 +1,17 @@
 # main.py
-from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QMenuBar, QMenu
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QMenuBar, QMenu, QDialog,
+                             QTableWidget, QTableWidgetItem, QHBoxLayout, QPushButton, QCheckBox, QHeaderView)
+from PyQt6.QtCore import Qt, QTimer
 import sys
 import os
+import json
+import threading
 import importlib.util
-from typing import Dict, List
+from typing import Dict, List, Optional
+from profiler import Profiler
+
+# 性能日志文件, 在性能面板中开启; 设置环境变量 PROFILE_LOG 时启动即开启
+PROFILE_LOG_FILE = "performance.jsonl"
 
 class PluginInterface:
     """插件接口基类,所有插件都需要继承这个类"""
@@ -20,17 +27,110 @@ class PluginInterface:
         """返回插件的菜单项"""
         return []
 
+class PerformanceDialog(QDialog):
+    """显示各项操作的计时汇总, 打开时每秒刷新"""
+    COLUMNS = ["Span", "Count", "Total ms", "Avg ms", "Max ms", "Last ms", "Bytes", "Items"]
+
+    def __init__(self, profiler: Profiler, parent=None):
+        super().__init__(parent)
+        self.profiler = profiler
+        self.setWindowTitle("Performance")
+        self.resize(760, 360)
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.log_check = QCheckBox(f"Write JSON lines log ({PROFILE_LOG_FILE})")
+        self.log_check.setChecked(bool(profiler.log_path))
+        self.log_check.toggled.connect(self.toggle_log)
+        buttons.addWidget(self.log_check)
+        buttons.addStretch()
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+        buttons.addWidget(reset_button)
+        layout.addLayout(buttons)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        stats = self.profiler.snapshot()
+        self.table.setRowCount(len(stats))
+        for row, s in enumerate(stats):
+            values = [s.name, s.count, f"{s.total * 1000:.1f}", f"{s.average * 1000:.2f}",
+                      f"{s.max * 1000:.2f}", f"{s.last * 1000:.2f}", s.bytes, s.items]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if column:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def toggle_log(self, enabled: bool):
+        self.profiler.set_log_path(PROFILE_LOG_FILE if enabled else None)
+
+    def reset(self):
+        self.profiler.reset()
+        self.refresh()
+
+
+class PluginManifest:
+    """
+    插件模块旁边的 <模块名>.json, 声明插件名称, 菜单项和入口,
+    启动时只读取清单构建菜单, 不导入插件模块
+    """
+    def __init__(self, module_name: str, data: dict):
+        self.module_name = module_name
+        self.name = data.get("name", module_name)
+        self.description = data.get("description", "")
+        # 入口格式为 "模块名:类名"
+        entry_point = data.get("entry_point", f"{module_name}:{module_name}Plugin")
+        self.entry_module, _, self.entry_class = entry_point.partition(":")
+        # 菜单项: {"name": 显示名称, "action": 插件方法名, "shows_plugin": 首次加载即完成该操作}
+        self.menu: List[dict] = data.get("menu", [])
+        # 窗口显示后在后台预先导入模块
+        self.preload: bool = data.get("preload", False)
+
+    @classmethod
+    def load(cls, path: str) -> "PluginManifest":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(os.path.splitext(os.path.basename(path))[0], data)
+
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, preload_plugins: bool = True):
         super().__init__()
         self.setWindowTitle("Plugin Based Application")
         self.resize(800, 600)
         
+        # 启动和常用操作的计时, 插件通过 timed/record_timing 记录自己的计时
+        self.profiler = Profiler(os.environ.get("PROFILE_LOG"))
+        self.performance_dialog = None
+
         # 初始化UI
         self.init_ui()
         
-        # 插件管理
+        # 插件管理: plugins 只包含已经初始化的插件, 有清单的插件在第一次使用时才加载
         self.plugins: Dict[str, PluginInterface] = {}
+        self.manifests: Dict[str, PluginManifest] = {}
+        self.preload_plugins = preload_plugins
+        self._modules = {}  # 已导入的插件模块
+        self._import_lock = threading.Lock()
         self.load_plugins()
         
     def init_ui(self):
@@ -45,6 +145,28 @@ class MainWindow(QMainWindow):
         
         # 插件菜单
         self.plugin_menu = self.menu_bar.addMenu("Plugins")
+        performance_action = self.plugin_menu.addAction("Performance")
+        performance_action.triggered.connect(self.show_performance)
+        self.plugin_menu.addSeparator()
+
+    def timed(self, name: str, **fields):
+        """
+        插件记录计时的接口, 返回上下文管理器, 可以在代码块中补充 bytes/items 等字段:
+
+            with main_window.timed("my_plugin.search") as span:
+                span["items"] = len(results)
+        """
+        return self.profiler.span(name, **fields)
+
+    def record_timing(self, name: str, seconds: float, **fields):
+        """记录一段已经测量好的耗时(秒), 用于跨越多个回调的操作"""
+        self.profiler.record(name, seconds, **fields)
+
+    def show_performance(self):
+        if self.performance_dialog is None:
+            self.performance_dialog = PerformanceDialog(self.profiler, self)
+        self.performance_dialog.show()
+        self.performance_dialog.raise_()
         
     def load_plugins(self):
         """加载plugins文件夹中的所有插件"""
@@ -52,11 +174,81 @@ class MainWindow(QMainWindow):
         if not os.path.exists(plugins_dir):
             os.makedirs(plugins_dir)
             
-        for filename in os.listdir(plugins_dir):
+        for filename in sorted(os.listdir(plugins_dir)):
             if filename.endswith(".py"):
                 plugin_path = os.path.join(plugins_dir, filename)
-                self.load_plugin(plugin_path)
-                
+                manifest_path = os.path.splitext(plugin_path)[0] + ".json"
+                if os.path.exists(manifest_path):
+                    self.register_plugin(manifest_path)
+                else:
+                    # 没有清单的插件仍然在启动时加载
+                    self.load_plugin(plugin_path)
+
+    def register_plugin(self, manifest_path: str):
+        """按清单添加插件菜单, 插件在第一次使用菜单项时才导入和初始化"""
+        try:
+            manifest = PluginManifest.load(manifest_path)
+            self.manifests[manifest.module_name] = manifest
+            self.add_manifest_menu_items(manifest)
+        except Exception as e:
+            print(f"Failed to read plugin manifest {manifest_path}: {str(e)}")
+
+    def import_plugin_module(self, module_name: str):
+        """导入插件模块, 后台预加载和界面线程共用, 每个模块只执行一次"""
+        with self._import_lock:
+            module = self._modules.get(module_name)
+            if module is None:
+                plugin_path = os.path.join("plugins", f"{module_name}.py")
+                with self.timed(f"plugin.import:{module_name}", thread=threading.current_thread().name):
+                    spec = importlib.util.spec_from_file_location(module_name, plugin_path)
+                    module = importlib.util.module_from_spec(spec)
+                    spec.loader.exec_module(module)
+                self._modules[module_name] = module
+            return module
+
+    def ensure_plugin(self, module_name: str) -> Optional[PluginInterface]:
+        """返回已初始化的插件, 还没有加载时导入并初始化, 失败时返回None"""
+        plugin = self.plugins.get(module_name)
+        if plugin is not None:
+            return plugin
+        manifest = self.manifests[module_name]
+        try:
+            module = self.import_plugin_module(manifest.entry_module)
+            plugin = getattr(module, manifest.entry_class)()
+            with self.timed(f"plugin.initialize:{module_name}"):
+                plugin.initialize(self)
+        except Exception as e:
+            print(f"Failed to load plugin {module_name}: {str(e)}")
+            return None
+        self.plugins[module_name] = plugin
+        return plugin
+
+    def run_plugin_action(self, module_name: str, item: dict):
+        loaded = module_name in self.plugins
+        plugin = self.ensure_plugin(module_name)
+        if plugin is None:
+            return
+        # 插件初始化时已经显示, 不需要再执行显示/隐藏
+        if not loaded and item.get("shows_plugin"):
+            return
+        getattr(plugin, item["action"])()
+
+    def start_preload(self):
+        """窗口显示后在后台线程中导入清单中标记为预加载的插件模块, 初始化仍在首次使用时进行"""
+        if not self.preload_plugins:
+            return
+        modules = [manifest.entry_module for manifest in self.manifests.values()
+                   if manifest.preload and manifest.module_name not in self.plugins]
+        if modules:
+            threading.Thread(target=self._preload_modules, args=(modules,), name="PluginPreload", daemon=True).start()
+
+    def _preload_modules(self, modules: List[str]):
+        for module_name in modules:
+            try:
+                self.import_plugin_module(module_name)
+            except Exception as e:
+                print(f"Failed to preload plugin {module_name}: {str(e)}")
+
     def load_plugin(self, plugin_path: str):
         """加载单个插件"""
         try:
@@ -64,16 +256,18 @@ class MainWindow(QMainWindow):
             module_name = os.path.splitext(os.path.basename(plugin_path))[0]
             
             # 加载模块
-            spec = importlib.util.spec_from_file_location(module_name, plugin_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
+            with self.timed(f"plugin.import:{module_name}"):
+                spec = importlib.util.spec_from_file_location(module_name, plugin_path)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
             
             # 实例化插件
             plugin_class = getattr(module, f"{module_name}Plugin")
             plugin = plugin_class()
             
             # 初始化插件
-            plugin.initialize(self)
+            with self.timed(f"plugin.initialize:{module_name}"):
+                plugin.initialize(self)
             
             # 添加插件菜单项
             self.add_plugin_menu_items(plugin)
@@ -83,6 +277,15 @@ class MainWindow(QMainWindow):
             
         except Exception as e:
             print(f"Failed to load plugin {plugin_path}: {str(e)}")
+
+    def add_manifest_menu_items(self, manifest: PluginManifest):
+        """按清单添加插件菜单项"""
+        if manifest.menu:
+            plugin_submenu = self.plugin_menu.addMenu(manifest.name)
+            for item in manifest.menu:
+                action = plugin_submenu.addAction(item["name"])
+                action.triggered.connect(
+                    lambda checked=False, name=manifest.module_name, item=item: self.run_plugin_action(name, item))
             
     def add_plugin_menu_items(self, plugin: PluginInterface):
         """添加插件菜单项"""
@@ -97,6 +300,9 @@ def main():
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    app.aboutToQuit.connect(window.profiler.close)
+    # 窗口显示之后再开始预加载, 不影响启动
+    QTimer.singleShot(0, window.start_preload)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -1,7 +1,19 @@
-from PyQt6.QtWidgets import (QFileDialog, QTextEdit, QVBoxLayout, QWidget, QPushButton,
-                             QDialog, QListWidget, QLineEdit, QHBoxLayout, QLabel, QMessageBox)
+from PyQt6.QtWidgets import (QFileDialog, QVBoxLayout, QWidget, QPushButton, QApplication,
+                             QDialog, QListWidget, QListWidgetItem, QLineEdit, QHBoxLayout, QLabel, QMessageBox,
+                             QSpinBox, QCheckBox, QComboBox, QAbstractScrollArea, QSplitter)
+from PyQt6.QtCore import Qt, QThread, QTimer, QFileSystemWatcher, pyqtSignal
+from PyQt6.QtGui import QPainter, QFontDatabase, QKeySequence
 import os
-import json
+import time
+from plugins.file_reader_core import (CACHE_FILE, PRIORITY_RECENT, PRIORITY_SMALLEST, PRIORITY_TREE, SETTINGS_FILE,
+                                     DumpDocument, DumpStats, LiveDump, ReaderSettings)
+
+# token预算模式下的文件优先级选项
+BUDGET_PRIORITIES = [
+    ("Tree Order", PRIORITY_TREE),
+    ("Smallest Files First", PRIORITY_SMALLEST),
+    ("Recently Modified First", PRIORITY_RECENT),
+]
 
 class FilterSettingsDialog(QDialog):
     def __init__(self, parent=None):
@@ -67,6 +79,58 @@ class FilterSettingsDialog(QDialog):
         
         layout.addLayout(extensions_layout)
         
+        # 读取线程数设置
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("Reader Threads:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 128)
+        workers_layout.addWidget(self.workers_spin)
+        layout.addLayout(workers_layout)
+        
+        # 是否读取目录中的 .gitignore/.ignore 规则
+        self.ignore_files_check = QCheckBox("Respect .gitignore/.ignore files")
+        layout.addWidget(self.ignore_files_check)
+        
+        # 是否合并内容相同的文件
+        self.dedupe_check = QCheckBox("Emit identical files only once")
+        layout.addWidget(self.dedupe_check)
+        
+        # 内容缓存容量设置
+        cache_layout = QHBoxLayout()
+        cache_layout.addWidget(QLabel("Content Cache (MB, 0 = disabled):"))
+        self.cache_spin = QSpinBox()
+        self.cache_spin.setRange(0, 100000)
+        cache_layout.addWidget(self.cache_spin)
+        clear_cache_btn = QPushButton("Clear Cache")
+        clear_cache_btn.clicked.connect(self.clear_cache)
+        cache_layout.addWidget(clear_cache_btn)
+        layout.addLayout(cache_layout)
+        
+        # 文件大小限制设置
+        size_layout = QHBoxLayout()
+        size_layout.addWidget(QLabel("Max File Size (KB, 0 = unlimited):"))
+        self.max_file_spin = QSpinBox()
+        self.max_file_spin.setRange(0, 10000000)
+        size_layout.addWidget(self.max_file_spin)
+        size_layout.addWidget(QLabel("Max Total Size (MB, 0 = unlimited):"))
+        self.max_total_spin = QSpinBox()
+        self.max_total_spin.setRange(0, 1000000)
+        size_layout.addWidget(self.max_total_spin)
+        layout.addLayout(size_layout)
+        
+        # token预算设置
+        budget_layout = QHBoxLayout()
+        budget_layout.addWidget(QLabel("Token Budget (0 = unlimited):"))
+        self.budget_spin = QSpinBox()
+        self.budget_spin.setRange(0, 100000000)
+        self.budget_spin.setSingleStep(1000)
+        budget_layout.addWidget(self.budget_spin)
+        self.priority_combo = QComboBox()
+        for label, _ in BUDGET_PRIORITIES:
+            self.priority_combo.addItem(label)
+        budget_layout.addWidget(self.priority_combo)
+        layout.addLayout(budget_layout)
+        
         # 保存和取消按钮
         buttons_layout = QHBoxLayout()
         save_btn = QPushButton("Save")
@@ -101,74 +165,275 @@ class FilterSettingsDialog(QDialog):
         if current_item:
             self.extensions_list.takeItem(self.extensions_list.row(current_item))
             
+    def clear_cache(self):
+        if self.parent.content_cache is not None:
+            self.parent.content_cache.clear()
+            
     def load_settings(self):
         # 从父窗口获取当前设置
-        for file_filter in sorted(self.parent.excluded_files):
+        for file_filter in sorted(self.parent.settings.excluded_files):
             self.files_list.addItem(file_filter)
-        for ext_filter in sorted(self.parent.excluded_extensions):
+        for ext_filter in sorted(self.parent.settings.excluded_extensions):
             self.extensions_list.addItem(ext_filter)
+        self.workers_spin.setValue(self.parent.settings.read_workers)
+        self.ignore_files_check.setChecked(self.parent.settings.use_ignore_files)
+        self.dedupe_check.setChecked(self.parent.settings.deduplicate)
+        self.cache_spin.setValue(self.parent.settings.cache_max_mb)
+        self.max_file_spin.setValue(self.parent.settings.max_file_size_kb)
+        self.max_total_spin.setValue(self.parent.settings.max_total_size_mb)
+        self.budget_spin.setValue(self.parent.settings.token_budget)
+        priorities = [priority for _, priority in BUDGET_PRIORITIES]
+        if self.parent.settings.budget_priority in priorities:
+            self.priority_combo.setCurrentIndex(priorities.index(self.parent.settings.budget_priority))
             
     def save_and_close(self):
         # 更新父窗口的设置
-        self.parent.excluded_files = {
+        self.parent.settings.excluded_files = {
             self.files_list.item(i).text()
             for i in range(self.files_list.count())
         }
-        self.parent.excluded_extensions = {
+        self.parent.settings.excluded_extensions = {
             self.extensions_list.item(i).text()
             for i in range(self.extensions_list.count())
         }
+        self.parent.settings.read_workers = self.workers_spin.value()
+        self.parent.settings.use_ignore_files = self.ignore_files_check.isChecked()
+        self.parent.settings.deduplicate = self.dedupe_check.isChecked()
+        self.parent.settings.cache_max_mb = self.cache_spin.value()
+        self.parent.settings.max_file_size_kb = self.max_file_spin.value()
+        self.parent.settings.max_total_size_mb = self.max_total_spin.value()
+        self.parent.settings.token_budget = self.budget_spin.value()
+        self.parent.settings.budget_priority = BUDGET_PRIORITIES[self.priority_combo.currentIndex()][1]
         
-        # 保存设置到文件
+        # 重新编译过滤规则并保存设置到文件
+        self.parent.compile_filters()
+        self.parent.open_cache()
         self.parent.save_settings()
         self.accept()
 
-class FileReaderWidget(QWidget):
-    def __init__(self, parent=None):
+class FolderReadWorker(QThread):
+    """在后台线程中遍历文件夹, 分块发出读取结果"""
+    chunk_ready = pyqtSignal(list)  # 一批 ReadResult
+    progress = pyqtSignal(int, int, int, float)  # 已处理文件数, 已读取字节数, 估算token数, 已用时间(秒)
+    
+    # 积攒的文本超过该大小或距上次发出超过该时间就立即发出
+    FLUSH_BYTES = 64 * 1024
+    FLUSH_INTERVAL = 0.05
+    
+    def __init__(self, folder_path, reader, parent=None, context=None):
         super().__init__(parent)
-        # 默认排除的文件和文件夹
-        self.excluded_files = {
-            '.DS_Store',      # macOS系统文件
-            'Thumbs.db',      # Windows缩略图缓存
-            'desktop.ini',    # Windows系统文件
-            '__pycache__',    # Python编译缓存
-            '.git',           # Git版本控制文件
-            '.idea',          # PyCharm项目文件
-            '.vscode',        # VSCode项目文件
-            '*.pyc',          # Python编译文件
-            '*.pyo',          # Python优化文件
-            '*.pyd',          # Python DLL文件
-            '.pytest_cache',  # Pytest缓存
-            '__init__.py',    # Python包初始化文件
-            '*.swp',          # Vim临时文件
-            '*.swo',          # Vim临时文件
-            '.gitignore',     # Git忽略文件
-            '.env',           # 环境变量文件
-            'node_modules',   # Node.js模块目录
-            'venv',           # Python虚拟环境
-            'env',            # Python虚拟环境
-            '.venv',          # Python虚拟环境
-        }
+        self.folder_path = folder_path
+        self.reader = reader
+        self.context = context  # 只读取子目录时为父目录链上的忽略规则
+        self._cancelled = False
+        self._buffer = []
+        self._buffer_size = 0
+        self._last_flush = 0.0
+        self.stats = DumpStats()
         
-        # 默认排除的文件扩展名
-        self.excluded_extensions = {
-            '.log',           # 日志文件
-            '.tmp',           # 临时文件
-            '.temp',          # 临时文件
-            '.bak',           # 备份文件
-            '.cache',         # 缓存文件
-            '.class',         # Java编译文件
-            '.o',            # C/C++目标文件
-            '.obj',          # 目标文件
-            '.dll',          # 动态链接库
-            '.exe',          # 可执行文件
-            '.so',           # 共享库文件
-        }
+    def cancel(self):
+        self._cancelled = True
+        
+    def is_cancelled(self):
+        return self._cancelled
+        
+    def run(self):
+        self.stats = DumpStats()
+        for result in self.reader.iter_results(self.folder_path, self.is_cancelled, self.context):
+            self.stats.add(result)
+            self._add(result)
+            self._maybe_flush()
+        self._flush()
+        
+    def _add(self, result):
+        self._buffer.append(result)
+        self._buffer_size += len(result.content or '')
+        
+    def _maybe_flush(self):
+        now = time.monotonic()
+        if self._buffer_size >= self.FLUSH_BYTES or now - self._last_flush >= self.FLUSH_INTERVAL:
+            self._flush()
+            
+    def _flush(self):
+        if self._buffer:
+            self.chunk_ready.emit(self._buffer)
+            self._buffer = []
+            self._buffer_size = 0
+        self._last_flush = time.monotonic()
+        self.progress.emit(self.stats.files, self.stats.bytes, self.stats.tokens, self.stats.elapsed)
+
+class DumpViewer(QAbstractScrollArea):
+    """
+    只读的dump查看器, 只绘制可见区域的行, 文本按需从 DumpDocument 读取
+    """
+    MARGIN = 4
+    
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        self.verticalScrollBar().setSingleStep(1)
+        # 选中的行范围 (锚点行, 当前行)
+        self._anchor = None
+        self._cursor = None
+        
+    def line_height(self):
+        return self.fontMetrics().height()
         
-        self.settings_file = "file_reader_settings.json"
+    def char_width(self):
+        return self.fontMetrics().horizontalAdvance('M')
+        
+    def visible_line_count(self):
+        return max(1, self.viewport().height() // self.line_height())
+        
+    def document_changed(self):
+        """文档内容变化后更新滚动范围并重绘"""
+        self.update_scrollbars()
+        self.viewport().update()
+        
+    def update_scrollbars(self):
+        visible = self.visible_line_count()
+        vbar = self.verticalScrollBar()
+        vbar.setRange(0, max(0, self.document.line_count - visible))
+        vbar.setPageStep(visible)
+        width = self.document.max_line_length * self.char_width() + 2 * self.MARGIN
+        hbar = self.horizontalScrollBar()
+        hbar.setRange(0, max(0, width - self.viewport().width()))
+        hbar.setPageStep(self.viewport().width())
+        hbar.setSingleStep(self.char_width())
+        
+    def scroll_to_line(self, line_no):
+        self.verticalScrollBar().setValue(line_no)
+        
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scrollbars()
+        
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+        
+    def selected_range(self):
+        if self._anchor is None:
+            return None
+        return min(self._anchor, self._cursor), max(self._anchor, self._cursor)
+        
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        painter.fillRect(self.viewport().rect(), palette.base())
+        
+        line_height = self.line_height()
+        char_width = self.char_width()
+        ascent = self.fontMetrics().ascent()
+        width = self.viewport().width()
+        first = self.verticalScrollBar().value()
+        hscroll = self.horizontalScrollBar().value()
+        # 只截取水平方向上可见的字符, 避免绘制超长行
+        first_char = hscroll // char_width
+        columns = width // char_width + 2
+        x = self.MARGIN - (hscroll - first_char * char_width)
+        selected = self.selected_range()
+        
+        for i in range(self.visible_line_count() + 1):
+            line_no = first + i
+            if line_no >= self.document.line_count:
+                break
+            y = i * line_height
+            text = self.document.line(line_no).expandtabs(4)[first_char:first_char + columns]
+            if selected and selected[0] <= line_no <= selected[1]:
+                painter.fillRect(0, y, width, line_height, palette.highlight())
+                painter.setPen(palette.highlightedText().color())
+            else:
+                painter.setPen(palette.text().color())
+            painter.drawText(x, y + ascent, text)
+            
+    def line_at(self, y):
+        line_no = self.verticalScrollBar().value() + int(y) // self.line_height()
+        return max(0, min(line_no, self.document.line_count - 1))
+        
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton and self.document.line_count:
+            line_no = self.line_at(event.position().y())
+            if self._anchor is None or not event.modifiers() & Qt.KeyboardModifier.ShiftModifier:
+                self._anchor = line_no
+            self._cursor = line_no
+            self.viewport().update()
+            
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.MouseButton.LeftButton and self._anchor is not None:
+            self._cursor = self.line_at(event.position().y())
+            self.viewport().update()
+            
+    def keyPressEvent(self, event):
+        vbar = self.verticalScrollBar()
+        if event.matches(QKeySequence.StandardKey.Copy):
+            self.copy_selection()
+        elif event.matches(QKeySequence.StandardKey.SelectAll):
+            if self.document.line_count:
+                self._anchor, self._cursor = 0, self.document.line_count - 1
+                self.viewport().update()
+        elif event.key() == Qt.Key.Key_Up:
+            vbar.setValue(vbar.value() - 1)
+        elif event.key() == Qt.Key.Key_Down:
+            vbar.setValue(vbar.value() + 1)
+        elif event.key() == Qt.Key.Key_PageUp:
+            vbar.setValue(vbar.value() - vbar.pageStep())
+        elif event.key() == Qt.Key.Key_PageDown:
+            vbar.setValue(vbar.value() + vbar.pageStep())
+        elif event.key() == Qt.Key.Key_Home:
+            vbar.setValue(0)
+        elif event.key() == Qt.Key.Key_End:
+            vbar.setValue(vbar.maximum())
+        else:
+            super().keyPressEvent(event)
+            
+    def copy_selection(self):
+        selected = self.selected_range()
+        if selected:
+            QApplication.clipboard().setText(self.document.text(selected[0], selected[1] + 1))
+            
+    def clear_selection(self):
+        self._anchor = None
+        self._cursor = None
+
+class FileReaderWidget(QWidget):
+    # 监视模式下合并连续文件事件的等待时间(毫秒)
+    WATCH_DEBOUNCE_MS = 300
+    # 监视的文件数上限, 目录总是全部监视
+    MAX_WATCHED_FILES = 4096
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.settings_file = SETTINGS_FILE
+        self.cache_file = CACHE_FILE
+        self.settings = ReaderSettings()
+        self.dump_document = DumpDocument()
+        self.live_dump = None
+        self.worker = None
+        self.directory_worker = None  # 监视模式下读取新增子目录的后台任务
+        self.directory_results = []
+        self.read_started_at = None
+        self.filter_matcher = None
+        self.content_cache = None
+        self.main_window = None  # 由插件设置, 用于记录读取耗时
         self.load_settings()
+        self.open_cache()
         self.init_ui()
         
+        # 监视模式: 文件变化后只更新受影响的段
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_path_changed)
+        self.watcher.directoryChanged.connect(self.on_path_changed)
+        # 已加入监视的路径, 避免每次都向 watcher 查询完整列表
+        self.watched_files = set()
+        self.watched_directories = set()
+        self.pending_changes = set()
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(self.WATCH_DEBOUNCE_MS)
+        self.watch_timer.timeout.connect(self.apply_pending_changes)
+        
     def init_ui(self):
         layout = QVBoxLayout(self)
         
@@ -185,30 +450,68 @@ class FileReaderWidget(QWidget):
         self.settings_button.clicked.connect(self.show_settings)
         button_layout.addWidget(self.settings_button)
         
+        # 创建取消按钮, 仅在读取过程中可用
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_reading)
+        button_layout.addWidget(self.cancel_button)
+        
+        # 复制全部dump内容
+        self.copy_button = QPushButton("Copy All")
+        self.copy_button.clicked.connect(self.copy_all)
+        button_layout.addWidget(self.copy_button)
+        
+        # 监视模式开关
+        self.watch_check = QCheckBox("Watch")
+        self.watch_check.toggled.connect(self.update_watching)
+        button_layout.addWidget(self.watch_check)
+        
         layout.addLayout(button_layout)
         
-        # 创建文本编辑器
-        self.text_edit = QTextEdit()
-        layout.addWidget(self.text_edit)
+        # 读取进度
+        self.progress_label = QLabel("")
+        layout.addWidget(self.progress_label)
+        
+        # 左侧为文件大纲, 右侧为只读的dump查看器
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.outline = QListWidget()
+        self.outline.itemClicked.connect(self.jump_to_outline_item)
+        splitter.addWidget(self.outline)
+        self.viewer = DumpViewer(self.dump_document)
+        splitter.addWidget(self.viewer)
+        splitter.setStretchFactor(1, 3)
+        layout.addWidget(splitter)
         
     def load_settings(self):
         try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as f:
-                    settings = json.load(f)
-                    self.excluded_files.update(settings.get('excluded_files', set()))
-                    self.excluded_extensions.update(settings.get('excluded_extensions', set()))
+            self.settings = ReaderSettings.load(self.settings_file)
         except Exception as e:
             QMessageBox.warning(self, "Warning", f"Error loading settings: {str(e)}")
+        self.compile_filters()
+        
+    def compile_filters(self):
+        """将排除规则编译为匹配器, 在设置加载和保存时调用"""
+        self.filter_matcher = self.settings.create_matcher()
+        
+    def open_cache(self):
+        """按照当前设置打开或关闭内容缓存"""
+        if self.settings.cache_max_mb <= 0:
+            if self.content_cache is not None:
+                self.cancel_reading()
+                self.content_cache.close()
+                self.content_cache = None
+            return
+        try:
+            if self.content_cache is None:
+                self.content_cache = self.settings.open_cache(self.cache_file)
+            self.content_cache.max_bytes = self.settings.cache_max_mb * 1024 * 1024
+        except Exception as e:
+            self.content_cache = None
+            QMessageBox.warning(self, "Warning", f"Error opening content cache: {str(e)}")
             
     def save_settings(self):
         try:
-            settings = {
-                'excluded_files': list(self.excluded_files),
-                'excluded_extensions': list(self.excluded_extensions)
-            }
-            with open(self.settings_file, 'w') as f:
-                json.dump(settings, f, indent=4)
+            self.settings.save(self.settings_file)
         except Exception as e:
             QMessageBox.warning(self, "Warning", f"Error saving settings: {str(e)}")
         
@@ -220,28 +523,13 @@ class FileReaderWidget(QWidget):
         """
         检查文件是否应该被跳过
         """
-        # 检查文件名是否在排除列表中
-        if file_name in self.excluded_files:
-            return True
-            
-        # 检查文件扩展名是否在排除列表中
-        file_ext = os.path.splitext(file_name)[1].lower()
-        if file_ext in self.excluded_extensions:
-            return True
-            
-        # 检查通配符模式
-        for pattern in self.excluded_files:
-            if '*' in pattern:
-                if file_name.endswith(pattern[1:]):  # 去掉*后匹配
-                    return True
-                    
-        return False
+        return self.filter_matcher.skip_file(file_name)
         
     def should_skip_directory(self, dir_name):
         """
         检查目录是否应该被跳过
         """
-        return dir_name in self.excluded_files
+        return self.filter_matcher.skip_directory(dir_name)
         
     def select_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Select Folder")
@@ -249,26 +537,240 @@ class FileReaderWidget(QWidget):
             self.read_folder_content(folder_path)
             
     def read_folder_content(self, folder_path):
-        content = []
-        for root, dirs, files in os.walk(folder_path):
-            # 过滤掉不需要的目录
-            dirs[:] = [d for d in dirs if not self.should_skip_directory(d)]
+        # 如果上一次读取还在进行, 先取消
+        self.cancel_reading()
+        self.stop_watching()
+        
+        self.dump_document.clear()
+        self.outline.clear()
+        self.viewer.clear_selection()
+        self.viewer.document_changed()
+        self.progress_label.setText("Reading...")
+        self.cancel_button.setEnabled(True)
+        
+        if self.content_cache is not None:
+            self.content_cache.reset_stats()
+        reader = self.settings.create_reader(self.filter_matcher, self.content_cache)
+        self.live_dump = LiveDump(self.dump_document, reader, folder_path)
+        self.read_started_at = time.perf_counter()
+        self.worker = FolderReadWorker(folder_path, reader, self)
+        self.worker.chunk_ready.connect(self.append_chunk)
+        self.worker.progress.connect(self.update_progress)
+        self.worker.finished.connect(self.on_reading_finished)
+        self.worker.start()
+        
+    def append_chunk(self, results):
+        # 忽略已被取消的旧任务残留在事件队列中的数据
+        if self.sender() is not self.worker:
+            return
+        for result in results:
+            section = self.live_dump.append(result)
+            self.outline.addItem(self.create_outline_item(section))
+        self.viewer.document_changed()
+        
+    def create_outline_item(self, section):
+        # 大纲的行与文档的段一一对应, 文件缩进显示在所属目录下
+        return QListWidgetItem(f"    {section.label}" if section.header_line else section.label)
+        
+    def jump_to_outline_item(self, item):
+        index = self.outline.row(item)
+        if 0 <= index < len(self.dump_document.sections):
+            section = self.dump_document.sections[index]
+            self.viewer.scroll_to_line(self.dump_document.section_start_line(index) + section.header_line)
+            
+    def copy_all(self):
+        QApplication.clipboard().setText(self.dump_document.text())
+
+    def dump_text(self):
+        """当前dump的全部文本, 供其它插件(如提示词模板)使用"""
+        return self.dump_document.text()
+
+    def dump_file_text(self, path):
+        """
+        dump中某个文件的段, path 可以是完整路径, 相对于读取目录的路径或文件名,
+        找不到时返回None
+        """
+        index = self.dump_document.find_section(path)
+        if index is None:
+            suffix = os.sep + os.path.normpath(path).lstrip(os.sep)
+            for i, section in enumerate(self.dump_document.sections):
+                # 只匹配文件段, 目录段的 header_line 为0
+                if section.header_line and section.key and section.key.endswith(suffix):
+                    index = i
+                    break
+        return self.dump_document.section_text(index) if index is not None else None
+        
+    def update_progress(self, files_done, bytes_done, tokens_done, elapsed):
+        if self.sender() is not self.worker:
+            return
+        # 吞吐量, 便于针对不同机器调整线程数
+        elapsed = max(elapsed, 1e-6)
+        files_rate = files_done / elapsed
+        mb_rate = bytes_done / (1024 * 1024) / elapsed
+        text = (f"Files: {files_done}  Bytes: {bytes_done}  Tokens: ~{tokens_done}  "
+                f"({files_rate:.1f} files/s, {mb_rate:.2f} MB/s)")
+        if self.content_cache is not None:
+            text += f"  Cache: {self.content_cache.hits} hits / {self.content_cache.misses} misses"
+        self.progress_label.setText(text)
+        
+    def cancel_reading(self):
+        for worker in (self.worker, self.directory_worker):
+            if worker is not None and worker.isRunning():
+                worker.cancel()
+                worker.wait()
+            
+    def on_reading_finished(self):
+        worker = self.sender()
+        if worker is not self.worker:
+            return
+        status = "Cancelled" if worker.is_cancelled() else "Done"
+        self.progress_label.setText(f"{status} - {self.progress_label.text()}")
+        self.cancel_button.setEnabled(False)
+        self.record_read_timing(worker)
+        self.update_watching()
+        
+    def record_read_timing(self, worker):
+        """记录从开始读取到界面显示完成的耗时, 包括文件数, 字节数和缓存命中"""
+        if self.main_window is None or self.read_started_at is None:
+            return
+        fields = {
+            "bytes": worker.stats.bytes,
+            "items": worker.stats.files,
+            "tokens": worker.stats.tokens,
+            "cancelled": worker.is_cancelled(),
+        }
+        if self.content_cache is not None:
+            fields["cache_hits"] = self.content_cache.hits
+            fields["cache_misses"] = self.content_cache.misses
+        self.main_window.record_timing("file_reader.read_folder_content",
+                                       time.perf_counter() - self.read_started_at, **fields)
+        
+    def update_watching(self):
+        """根据监视开关和读取状态开始或停止监视"""
+        reading = self.worker is not None and self.worker.isRunning()
+        if self.watch_check.isChecked() and self.live_dump is not None and not reading \
+                and not self.worker.is_cancelled():
+            self.start_watching()
+        else:
+            self.stop_watching()
+            
+    def start_watching(self):
+        self.stop_watching()
+        directories, files = self.live_dump.watched_paths()
+        # 文件监视会占用系统资源(如 inotify 句柄), 超出上限的文件只能通过目录变化发现
+        files = files[:self.MAX_WATCHED_FILES]
+        if directories or files:
+            failed = set(self.watcher.addPaths(directories + files))
+            self.watched_directories = {path for path in directories if path not in failed}
+            self.watched_files = {path for path in files if path not in failed}
             
-            content.append(f"Directory: {root}")
-            for file in files:
-                if not self.should_skip_file(file, os.path.join(root, file)):
-                    file_path = os.path.join(root, file)
-                    content.append(f"\nFile: {file}")
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            file_content = f.read()
-                            content.append("Content:")
-                            content.append(file_content)
-                            content.append("-" * 80)
-                    except Exception as e:
-                        content.append(f"Error reading file: {str(e)}")
-                    
-        self.text_edit.setText("\n".join(content))
+    def stop_watching(self):
+        self.watch_timer.stop()
+        self.pending_changes.clear()
+        if self.directory_worker is not None:
+            self.directory_worker.cancel()
+            self.directory_worker.wait()
+            self.directory_worker = None
+        self.directory_results = []
+        if self.live_dump is not None:
+            self.live_dump.pending_directories.clear()
+        watched = self.watcher.files() + self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+        self.watched_files.clear()
+        self.watched_directories.clear()
+            
+    def on_path_changed(self, path):
+        # 编辑器保存时可能连续触发多个事件, 等待一段时间后统一处理
+        self.pending_changes.add(path)
+        self.watch_timer.start()
+        
+    def apply_pending_changes(self):
+        if self.live_dump is None or (self.worker is not None and self.worker.isRunning()):
+            return
+        paths = sorted(self.pending_changes)
+        self.pending_changes.clear()
+        changes = []
+        for path in paths:
+            if path in self.live_dump.directories:
+                changes.extend(self.live_dump.refresh_directory(path))
+            else:
+                changes.extend(self.live_dump.refresh_file(path))
+        self.apply_dump_changes(changes)
+        self.start_directory_read()
+        
+    def apply_dump_changes(self, changes):
+        """把 LiveDump 返回的变更同步到大纲和文件监视"""
+        if not changes:
+            return
+        
+        still_watched = None
+        for op, index, section in changes:
+            if op == 'insert':
+                self.outline.insertItem(index, self.create_outline_item(section))
+                if section.key is not None:
+                    self.watch_path(section.key)
+            elif op == 'remove':
+                self.outline.takeItem(index)
+                if section.key is not None:
+                    self.unwatch_path(section.key)
+            elif op == 'replace' and section.key is not None:
+                # 保存时以替换方式写入的文件会脱离监视, 每批变更只查询一次 watcher 的列表
+                if still_watched is None:
+                    still_watched = set(self.watcher.files())
+                if section.key not in still_watched:
+                    self.watched_files.discard(section.key)
+                    self.watch_path(section.key)
+        self.viewer.document_changed()
+        self.progress_label.setText(f"Updated {len(changes)} sections at {time.strftime('%H:%M:%S')}")
+        
+    def watch_path(self, path):
+        """加入监视: 目录总是监视, 文件数达到 MAX_WATCHED_FILES 后不再加入"""
+        if path in self.live_dump.directories:
+            if path not in self.watched_directories and self.watcher.addPath(path):
+                self.watched_directories.add(path)
+        elif path not in self.watched_files and len(self.watched_files) < self.MAX_WATCHED_FILES:
+            if self.watcher.addPath(path):
+                self.watched_files.add(path)
+
+    def unwatch_path(self, path):
+        if path in self.watched_files:
+            self.watched_files.discard(path)
+        elif path in self.watched_directories:
+            self.watched_directories.discard(path)
+        else:
+            return
+        self.watcher.removePath(path)
+
+    def start_directory_read(self):
+        """在后台逐个读取新增的子目录, 避免大目录阻塞界面"""
+        if self.live_dump is None or (self.directory_worker is not None and self.directory_worker.isRunning()):
+            return
+        pending = self.live_dump.take_pending_directory()
+        if pending is None:
+            return
+        path, context = pending
+        self.directory_results = []
+        self.directory_worker = FolderReadWorker(path, self.live_dump.reader, self, context)
+        self.directory_worker.chunk_ready.connect(self.collect_directory_chunk)
+        self.directory_worker.finished.connect(self.on_directory_read_finished)
+        self.directory_worker.start()
+        
+    def collect_directory_chunk(self, results):
+        if self.sender() is not self.directory_worker:
+            return
+        self.directory_results.extend(results)
+        
+    def on_directory_read_finished(self):
+        worker = self.sender()
+        if worker is not self.directory_worker:
+            return
+        results, self.directory_results = self.directory_results, []
+        if not worker.is_cancelled():
+            self.apply_dump_changes(self.live_dump.insert_directory(worker.folder_path, results))
+            # 读取期间子目录中可能又有变化, 插入后按普通目录变化再对比一次
+            self.on_path_changed(worker.folder_path)
+        self.start_directory_read()
 
 class file_readerPlugin:
     def __init__(self):
@@ -280,6 +782,7 @@ class file_readerPlugin:
     def initialize(self, main_window):
         self.main_window = main_window
         self.widget = FileReaderWidget()
+        self.widget.main_window = main_window
         self.main_window.layout.addWidget(self.widget)
         
     def get_menu_items(self):
@@ -0,0 +1,10 @@
+from .cache import DEFAULT_CACHE_MAX_MB, ContentCache
+from .document import DumpDocument, DumpSection
+from .dump import DumpStats, dump_folder, iter_dump
+from .engine import (DEFAULT_WORKERS, PRIORITY_RECENT, PRIORITY_SMALLEST, PRIORITY_TREE, FolderReader, ReadResult,
+                     is_binary, read_file)
+from .filters import FilterMatcher, IgnoreContext, IgnoreRules
+from .settings import (CACHE_FILE, DEFAULT_EXCLUDED_EXTENSIONS, DEFAULT_EXCLUDED_FILES, SETTINGS_FILE,
+                       ReaderSettings)
+from .tokens import estimate_tokens, estimate_tokens_from_size
+from .watch import LiveDump
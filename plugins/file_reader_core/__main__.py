@@ -0,0 +1,87 @@
+import os
+import sys
+import argparse
+from .dump import dump_folder
+from .engine import PRIORITY_RECENT, PRIORITY_SMALLEST, PRIORITY_TREE
+from .settings import CACHE_FILE, SETTINGS_FILE, ReaderSettings
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m plugins.file_reader_core",
+        description="Dump folder contents without starting the GUI"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    dump = subparsers.add_parser("dump", help="dump a folder to stdout or a file")
+    dump.add_argument("folder", help="folder to dump")
+    dump.add_argument("-o", "--output", help="output file (default: stdout)")
+    dump.add_argument("--settings", default=SETTINGS_FILE,
+                      help=f"settings file with filters and limits (default: {SETTINGS_FILE})")
+    dump.add_argument("--workers", type=int, help="number of reader threads")
+    dump.add_argument("--token-budget", type=int, help="skip files that do not fit in this many tokens (0 = unlimited)")
+    dump.add_argument("--priority", choices=[PRIORITY_TREE, PRIORITY_SMALLEST, PRIORITY_RECENT],
+                      help="which files to keep first when a token budget is set")
+    dump.add_argument("--no-cache", action="store_true", help="do not use the content cache")
+    dump.add_argument("--no-dedupe", action="store_true", help="emit duplicate file contents in full")
+    dump.add_argument("--no-ignore-files", action="store_true", help="ignore .gitignore/.ignore files")
+    dump.add_argument("-q", "--quiet", action="store_true", help="do not print the summary to stderr")
+    return parser
+
+
+def run_dump(args):
+    if not os.path.isdir(args.folder):
+        print(f"Not a directory: {args.folder}", file=sys.stderr)
+        return 2
+    settings = ReaderSettings.load(args.settings)
+    if args.workers is not None:
+        settings.read_workers = args.workers
+    if args.token_budget is not None:
+        settings.token_budget = args.token_budget
+    if args.priority is not None:
+        settings.budget_priority = args.priority
+    if args.no_dedupe:
+        settings.deduplicate = False
+    if args.no_ignore_files:
+        settings.use_ignore_files = False
+
+    # 缓存文件与设置文件放在同一目录
+    cache = None
+    if not args.no_cache:
+        cache = settings.open_cache(os.path.join(os.path.dirname(os.path.abspath(args.settings)), CACHE_FILE))
+    reader = settings.create_reader(cache=cache)
+
+    try:
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as out:
+                stats = dump_folder(args.folder, out, reader)
+        else:
+            sys.stdout.reconfigure(encoding='utf-8')
+            stats = dump_folder(args.folder, sys.stdout, reader)
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+    except BrokenPipeError:
+        # 输出被管道另一端提前关闭(例如 head), 不再输出
+        sys.stdout = open(os.devnull, 'w')
+        return 1
+    finally:
+        if cache is not None:
+            cache.close()
+
+    if not args.quiet:
+        summary = stats.summary()
+        if cache is not None:
+            summary += f"  Cache: {cache.hits} hits / {cache.misses} misses"
+        print(summary, file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "dump":
+        return run_dump(args)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
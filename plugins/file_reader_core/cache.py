@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import threading
+
+DEFAULT_CACHE_MAX_MB = 256
+# 缓存表结构版本, 不一致时丢弃旧缓存
+SCHEMA_VERSION = 3
+
+
+class ContentCache:
+    """
+    持久化的文件内容缓存, 以 绝对路径 + 大小 + mtime_ns 作为键,
+    保存解码后的文本, 读取错误或跳过原因, 超出容量时按最近最少使用淘汰
+    """
+    def __init__(self, db_path, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._clock = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS entries")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " content TEXT,"
+            " error TEXT,"
+            " skipped TEXT,"
+            " digest TEXT,"
+            " bytes INTEGER NOT NULL,"
+            " last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT COALESCE(MAX(last_used), 0), COALESCE(SUM(bytes), 0) FROM entries").fetchone()
+        self._clock, self.total_bytes = row
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, size, mtime_ns):
+        """返回 (content, error, skipped, digest), 未命中时返回None"""
+        key = os.path.abspath(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, content, error, skipped, digest FROM entries WHERE path = ?", (key,)
+            ).fetchone()
+            if row is None or row[0] != size or row[1] != mtime_ns:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._clock += 1
+            self._conn.execute("UPDATE entries SET last_used = ? WHERE path = ?", (self._clock, key))
+            return row[2], row[3], row[4], row[5]
+
+    def put(self, path, size, mtime_ns, content, error=None, skipped=None, digest=None):
+        key = os.path.abspath(path)
+        entry_bytes = len(content.encode('utf-8', errors='replace')) if content else 0
+        entry_bytes += len(key) + len(error or '') + len(skipped or '')
+        # 单个条目超过容量时不缓存
+        if entry_bytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._conn.execute("SELECT bytes FROM entries WHERE path = ?", (key,)).fetchone()
+            if old is not None:
+                self.total_bytes -= old[0]
+            self._clock += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries"
+                " (path, size, mtime_ns, content, error, skipped, digest, bytes, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, size, mtime_ns, content, error, skipped, digest, entry_bytes, self._clock)
+            )
+            self.total_bytes += entry_bytes
+
+    def commit(self):
+        """淘汰超出容量的条目并提交到磁盘"""
+        with self._lock:
+            if self.total_bytes > self.max_bytes:
+                rows = self._conn.execute("SELECT path, bytes FROM entries ORDER BY last_used")
+                evict = []
+                for path, entry_bytes in rows:
+                    if self.total_bytes <= self.max_bytes:
+                        break
+                    evict.append((path,))
+                    self.total_bytes -= entry_bytes
+                self._conn.executemany("DELETE FROM entries WHERE path = ?", evict)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self.total_bytes = 0
+            self.reset_stats()
+
+    def close(self):
+        self.commit()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,180 @@
+import tempfile
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+
+class DumpSection:
+    """dump中的一段文本(一个目录头或一个文件), 正文保存在临时文件中"""
+    __slots__ = ('key', 'label', 'offset', 'nbytes', 'nlines', 'max_line_length', 'header_line')
+
+    def __init__(self, key, label, header_line=0):
+        self.key = key
+        self.label = label
+        self.header_line = header_line  # 标题行在本段中的行号
+        self.offset = 0
+        self.nbytes = 0
+        self.nlines = 0
+        self.max_line_length = 0
+
+
+class DumpDocument:
+    """
+    按段保存的dump文档, 正文写入磁盘上的临时文件, 内存中只保留段索引和
+    少量最近访问过的段, 各段之间以换行连接
+    """
+    # 内存中缓存的已解码段数量
+    CACHED_SECTIONS = 64
+    # 被替换/删除的段留下的无用字节超过该值且多于有效字节时压缩临时文件
+    COMPACT_THRESHOLD = 4 * 1024 * 1024
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._end = 0
+        self._dead = 0               # 临时文件中不再被任何段引用的字节数
+        self.sections = []
+        self._index = {}             # key -> 段序号
+        self._line_starts = array('q')  # 每段起始行号
+        self._dirty = False          # 插入/删除/替换段之后需要重建索引
+        self._line_count = 0
+        self.max_line_length = 0
+        self._cache = OrderedDict()  # 段序号 -> 行列表
+
+    def clear(self):
+        self._file.seek(0)
+        self._file.truncate()
+        self._end = 0
+        self._dead = 0
+        self.sections = []
+        self._index = {}
+        self._line_starts = array('q')
+        self._dirty = False
+        self._line_count = 0
+        self.max_line_length = 0
+        self._cache.clear()
+
+    def close(self):
+        self._file.close()
+
+    def _write(self, section, text):
+        data = text.encode('utf-8')
+        self._file.seek(self._end)
+        self._file.write(data)
+        section.offset = self._end
+        section.nbytes = len(data)
+        self._end += len(data)
+        lines = text.split('\n')
+        section.nlines = len(lines)
+        section.max_line_length = max(len(line) for line in lines)
+        self.max_line_length = max(self.max_line_length, section.max_line_length)
+
+    def append_section(self, key, text, label=None, header_line=0):
+        section = DumpSection(key, label, header_line)
+        self._write(section, text)
+        if key is not None:
+            self._index[key] = len(self.sections)
+        self.sections.append(section)
+        if not self._dirty:
+            self._line_starts.append(self._line_count)
+            self._line_count += section.nlines
+        return section
+
+    def _reindex(self):
+        if not self._dirty:
+            return
+        self._line_starts = array('q')
+        self._index = {}
+        line = 0
+        for i, section in enumerate(self.sections):
+            self._line_starts.append(line)
+            line += section.nlines
+            if section.key is not None:
+                self._index[section.key] = i
+        self._line_count = line
+        self._dirty = False
+
+    @property
+    def line_count(self):
+        self._reindex()
+        return self._line_count
+
+    def find_section(self, key):
+        """返回key对应的段序号, 不存在时返回None"""
+        self._reindex()
+        return self._index.get(key)
+
+    def section_start_line(self, index):
+        self._reindex()
+        return self._line_starts[index]
+
+    def section_text(self, index):
+        section = self.sections[index]
+        self._file.seek(section.offset)
+        return self._file.read(section.nbytes).decode('utf-8')
+
+    def _section_lines(self, index):
+        lines = self._cache.get(index)
+        if lines is None:
+            lines = self.section_text(index).split('\n')
+            self._cache[index] = lines
+            if len(self._cache) > self.CACHED_SECTIONS:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(index)
+        return lines
+
+    def line(self, line_no):
+        self._reindex()
+        index = bisect_right(self._line_starts, line_no) - 1
+        if index < 0 or line_no >= self._line_count:
+            return ""
+        return self._section_lines(index)[line_no - self._line_starts[index]]
+
+    def text(self, start_line=0, end_line=None):
+        """返回 [start_line, end_line) 范围内的文本, 默认返回全部"""
+        self._reindex()
+        if end_line is None or end_line > self._line_count:
+            end_line = self._line_count
+        if start_line == 0 and end_line == self._line_count:
+            return "\n".join(self.section_text(i) for i in range(len(self.sections)))
+        return "\n".join(self.line(n) for n in range(start_line, end_line))
+
+    def _compact(self):
+        """无用字节过多时把各段复制到新的临时文件中"""
+        if self._dead < self.COMPACT_THRESHOLD or self._dead < self._end - self._dead:
+            return
+        new_file = tempfile.TemporaryFile()
+        end = 0
+        for section in self.sections:
+            self._file.seek(section.offset)
+            new_file.write(self._file.read(section.nbytes))
+            section.offset = end
+            end += section.nbytes
+        self._file.close()
+        self._file = new_file
+        self._end = end
+        self._dead = 0
+
+    def replace_section(self, index, text):
+        """用新文本替换一段, 旧文本留在临时文件中, 无用字节过多时压缩"""
+        section = self.sections[index]
+        self._dead += section.nbytes
+        self._write(section, text)
+        self._cache.pop(index, None)
+        self._dirty = True
+        self._compact()
+
+    def insert_section(self, index, key, text, label=None, header_line=0):
+        section = DumpSection(key, label, header_line)
+        self._write(section, text)
+        self.sections.insert(index, section)
+        self._cache.clear()
+        self._dirty = True
+        return section
+
+    def remove_section(self, index):
+        self._dead += self.sections[index].nbytes
+        del self.sections[index]
+        self._cache.clear()
+        self._dirty = True
+        self._compact()
@@ -0,0 +1,50 @@
+import time
+from .engine import ReadResult
+
+
+class DumpStats:
+    """一次dump的统计信息"""
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.tokens = 0
+        self.started_at = time.monotonic()
+
+    def add(self, result):
+        if result.kind == ReadResult.FILE:
+            self.files += 1
+            self.bytes += result.size
+            self.tokens += result.tokens
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def summary(self):
+        elapsed = max(self.elapsed, 1e-6)
+        return (f"Files: {self.files}  Bytes: {self.bytes}  Tokens: ~{self.tokens}  "
+                f"({self.files / elapsed:.1f} files/s, {self.bytes / (1024 * 1024) / elapsed:.2f} MB/s)")
+
+
+def iter_dump(folder_path, reader, stats=None, is_cancelled=None):
+    """
+    逐段产出dump文本, 各段之间用换行连接即为完整的输出
+    """
+    for result in reader.iter_results(folder_path, is_cancelled):
+        if stats is not None:
+            stats.add(result)
+        yield result.format()
+
+
+def dump_folder(folder_path, out, reader, is_cancelled=None):
+    """
+    将文件夹的dump流式写入 out, 内存占用与文件夹大小无关, 返回 DumpStats
+    """
+    stats = DumpStats()
+    first = True
+    for chunk in iter_dump(folder_path, reader, stats, is_cancelled):
+        if not first:
+            out.write("\n")
+        out.write(chunk)
+        first = False
+    return stats
@@ -0,0 +1,446 @@
+import os
+import codecs
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .filters import IgnoreContext
+from .tokens import estimate_tokens, estimate_tokens_from_size
+
+# 与 ThreadPoolExecutor 的默认值一致, 读取以IO为主, 线程数可以多于CPU核数
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# 二进制检测只读取文件开头的字节数
+SNIFF_BYTES = 8192
+# 开头部分无效UTF-8字符所占比例超过该值即视为二进制文件
+BINARY_INVALID_RATIO = 0.1
+
+# 短于该长度的文件不做去重, 引用行本身并不比内容短
+DEDUPE_MIN_CHARS = 64
+
+# token预算模式下选择文件的优先级
+PRIORITY_TREE = "tree"          # 按目录顺序, 放不下的文件跳过
+PRIORITY_SMALLEST = "smallest"  # 优先读取小文件
+PRIORITY_RECENT = "recent"      # 优先读取最近修改的文件
+
+
+class ReadResult:
+    """一个目录或文件的读取结果"""
+    DIRECTORY = "directory"
+    FILE = "file"
+    NOTICE = "notice"
+
+    def __init__(self, kind, path, name=None):
+        self.kind = kind
+        self.path = path
+        self.name = name
+        self.content = None
+        self.error = None
+        self.skipped = None  # 跳过原因, 例如二进制文件或超出大小限制
+        self.size = 0
+        self.mtime_ns = 0
+        self.tokens = 0
+        self.digest = None        # 原始字节的哈希值, 用于去重
+        self.duplicate_of = None  # 内容相同的第一个文件路径
+        self.cached = False
+
+    def format(self):
+        """按照原有的dump格式生成文本"""
+        if self.kind == self.DIRECTORY:
+            return f"Directory: {self.path}"
+        if self.kind == self.NOTICE:
+            return f"\n{self.name}"
+        if self.duplicate_of is not None:
+            return f"\nFile: {self.name}\nSame content as {self.duplicate_of}"
+        if self.content is not None:
+            lines = [f"\nFile: {self.name} (~{self.tokens} tokens)"]
+        else:
+            lines = [f"\nFile: {self.name}"]
+        if self.skipped is not None:
+            lines.append(f"Skipped: {self.skipped}")
+        elif self.error is not None:
+            lines.append(f"Error reading file: {self.error}")
+        else:
+            lines.append("Content:")
+            lines.append(self.content)
+            lines.append("-" * 80)
+        return "\n".join(lines)
+
+
+def is_binary(head):
+    """
+    根据文件开头的字节判断是否为二进制文件: 含有NUL字节, 或无效UTF-8比例过高
+    """
+    if not head:
+        return False
+    if b'\x00' in head:
+        return True
+    # 使用增量解码, 避免把截断在末尾的多字节字符算作无效字符
+    text = codecs.getincrementaldecoder('utf-8')(errors='replace').decode(head, final=False)
+    if not text:
+        return False
+    return text.count('\ufffd') / len(text) > BINARY_INVALID_RATIO
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """与 read_file 相同的内容哈希, 分块读取"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_file(result, max_file_size=0):
+    """读取单个文件, 在线程池中执行"""
+    try:
+        with open(result.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            result.size = stat.st_size
+            result.mtime_ns = stat.st_mtime_ns
+            if max_file_size and result.size > max_file_size:
+                result.skipped = f"file too large ({result.size} bytes)"
+                return result
+            head = f.read(SNIFF_BYTES)
+            if is_binary(head):
+                result.skipped = "binary file"
+                return result
+            data = head + f.read()
+        result.digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        content = data.decode('utf-8')
+        # 与文本模式读取一致, 统一换行符
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        result.content = content
+        result.tokens = estimate_tokens(content)
+    except Exception as e:
+        result.error = str(e)
+    return result
+
+
+class FolderReader:
+    """
+    使用 os.scandir 枚举目录, 在有界线程池中并行读取文件,
+    输出顺序与 os.walk 的遍历顺序保持一致
+    """
+    def __init__(self, matcher, workers=DEFAULT_WORKERS, use_ignore_files=True, cache=None,
+                 max_file_size=0, max_total_size=0, token_budget=0, budget_priority=PRIORITY_TREE,
+                 deduplicate=False):
+        self.matcher = matcher
+        self.workers = max(1, int(workers))
+        self.use_ignore_files = use_ignore_files
+        self.cache = cache
+        # 单个文件和全部文件的大小上限(字节), 0表示不限制
+        self.max_file_size = max_file_size
+        self.max_total_size = max_total_size
+        # token预算, 0表示不限制
+        self.token_budget = token_budget
+        self.budget_priority = budget_priority
+        # 内容相同的文件只输出一次
+        self.deduplicate = deduplicate
+
+    def iter_entries(self, folder_path, is_cancelled=None, context=None):
+        """
+        按 os.walk(topdown=True) 的顺序枚举目录和文件,
+        被忽略的目录整体剪枝, 不会再被枚举
+        """
+        stack = [(folder_path, context or IgnoreContext(folder_path))]
+        while stack:
+            if is_cancelled and is_cancelled():
+                return
+            root, context = stack.pop()
+            scanned = self.scan_directory(root, context)
+            if scanned is None:
+                # 与 os.walk 一致, 无法访问的目录直接忽略
+                continue
+            files, subdirs = scanned
+            yield ReadResult(ReadResult.DIRECTORY, root)
+            yield from files
+            # 倒序入栈, 保证先处理第一个子目录
+            stack.extend(reversed(subdirs))
+
+    def context_for(self, folder_path, directory):
+        """
+        构造 directory 的父目录链上生效的忽略规则, 用于单独扫描某个子目录
+        """
+        context = IgnoreContext(folder_path)
+        if not self.use_ignore_files:
+            return context
+        rel_path = os.path.relpath(directory, folder_path)
+        current = folder_path
+        if rel_path != os.curdir:
+            for part in rel_path.split(os.sep)[:-1]:
+                context = context.child(current)
+                current = os.path.join(current, part)
+            context = context.child(current)
+        return context
+
+    def scan_directory(self, root, context):
+        """
+        扫描单个目录, 返回 (文件ReadResult列表, [(子目录, 忽略规则)]), 无法访问时返回None
+        context 为父目录的忽略规则, 本目录的规则在这里加载
+        """
+        if self.use_ignore_files:
+            context = context.child(root)
+        try:
+            with os.scandir(root) as it:
+                entries = list(it)
+        except OSError:
+            return None
+
+        files = []
+        subdirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if self.matcher.skip_directory(entry.name):
+                    continue
+                if self.use_ignore_files and context.is_ignored(entry.path, True):
+                    continue
+                # 与 os.walk(followlinks=False) 一致, 不进入符号链接目录
+                try:
+                    if not entry.is_symlink():
+                        subdirs.append((entry.path, context))
+                except OSError:
+                    pass
+            elif self.matcher.skip_file(entry.name):
+                continue
+            elif self.use_ignore_files and context.is_ignored(entry.path, False):
+                continue
+            else:
+                result = ReadResult(ReadResult.FILE, entry.path, entry.name)
+                try:
+                    stat = entry.stat()
+                    result.size = stat.st_size
+                    result.mtime_ns = stat.st_mtime_ns
+                except OSError:
+                    pass
+                files.append(result)
+        return files, subdirs
+
+    def iter_results(self, folder_path, is_cancelled=None, context=None):
+        """
+        并行读取文件内容, 按枚举顺序逐个产出 ReadResult
+        context 为父目录链上的忽略规则, 只读取子目录时使用
+        """
+        budget_skipped = []  # 因token预算跳过的文件, 最后统一说明
+        entries = self.iter_entries(folder_path, is_cancelled, context)
+        if self.token_budget and self.budget_priority != PRIORITY_TREE:
+            entries = self._select_by_priority(list(entries), budget_skipped)
+        results = self._read_entries(entries, folder_path, is_cancelled, budget_skipped)
+        if self.deduplicate:
+            # 先去重, 重复文件不占用token预算
+            results = self._deduplicate(results, folder_path)
+        if self.token_budget:
+            results = self._apply_token_budget(results, folder_path, budget_skipped)
+        return results
+
+    def _budget_notice(self, folder_path, skipped_files):
+        message = f"Skipped {skipped_files} files: token budget of {self.token_budget} tokens reached"
+        return ReadResult(ReadResult.NOTICE, folder_path, message)
+
+    def _will_skip(self, result):
+        """
+        规划预算前判断文件是否会被跳过(超出大小限制或二进制), 跳过的文件不输出内容,
+        不占用预算; 只读取文件开头的 SNIFF_BYTES 字节
+        """
+        if self.max_file_size and result.size > self.max_file_size:
+            result.skipped = f"file too large ({result.size} bytes)"
+            return True
+        try:
+            with open(result.path, 'rb') as f:
+                head = f.read(SNIFF_BYTES)
+        except OSError:
+            return False
+        if is_binary(head):
+            result.skipped = "binary file"
+            return True
+        return False
+
+    def _select_by_priority(self, entries, budget_skipped):
+        """
+        按优先级挑选能放进token预算的文件, 放不下的文件跳过后继续挑选,
+        只读取被选中的文件, 输出仍保持目录顺序
+        """
+        files = [r for r in entries if r.kind == ReadResult.FILE and not self._will_skip(r)]
+        if self.budget_priority == PRIORITY_SMALLEST:
+            files.sort(key=lambda r: r.size)
+        elif self.budget_priority == PRIORITY_RECENT:
+            files.sort(key=lambda r: r.mtime_ns, reverse=True)
+
+        if self.deduplicate:
+            self._fill_digests(files)
+        rejected = set()
+        planned = {}
+        planned_tokens = 0
+        for result in files:
+            tokens = self._planned_tokens(result, planned)
+            if planned_tokens + tokens > self.token_budget:
+                rejected.add(id(result))
+                budget_skipped.append(result)
+                continue
+            planned_tokens += tokens
+            self._plan(result, planned)
+        return [r for r in entries if id(r) not in rejected]
+
+    def _fill_digests(self, files):
+        """
+        计算大小相同的文件的哈希, 规划预算时可以确定哪些文件会被去重;
+        大小唯一的文件不可能重复, 不需要读取
+        """
+        sizes = {}
+        for result in files:
+            sizes[result.size] = sizes.get(result.size, 0) + 1
+        for result in files:
+            if sizes[result.size] < 2 or result.size < DEDUPE_MIN_CHARS:
+                continue
+            cached = self.cache.get(result.path, result.size, result.mtime_ns) \
+                if self.cache is not None and result.mtime_ns else None
+            if cached is not None:
+                result.digest = cached[3]
+            else:
+                try:
+                    result.digest = file_digest(result.path)
+                except OSError:
+                    pass
+
+    def _planned_tokens(self, result, planned):
+        """
+        读取前估算一个文件占用的token数(下限), planned 记录已计划读取的文件;
+        会被跳过的文件计为0, 去重时与已计划的文件内容相同的文件只输出引用, 按引用的token数计算.
+        哈希未知时大小相同即按重复计算, 实际用量由去重之后的 _apply_token_budget 控制
+        """
+        if result.skipped is not None:
+            return 0
+        if not self.deduplicate or result.size < DEDUPE_MIN_CHARS:
+            return estimate_tokens_from_size(result.size)
+        original = planned.get((result.size, result.digest))
+        if original is not None:
+            return estimate_tokens(original)
+        return estimate_tokens_from_size(result.size)
+
+    def _plan(self, result, planned):
+        """记录放进预算的文件, 之后内容相同的文件按引用计算"""
+        if self.deduplicate and result.skipped is None and result.size >= DEDUPE_MIN_CHARS:
+            planned.setdefault((result.size, result.digest), result.path)
+
+    def _deduplicate(self, results, folder_path):
+        """重复内容只保留第一次出现的文件, 其余输出为引用, 最后附上节省的统计"""
+        seen = {}
+        duplicates = 0
+        saved_bytes = 0
+        saved_tokens = 0
+        for result in results:
+            if result.kind == ReadResult.FILE and result.digest and result.content is not None \
+                    and len(result.content) >= DEDUPE_MIN_CHARS:
+                original = seen.get(result.digest)
+                if original is None:
+                    seen[result.digest] = result.path
+                else:
+                    duplicates += 1
+                    saved_bytes += result.size
+                    saved_tokens += result.tokens
+                    result.duplicate_of = original
+                    result.content = None
+                    result.tokens = estimate_tokens(original)
+            yield result
+        if duplicates:
+            yield ReadResult(
+                ReadResult.NOTICE, folder_path,
+                f"Deduplicated {duplicates} files: saved {saved_bytes} bytes, ~{saved_tokens} tokens"
+            )
+
+    def _apply_token_budget(self, results, folder_path, budget_skipped):
+        """
+        按实际估算的token数累计, 放不下的文件跳过, 引用被跳过文件的重复文件一起跳过;
+        最后说明读取前后因预算跳过的文件数
+        """
+        used_tokens = 0
+        dropped = set()
+        for result in results:
+            if result.kind == ReadResult.FILE and result.tokens:
+                if used_tokens + result.tokens > self.token_budget or result.duplicate_of in dropped:
+                    dropped.add(result.path)
+                    budget_skipped.append(result)
+                    continue
+                used_tokens += result.tokens
+            yield result
+        if budget_skipped:
+            yield self._budget_notice(folder_path, len(budget_skipped))
+
+    def _read_entries(self, entries, folder_path, is_cancelled=None, budget_skipped=None):
+        # 预读窗口, 限制同时驻留在内存中的文件数量
+        window = self.workers * 4
+        pending = deque()
+        planned_size = 0
+        planned_tokens = 0
+        planned = {}
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            for result in entries:
+                if result.kind == ReadResult.FILE and result.skipped is None:
+                    # 根据枚举时得到的大小先行判断, 超出限制的文件不会被读入内存;
+                    # 预算模式下先判断二进制文件, 它们不占用预算
+                    if self.max_file_size and result.size > self.max_file_size:
+                        result.skipped = f"file too large ({result.size} bytes)"
+                    elif self.token_budget and self.budget_priority == PRIORITY_TREE and self._will_skip(result):
+                        pass
+                    elif self.max_total_size and planned_size + result.size > self.max_total_size:
+                        pending.append(ReadResult(
+                            ReadResult.NOTICE, folder_path,
+                            f"Skipped remaining files: total size limit of {self.max_total_size} bytes reached"
+                        ))
+                        break
+                    elif self.token_budget:
+                        tokens = self._planned_tokens(result, planned)
+                        if planned_tokens + tokens > self.token_budget:
+                            # 放不下的文件跳过, 之后更小的文件可能还放得下
+                            budget_skipped.append(result)
+                            result = None
+                        else:
+                            self._plan(result, planned)
+                            planned_size += result.size
+                            planned_tokens += tokens
+                    else:
+                        planned_size += result.size
+                    if result is not None and result.skipped is None and not self._load_cached(result):
+                        result = executor.submit(read_file, result, self.max_file_size)
+                if result is not None:
+                    pending.append(result)
+                while len(pending) > window:
+                    yield self._resolve(pending.popleft())
+                if is_cancelled and is_cancelled():
+                    return
+            while pending:
+                if is_cancelled and is_cancelled():
+                    return
+                yield self._resolve(pending.popleft())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if self.cache is not None:
+                self.cache.commit()
+
+    def _load_cached(self, result):
+        """尝试从缓存中填充结果, 命中时返回True"""
+        if self.cache is None or not result.mtime_ns:
+            return False
+        cached = self.cache.get(result.path, result.size, result.mtime_ns)
+        if cached is None:
+            return False
+        result.content, result.error, result.skipped, result.digest = cached
+        result.tokens = estimate_tokens(result.content)
+        result.cached = True
+        return True
+
+    def _resolve(self, item):
+        if isinstance(item, ReadResult):
+            return item
+        result = item.result()
+        # 超出大小限制的跳过结果取决于当前设置, 不写入缓存
+        too_large = self.max_file_size and result.size > self.max_file_size
+        if self.cache is not None and result.mtime_ns and not too_large:
+            self.cache.put(result.path, result.size, result.mtime_ns, result.content, result.error, result.skipped,
+                           result.digest)
+        return result
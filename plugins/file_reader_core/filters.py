@@ -0,0 +1,173 @@
+import os
+import re
+import fnmatch
+
+# 每个目录中读取的忽略规则文件, 后面的优先级更高
+IGNORE_FILES = ('.gitignore', '.ignore')
+
+
+class FilterMatcher:
+    """
+    将排除列表预编译成精确文件名集合, 扩展名集合和一个合并的正则表达式,
+    避免对每个文件都遍历全部规则
+    """
+    def __init__(self, excluded_files, excluded_extensions):
+        self.names = set()
+        wildcard_patterns = []
+        for pattern in excluded_files:
+            if any(c in pattern for c in '*?['):
+                wildcard_patterns.append(fnmatch.translate(pattern))
+            else:
+                self.names.add(pattern)
+        self.extensions = {ext.lower() for ext in excluded_extensions}
+        self.wildcard_regex = None
+        if wildcard_patterns:
+            self.wildcard_regex = re.compile('|'.join(wildcard_patterns))
+
+    def skip_file(self, file_name):
+        if file_name in self.names:
+            return True
+        if os.path.splitext(file_name)[1].lower() in self.extensions:
+            return True
+        return self.wildcard_regex is not None and self.wildcard_regex.match(file_name) is not None
+
+    def skip_directory(self, dir_name):
+        if dir_name in self.names:
+            return True
+        return self.wildcard_regex is not None and self.wildcard_regex.match(dir_name) is not None
+
+
+def translate_ignore_pattern(pattern):
+    """
+    将 gitignore 模式转换为匹配相对路径(以/分隔)的正则表达式
+    """
+    # 模式中间或开头含有/时相对于忽略文件所在目录匹配, 否则匹配任意层级
+    anchored = '/' in pattern
+    if pattern.startswith('/'):
+        pattern = pattern[1:]
+
+    result = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern[i:i + 3] == '**/':
+                result.append('(?:.*/)?')
+                i += 3
+                continue
+            if pattern[i:i + 2] == '**':
+                result.append('.*')
+                i += 2
+                continue
+            result.append('[^/]*')
+        elif c == '?':
+            result.append('[^/]')
+        elif c == '[':
+            j = pattern.find(']', i + 2)
+            if j == -1:
+                result.append(re.escape(c))
+            else:
+                chars = pattern[i + 1:j]
+                if chars.startswith('!'):
+                    chars = '^' + chars[1:]
+                result.append('[' + chars.replace('\\', '\\\\') + ']')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            result.append(re.escape(pattern[i]))
+        else:
+            result.append(re.escape(c))
+        i += 1
+
+    body = ''.join(result)
+    if not anchored:
+        body = '(?:.*/)?' + body
+    return body + r'\Z'
+
+
+class IgnoreRules:
+    """一个目录中 .gitignore/.ignore 文件编译后的规则"""
+    def __init__(self, lines):
+        self.rules = []  # [(regex, negate, dir_only)], 后面的规则优先
+        for line in lines:
+            line = line.rstrip('\n').rstrip('\r')
+            # 去掉未转义的行尾空格
+            while line.endswith(' ') and not line.endswith('\\ '):
+                line = line[:-1]
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            elif line.startswith('\\'):
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            self.rules.append((re.compile(translate_ignore_pattern(line)), negate, dir_only))
+        self.has_negation = any(negate for _, negate, _ in self.rules)
+        # 没有取反规则时, 用一个合并的正则一次判断
+        self.combined = {}
+        if not self.has_negation:
+            for dir_only in (False, True):
+                patterns = [r.pattern for r, _, d in self.rules if not d or dir_only]
+                self.combined[dir_only] = re.compile('|'.join(patterns)) if patterns else None
+
+    @classmethod
+    def load(cls, directory):
+        """读取目录中的忽略文件, 没有规则时返回None"""
+        lines = []
+        for ignore_file in IGNORE_FILES:
+            try:
+                with open(os.path.join(directory, ignore_file), 'r', encoding='utf-8', errors='replace') as f:
+                    lines.extend(f.readlines())
+            except OSError:
+                continue
+        rules = cls(lines)
+        return rules if rules.rules else None
+
+    def match(self, rel_path, is_dir):
+        """
+        返回 True(忽略), False(明确不忽略) 或 None(没有规则匹配)
+        """
+        if not self.has_negation:
+            regex = self.combined[is_dir]
+            if regex is not None and regex.match(rel_path):
+                return True
+            return None
+        for regex, negate, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                return not negate
+        return None
+
+
+class IgnoreContext:
+    """
+    目录遍历过程中生效的忽略规则链, 子目录的规则优先于父目录
+    """
+    def __init__(self, base_dir, rules=None, parent=None):
+        self.base_dir = base_dir
+        self.rules = rules
+        self.parent = parent
+
+    def child(self, directory):
+        rules = IgnoreRules.load(directory)
+        if rules is None:
+            return self
+        return IgnoreContext(directory, rules, self)
+
+    def is_ignored(self, path, is_dir):
+        context = self
+        while context is not None:
+            if context.rules is not None:
+                rel_path = path[len(context.base_dir):].lstrip(os.sep)
+                if os.sep != '/':
+                    rel_path = rel_path.replace(os.sep, '/')
+                result = context.rules.match(rel_path, is_dir)
+                if result is not None:
+                    return result
+            context = context.parent
+        return False
@@ -0,0 +1,129 @@
+import os
+import json
+from .cache import DEFAULT_CACHE_MAX_MB, ContentCache
+from .engine import DEFAULT_WORKERS, PRIORITY_TREE, FolderReader
+from .filters import FilterMatcher
+
+SETTINGS_FILE = "file_reader_settings.json"
+CACHE_FILE = "file_reader_cache.db"
+
+# 默认排除的文件和文件夹
+DEFAULT_EXCLUDED_FILES = {
+    '.DS_Store',      # macOS系统文件
+    'Thumbs.db',      # Windows缩略图缓存
+    'desktop.ini',    # Windows系统文件
+    '__pycache__',    # Python编译缓存
+    '.git',           # Git版本控制文件
+    '.idea',          # PyCharm项目文件
+    '.vscode',        # VSCode项目文件
+    '*.pyc',          # Python编译文件
+    '*.pyo',          # Python优化文件
+    '*.pyd',          # Python DLL文件
+    '.pytest_cache',  # Pytest缓存
+    '__init__.py',    # Python包初始化文件
+    '*.swp',          # Vim临时文件
+    '*.swo',          # Vim临时文件
+    '.gitignore',     # Git忽略文件
+    '.env',           # 环境变量文件
+    'node_modules',   # Node.js模块目录
+    'venv',           # Python虚拟环境
+    'env',            # Python虚拟环境
+    '.venv',          # Python虚拟环境
+}
+
+# 默认排除的文件扩展名
+DEFAULT_EXCLUDED_EXTENSIONS = {
+    '.log',           # 日志文件
+    '.tmp',           # 临时文件
+    '.temp',          # 临时文件
+    '.bak',           # 备份文件
+    '.cache',         # 缓存文件
+    '.class',         # Java编译文件
+    '.o',            # C/C++目标文件
+    '.obj',          # 目标文件
+    '.dll',          # 动态链接库
+    '.exe',          # 可执行文件
+    '.so',           # 共享库文件
+}
+
+
+class ReaderSettings:
+    """file_reader_settings.json 中保存的读取设置, 界面和命令行共用"""
+    def __init__(self):
+        self.excluded_files = set(DEFAULT_EXCLUDED_FILES)
+        self.excluded_extensions = set(DEFAULT_EXCLUDED_EXTENSIONS)
+        # 并行读取文件的线程数
+        self.read_workers = DEFAULT_WORKERS
+        # 是否遵循目录中的 .gitignore/.ignore 文件
+        self.use_ignore_files = True
+        # 内容缓存容量, 0表示不使用缓存
+        self.cache_max_mb = DEFAULT_CACHE_MAX_MB
+        # 单个文件和全部文件的大小上限, 0表示不限制
+        self.max_file_size_kb = 1024
+        self.max_total_size_mb = 0
+        # token预算, 0表示不限制
+        self.token_budget = 0
+        self.budget_priority = PRIORITY_TREE
+        # 内容相同的文件只输出一次
+        self.deduplicate = True
+
+    @classmethod
+    def load(cls, path=SETTINGS_FILE):
+        settings = cls()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                settings.update(json.load(f))
+        return settings
+
+    def update(self, data):
+        # 排除规则与默认值合并
+        self.excluded_files.update(data.get('excluded_files', set()))
+        self.excluded_extensions.update(data.get('excluded_extensions', set()))
+        self.read_workers = data.get('read_workers', self.read_workers)
+        self.use_ignore_files = data.get('use_ignore_files', self.use_ignore_files)
+        self.cache_max_mb = data.get('cache_max_mb', self.cache_max_mb)
+        self.max_file_size_kb = data.get('max_file_size_kb', self.max_file_size_kb)
+        self.max_total_size_mb = data.get('max_total_size_mb', self.max_total_size_mb)
+        self.token_budget = data.get('token_budget', self.token_budget)
+        self.budget_priority = data.get('budget_priority', self.budget_priority)
+        self.deduplicate = data.get('deduplicate', self.deduplicate)
+
+    def to_dict(self):
+        return {
+            'excluded_files': list(self.excluded_files),
+            'excluded_extensions': list(self.excluded_extensions),
+            'read_workers': self.read_workers,
+            'use_ignore_files': self.use_ignore_files,
+            'cache_max_mb': self.cache_max_mb,
+            'max_file_size_kb': self.max_file_size_kb,
+            'max_total_size_mb': self.max_total_size_mb,
+            'token_budget': self.token_budget,
+            'budget_priority': self.budget_priority,
+            'deduplicate': self.deduplicate
+        }
+
+    def save(self, path=SETTINGS_FILE):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def create_matcher(self):
+        return FilterMatcher(self.excluded_files, self.excluded_extensions)
+
+    def open_cache(self, path=CACHE_FILE):
+        """按照设置打开内容缓存, 未启用时返回None"""
+        if self.cache_max_mb <= 0:
+            return None
+        return ContentCache(path, self.cache_max_mb * 1024 * 1024)
+
+    def create_reader(self, matcher=None, cache=None):
+        return FolderReader(
+            matcher or self.create_matcher(),
+            self.read_workers,
+            self.use_ignore_files,
+            cache,
+            self.max_file_size_kb * 1024,
+            self.max_total_size_mb * 1024 * 1024,
+            self.token_budget,
+            self.budget_priority,
+            self.deduplicate
+        )
@@ -0,0 +1,18 @@
+import math
+
+
+def estimate_tokens(text):
+    """
+    快速估算文本的token数: ASCII字符约4个一个token, 其它字符(如中文)按每字符一个token计算
+    """
+    if not text:
+        return 0
+    ascii_count = len(text.encode('ascii', errors='ignore'))
+    return math.ceil(ascii_count / 4) + (len(text) - ascii_count)
+
+
+def estimate_tokens_from_size(size):
+    """
+    根据文件字节数估算token数的下限, 用于读取前的预算规划
+    """
+    return size // 4
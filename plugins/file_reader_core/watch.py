@@ -0,0 +1,226 @@
+import os
+from .engine import DEDUPE_MIN_CHARS, ReadResult, read_file
+from .tokens import estimate_tokens
+
+
+class LiveDump:
+    """
+    维护一个可以按文件局部更新的dump: 记录每个文件读取时的大小和修改时间,
+    文件或目录发生变化时只重新读取受影响的段;
+    去重时记录重复文件引用的原文件, 原文件变化或删除后重新读取引用它的文件
+    """
+    def __init__(self, document, reader, folder_path):
+        self.document = document
+        self.reader = reader
+        self.folder_path = folder_path
+        self.file_stats = {}     # 文件路径 -> (size, mtime_ns)
+        self.directories = set()
+        self.originals = {}      # 内容哈希 -> 输出完整内容的文件路径
+        self.file_digests = {}   # 输出完整内容的文件路径 -> 内容哈希
+        self.duplicates = {}     # 输出为引用的文件路径 -> 原文件路径
+        self.references = {}     # 原文件路径 -> {引用它的文件路径}
+        self.pending_directories = []  # 等待在后台读取的新子目录 [(path, context)]
+
+    def section_for(self, result):
+        """返回 (key, label, header_line, text)"""
+        text = result.format()
+        if result.kind == ReadResult.DIRECTORY:
+            return result.path, result.path, 0, text
+        if result.kind == ReadResult.FILE:
+            # 文件段以空行开头, 标题在第二行
+            return result.path, result.name, 1, text
+        return None, text.strip(), 0, text
+
+    def append(self, result):
+        key, label, header_line, text = self.section_for(result)
+        self._record(result)
+        return self.document.append_section(key, text, label, header_line)
+
+    def _record(self, result):
+        if result.kind == ReadResult.FILE:
+            self.file_stats[result.path] = (result.size, result.mtime_ns)
+            self._untrack(result.path)
+            if result.duplicate_of is not None:
+                self.duplicates[result.path] = result.duplicate_of
+                self.references.setdefault(result.duplicate_of, set()).add(result.path)
+            elif result.digest and result.content is not None:
+                self.originals.setdefault(result.digest, result.path)
+                self.file_digests[result.path] = result.digest
+        elif result.kind == ReadResult.DIRECTORY:
+            self.directories.add(result.path)
+
+    def _untrack(self, path):
+        """去掉文件作为原文件或引用的记录, 引用它的文件由 _reread_references 处理"""
+        digest = self.file_digests.pop(path, None)
+        if digest is not None and self.originals.get(digest) == path:
+            del self.originals[digest]
+        original = self.duplicates.pop(path, None)
+        if original is not None:
+            references = self.references.get(original)
+            if references is not None:
+                references.discard(path)
+                if not references:
+                    del self.references[original]
+
+    def _forget(self, key):
+        self.file_stats.pop(key, None)
+        self.directories.discard(key)
+        self._untrack(key)
+
+    def _read(self, result):
+        """重新读取单个文件; 去重时内容与已输出的文件相同则输出为引用"""
+        result = read_file(result, self.reader.max_file_size)
+        if self.reader.deduplicate and result.digest and result.content is not None \
+                and len(result.content) >= DEDUPE_MIN_CHARS:
+            original = self.originals.get(result.digest)
+            if original is not None and original != result.path:
+                result.duplicate_of = original
+                result.content = None
+                result.tokens = estimate_tokens(original)
+        return result
+
+    def _reread_references(self, original, changes):
+        """
+        原文件变化或删除后, 按文档顺序重新读取引用它的文件:
+        第一个文件输出完整内容, 其余内容仍然相同的文件改为引用它
+        """
+        paths = self.references.pop(original, set())
+        indexed = [(self.document.find_section(path), path) for path in paths]
+        for index, path in sorted((index, path) for index, path in indexed if index is not None):
+            result = self._read(ReadResult(ReadResult.FILE, path, os.path.basename(path)))
+            self._record(result)
+            self.document.replace_section(index, result.format())
+            changes.append(('replace', index, self.document.sections[index]))
+
+    def _in_subtree(self, key, directory):
+        return key is not None and (key == directory or key.startswith(directory.rstrip(os.sep) + os.sep))
+
+    def _insert(self, index, result, changes):
+        key, label, header_line, text = self.section_for(result)
+        self._record(result)
+        section = self.document.insert_section(index, key, text, label, header_line)
+        changes.append(('insert', index, section))
+
+    def _remove(self, index, changes):
+        section = self.document.sections[index]
+        self._forget(section.key)
+        self.document.remove_section(index)
+        changes.append(('remove', index, section))
+        if section.key in self.references:
+            self._reread_references(section.key, changes)
+
+    def refresh_file(self, path):
+        """
+        文件被修改或删除后更新对应的段, 返回变更列表 [(操作, 段序号, DumpSection)]
+        """
+        changes = []
+        index = self.document.find_section(path)
+        if index is None or path not in self.file_stats:
+            # 新文件由所在目录的变化处理
+            return self.refresh_directory(os.path.dirname(path))
+        if not os.path.isfile(path):
+            self._remove(index, changes)
+            return changes
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return changes
+        if self.file_stats[path] == (stat.st_size, stat.st_mtime_ns):
+            return changes
+        # 先去掉旧内容的记录, 避免新内容被当作自己的重复
+        self._untrack(path)
+        result = self._read(ReadResult(ReadResult.FILE, path, os.path.basename(path)))
+        self._record(result)
+        self.document.replace_section(index, result.format())
+        changes.append(('replace', index, self.document.sections[index]))
+        if path in self.references:
+            self._reread_references(path, changes)
+        return changes
+
+    def refresh_directory(self, directory):
+        """
+        目录中增删了文件或子目录后, 只对比该目录的直接子项并更新变化的段
+        """
+        changes = []
+        if directory not in self.directories:
+            return changes
+        dir_index = self.document.find_section(directory)
+        if dir_index is None:
+            return changes
+
+        scanned = self.reader.scan_directory(directory, self.reader.context_for(self.folder_path, directory))
+        if scanned is None:
+            # 目录本身被删除, 移除整个子树
+            self._remove_subtree(dir_index, directory, changes)
+            return changes
+        files, subdirs = scanned
+        current_files = {result.path: result for result in files}
+        current_dirs = {path for path, _ in subdirs}
+
+        # 本目录的文件段紧跟在目录标题之后
+        index = dir_index + 1
+        while index < len(self.document.sections):
+            key = self.document.sections[index].key
+            if key not in self.file_stats or os.path.dirname(key) != directory:
+                break
+            if key not in current_files:
+                self._remove(index, changes)
+                continue
+            result = current_files.pop(key)
+            if self.file_stats[key] != (result.size, result.mtime_ns):
+                changes.extend(self.refresh_file(key))
+            index += 1
+
+        # 新增的文件追加在本目录文件段的末尾
+        for result in current_files.values():
+            self._insert(index, self._read(result), changes)
+            index += 1
+
+        # 删除已经不存在的子目录
+        index = self.document.find_section(directory) + 1
+        while index < len(self.document.sections):
+            key = self.document.sections[index].key
+            if not self._in_subtree(key, directory):
+                break
+            if key in self.directories and os.path.dirname(key) == directory and key not in current_dirs:
+                self._remove_subtree(index, key, changes)
+                continue
+            index += 1
+
+        # 新增的子目录可能很大, 交给后台读取, 结果由 insert_directory 插入
+        pending = {path for path, _ in self.pending_directories}
+        for path, context in subdirs:
+            if path not in self.directories and path not in pending:
+                self.pending_directories.append((path, context))
+        return changes
+
+    def take_pending_directory(self):
+        """取出一个等待读取的新子目录 (path, context), 没有时返回None"""
+        return self.pending_directories.pop(0) if self.pending_directories else None
+
+    def insert_directory(self, path, results):
+        """
+        新子目录在后台读取完成后, 把它的段追加在父目录子树的末尾, 返回变更列表;
+        父目录已被移除, 子目录已被删除或已经插入时忽略这些结果
+        """
+        changes = []
+        parent = os.path.dirname(path)
+        if path in self.directories or parent not in self.directories or not os.path.isdir(path):
+            return changes
+        index = self.document.find_section(parent)
+        if index is None:
+            return changes
+        index += 1
+        while index < len(self.document.sections) and self._in_subtree(self.document.sections[index].key, parent):
+            index += 1
+        for result in results:
+            self._insert(index, result, changes)
+            index += 1
+        return changes
+
+    def _remove_subtree(self, index, directory, changes):
+        while index < len(self.document.sections) and self._in_subtree(self.document.sections[index].key, directory):
+            self._remove(index, changes)
+
+    def watched_paths(self):
+        return list(self.directories), list(self.file_stats)
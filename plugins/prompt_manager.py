@@ -1,43 +1,23 @@
 # plugins/prompt_manager.py
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QTextEdit, QPushButton, 
                            QHBoxLayout, QLabel, QApplication, QFileDialog,
-                           QMenu, QDialog, QComboBox, QMessageBox)
-from PyQt6.QtCore import Qt, QByteArray
-import json
+                           QMenu, QDialog, QComboBox, QMessageBox, QTreeView,
+                           QLineEdit, QListWidget, QListWidgetItem, QSpinBox,
+                           QCheckBox, QFormLayout, QProgressDialog, QInputDialog)
+from PyQt6.QtCore import Qt, QByteArray, QTimer, QEvent, QThread, pyqtSignal
 from PyQt6.QtCore import Qt, QMimeData, QByteArray
 import os
-from datetime import datetime
+import shutil
+from contextlib import nullcontext
 from PyQt6.QtCore import QUrl
-import base64
-import win32gui
-import win32con
-import win32api
-import time
-from PyQt6.QtGui import QIcon
-
-class PromptGroup:
-    def __init__(self):
-        self.prompts = []
-        self.files = []  # 存储文件路径
-        self.file_metadata = {}  # 存储文件元数据 {path: {"content": base64_content, "name": name}}
-        self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    def to_dict(self):
-        return {
-            'prompts': self.prompts,
-            'files': self.files,
-            'file_metadata': self.file_metadata,
-            'timestamp': self.timestamp
-        }
-
-    @classmethod
-    def from_dict(cls, data):
-        group = cls()
-        group.prompts = data['prompts']
-        group.files = data['files']
-        group.file_metadata = data.get('file_metadata', {})
-        group.timestamp = data['timestamp']
-        return group
+from PyQt6.QtGui import QIcon, QStandardItemModel, QStandardItem
+from plugins.prompt_manager_core import (ArchiveStore, BlobStore, FileIndex, HistoryStore, HistoryWriter,
+                                         PromptGroup, PromptSettings, RecallIndex, PasteBackend,
+                                         PasteDispatcher, PasteRequest, WindowKeystrokeBackend,
+                                         PASTE_FILE, PASTE_TEXT, build_recall_index, compile_template)
+from plugins.prompt_manager_core.templates import SOURCE_DUMP, SOURCE_FILE, SOURCE_FILES
+from plugins.prompt_manager_core.paste import win32gui
+from plugins.prompt_manager_core.recall import normalize_prompt
 
 class WindowSelector(QDialog):
     def __init__(self, parent=None):
@@ -107,15 +87,191 @@ class PasteTargetDialog(QDialog):
         confirm_button.clicked.connect(self.accept)
         layout.addWidget(confirm_button)
 
-class PromptManagerWidget(QWidget):
+class HistorySettingsDialog(QDialog):
+    """历史保留策略设置, 以及立即压缩历史"""
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.parent = parent
+        self.setWindowTitle("历史设置")
+        layout = QVBoxLayout(self)
+
+        form = QFormLayout()
+        self.keep_groups_spin = QSpinBox()
+        self.keep_groups_spin.setRange(0, 1000000)
+        self.keep_groups_spin.setSpecialValueText("不限制")
+        self.keep_groups_spin.setValue(parent.settings.keep_groups)
+        form.addRow("保留最近的分组数:", self.keep_groups_spin)
+        self.keep_days_spin = QSpinBox()
+        self.keep_days_spin.setRange(0, 36500)
+        self.keep_days_spin.setSpecialValueText("不限制")
+        self.keep_days_spin.setValue(parent.settings.keep_days)
+        form.addRow("保留最近的天数:", self.keep_days_spin)
+        self.max_attachment_spin = QSpinBox()
+        self.max_attachment_spin.setRange(0, 1024 * 1024)
+        self.max_attachment_spin.setSuffix(" MB")
+        self.max_attachment_spin.setSpecialValueText("不限制")
+        self.max_attachment_spin.setValue(parent.settings.max_attachment_mb)
+        form.addRow("附件大小上限:", self.max_attachment_spin)
+        layout.addLayout(form)
+        layout.addWidget(QLabel("超出保留范围的分组在启动和压缩时移到归档中, 仍然可以搜索和恢复"))
+
+        buttons = QHBoxLayout()
+        compact_btn = QPushButton("立即压缩")
+        compact_btn.clicked.connect(self.compact)
+        save_btn = QPushButton("保存")
+        save_btn.clicked.connect(self.save_and_close)
+        buttons.addWidget(compact_btn)
+        buttons.addStretch()
+        buttons.addWidget(save_btn)
+        layout.addLayout(buttons)
+
+    def apply(self):
+        self.parent.settings.keep_groups = self.keep_groups_spin.value()
+        self.parent.settings.keep_days = self.keep_days_spin.value()
+        self.parent.settings.max_attachment_mb = self.max_attachment_spin.value()
+        self.parent.save_settings()
+
+    def compact(self):
+        self.apply()
+        self.parent.compact_history()
+
+    def save_and_close(self):
+        self.apply()
+        self.accept()
+
+class TemplateVariablesDialog(QDialog):
+    """填写模板中的变量"""
+    def __init__(self, variables, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("填写模板变量")
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.inputs = {}
+        for name in variables:
+            edit = QTextEdit()
+            edit.setMaximumHeight(60)
+            form.addRow(f"{name}:", edit)
+            self.inputs[name] = edit
+        layout.addLayout(form)
+        confirm_button = QPushButton("确认")
+        confirm_button.clicked.connect(self.accept)
+        layout.addWidget(confirm_button)
+
+    def values(self):
+        return {name: edit.toPlainText() for name, edit in self.inputs.items()}
+
+
+class PromptInputBackend(PasteBackend):
+    """粘贴到当前prompt输入框"""
+    name = "当前prompt输入框"
+
+    def __init__(self, prompt_input):
+        self.prompt_input = prompt_input
+
+    def steps(self, request):
+        if request.kind == PASTE_FILE:
+            return [(0, lambda: self.prompt_input.setText('file:///' + request.payload))]
+        return [(0, lambda: self.prompt_input.setText(request.payload))]
+
+
+class ClipboardBackend(PasteBackend):
+    """复制到系统剪贴板, 文件以URL的形式复制"""
+    name = "系统剪贴板"
+
+    def copy(self, request):
+        clipboard = QApplication.clipboard()
+        if request.kind == PASTE_FILE:
+            mime_data = QMimeData()
+            mime_data.setUrls([QUrl.fromLocalFile(request.payload)])
+            clipboard.setMimeData(mime_data)
+        else:
+            clipboard.setText(request.payload)
+
+    def steps(self, request):
+        return [(0, lambda: self.copy(request))]
+
+
+class RecallLoadWorker(QThread):
+    """在后台线程中加载召回索引, 使用单独的数据库连接, 不影响启动"""
+    loaded = pyqtSignal(object)  # RecallIndex, 加载失败时为None
+
+    def __init__(self, db_path, backfill, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.backfill = backfill
+
+    def run(self):
+        index = None
+        store = None
+        try:
+            store = HistoryStore(self.db_path)
+            index = build_recall_index(store, self.backfill)
+        except Exception as e:
+            print(f"Error loading recall index: {e}")
+        finally:
+            if store is not None:
+                store.close()
+        self.loaded.emit(index)
+
+
+# 历史视图中条目的类型和内容
+ITEM_KIND_ROLE = Qt.ItemDataRole.UserRole + 1
+ITEM_VALUE_ROLE = Qt.ItemDataRole.UserRole + 2
+ITEM_GROUP = "group"
+ITEM_FILES = "files"
+ITEM_PROMPTS = "prompts"
+ITEM_FILE = "file"
+ITEM_PROMPT = "prompt"
+ITEM_ARCHIVED = "archived"  # 搜索结果中已归档的分组
+
+class PromptManagerWidget(QWidget):
+    # 后台写入丢弃了记录, 从写入线程发出, 在界面线程中提示
+    history_error = pyqtSignal(str)
+    # 后台写入完成一批记录, 从写入线程发出
+    history_written = pyqtSignal()
+    # 启动时和每次滚动到底部时加载的分组数
+    HISTORY_PAGE_SIZE = 50
+    SEARCH_LIMIT = 200
+    # 召回面板显示的条目数, 首次建立召回索引时导入的历史提示词数
+    RECALL_PANEL_SIZE = 50
+    RECALL_BACKFILL = 1000
+    # 输入至少这么多字符后显示补全
+    SUGGEST_MIN_CHARS = 2
+    # 超过这个大小的附件在保存时显示进度
+    PROGRESS_MIN_BYTES = 16 * 1024 * 1024
+
+    def __init__(self, parent=None, main_window=None):
+        super().__init__(parent)
+        # 用于读取 File Reader 的dump和记录耗时, 在加载历史之前设置
+        self.main_window = main_window
         self.groups = []
         self.current_group = None
         self.selected_window_handle = None
+        self.store = None  # 界面线程读取历史用
+        self.writer = None  # 新增的记录由后台线程合并写入
+        self.blobs = BlobStore()
+        self.archive = ArchiveStore()
+        self.settings = PromptSettings.load()
+        self.has_more_history = False
+        self.group_items = {}  # 分组编号 -> 历史视图中的分组条目
+        self.file_index = FileIndex()  # 附件路径 -> 最早的元数据和使用它的已加载分组
+        self.recall = RecallIndex()  # 常用提示词和输入补全, 在后台加载完成后替换
+        self.recall_worker = None
+        self.recall_persisted = False  # 加载失败时召回只保存在内存中
+        self.pending_recall = []  # 加载期间发送的提示词, 加载完成后记录
+        # 发送按顺序排队, 等待窗口激活等延迟用定时器完成, 不阻塞界面
+        self.paste_dispatcher = PasteDispatcher(QTimer.singleShot)
+        self.templates = {}  # 模板名称 -> 内容
         self.init_ui()
+        self.history_error.connect(self.show_history_error)
+        self.history_written.connect(self.on_history_written)
+        self.search_after_write = False  # 搜索时还有未写入的记录, 写入后重新搜索
         self.load_history()
         self.new_group()
+        # 退出前写入还在队列中的记录
+        app = QApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.close_history)
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -124,7 +280,6 @@ class PromptManagerWidget(QWidget):
         target_layout = QHBoxLayout()
         target_label = QLabel("粘贴目标:")
         self.target_combo = QComboBox()
-        self.target_combo.addItems(["当前prompt输入框", "系统剪贴板", "选择的窗口"])
         target_layout.addWidget(target_label)
         target_layout.addWidget(self.target_combo)
         
@@ -134,11 +289,24 @@ class PromptManagerWidget(QWidget):
         target_layout.addWidget(self.select_window_btn)
         
         target_layout.addStretch()
+        # 上一次发送的耗时
+        self.send_status = QLabel("")
+        target_layout.addWidget(self.send_status)
         layout.addLayout(target_layout)
 
         self.prompt_input = QTextEdit()
+        self.prompt_input.textChanged.connect(self.update_suggestions)
+        # Tab 接受第一条补全
+        self.prompt_input.installEventFilter(self)
         layout.addWidget(self.prompt_input)
 
+        # 输入补全: 按前缀匹配使用过的提示词
+        self.suggestion_list = QListWidget()
+        self.suggestion_list.setMaximumHeight(120)
+        self.suggestion_list.itemClicked.connect(self.accept_suggestion)
+        self.suggestion_list.setVisible(False)
+        layout.addWidget(self.suggestion_list)
+
         buttons = QHBoxLayout()
         self.confirm_button = QPushButton("Confirm")
         self.new_group_button = QPushButton("New Group")
@@ -149,14 +317,89 @@ class PromptManagerWidget(QWidget):
         buttons.addWidget(self.confirm_button)
         buttons.addWidget(self.new_group_button)
         buttons.addWidget(self.add_file_button)
+        self.history_settings_button = QPushButton("History Settings")
+        self.history_settings_button.clicked.connect(self.show_history_settings)
+        buttons.addWidget(self.history_settings_button)
         layout.addLayout(buttons)
 
-        self.history_view = QTextEdit()
-        self.history_view.setReadOnly(True)
+        # 提示词模板: {{变量}}, {{dump}}, {{dump:路径}}, {{files}}, {{file:文件名}}
+        template_layout = QHBoxLayout()
+        template_layout.addWidget(QLabel("模板:"))
+        self.template_combo = QComboBox()
+        self.template_combo.setMinimumWidth(150)
+        template_layout.addWidget(self.template_combo)
+        use_template_btn = QPushButton("使用模板")
+        use_template_btn.clicked.connect(self.use_template)
+        template_layout.addWidget(use_template_btn)
+        save_template_btn = QPushButton("保存为模板")
+        save_template_btn.clicked.connect(self.save_as_template)
+        template_layout.addWidget(save_template_btn)
+        delete_template_btn = QPushButton("删除模板")
+        delete_template_btn.clicked.connect(self.delete_template)
+        template_layout.addWidget(delete_template_btn)
+        template_layout.addStretch()
+        layout.addLayout(template_layout)
+
+        # 搜索历史: 关键词, 日期范围和附件文件名
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("搜索提示词")
+        self.search_input.setToolTip("空格分隔多个词; 三个字符以上的词和两个字的中日韩词使用全文索引, "
+                                     "其它更短的词需要逐条比较, 历史很多时较慢")
+        self.search_since = QLineEdit()
+        self.search_since.setPlaceholderText("开始日期 YYYY-MM-DD")
+        self.search_until = QLineEdit()
+        self.search_until.setPlaceholderText("结束日期 YYYY-MM-DD")
+        self.search_file = QLineEdit()
+        self.search_file.setPlaceholderText("附件文件名")
+        search_layout.addWidget(self.search_input, 2)
+        search_layout.addWidget(self.search_since, 1)
+        search_layout.addWidget(self.search_until, 1)
+        search_layout.addWidget(self.search_file, 1)
+        self.search_archive = QCheckBox("包括归档")
+        search_layout.addWidget(self.search_archive)
+        layout.addLayout(search_layout)
+
+        # 输入停止后再搜索, 避免每个按键都查询一次
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.run_search)
+        for edit in (self.search_input, self.search_since, self.search_until, self.search_file):
+            edit.textChanged.connect(self.search_timer.start)
+        self.search_archive.toggled.connect(self.search_timer.start)
+
+        self.search_results = QListWidget()
+        self.search_results.itemClicked.connect(self.on_search_result_clicked)
+        self.search_results.setVisible(False)
+        layout.addWidget(self.search_results)
+
+        # 召回面板: 按使用频率和时间排序, 相同和相近的提示词合并为一条
+        layout.addWidget(QLabel("常用提示词:"))
+        self.recall_list = QListWidget()
+        self.recall_list.setMaximumHeight(150)
+        self.recall_list.itemClicked.connect(self.use_recalled_prompt)
+        layout.addWidget(self.recall_list)
+
+        # 历史视图: 每个分组/文件/提示词对应一个条目, 新增时增量更新
+        self.history_model = QStandardItemModel(self)
+        self.history_view = QTreeView()
+        self.history_view.setModel(self.history_model)
+        self.history_view.setHeaderHidden(True)
+        self.history_view.setEditTriggers(QTreeView.EditTrigger.NoEditTriggers)
         self.history_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.history_view.customContextMenuRequested.connect(self.show_context_menu)
+        # 滚动到底部时加载更早的分组
+        self.history_view.verticalScrollBar().valueChanged.connect(self.on_history_scrolled)
         layout.addWidget(self.history_view)
 
+        # 粘贴目标, 不支持的目标(如非Windows系统上的选择的窗口)不显示
+        clipboard_backend = ClipboardBackend()
+        self.paste_dispatcher.register(PromptInputBackend(self.prompt_input))
+        self.paste_dispatcher.register(clipboard_backend)
+        self.paste_dispatcher.register(WindowKeystrokeBackend(clipboard_backend, lambda: self.selected_window_handle))
+        self.target_combo.addItems(self.paste_dispatcher.available_targets())
+
         # 连接目标选择改变事件
         self.target_combo.currentTextChanged.connect(self.on_target_changed)
         # 初始显示/隐藏选择窗口按钮
@@ -175,86 +418,186 @@ class PromptManagerWidget(QWidget):
     def on_target_changed(self, text):
         self.select_window_btn.setVisible(text == "选择的窗口")
 
-    def save_file_metadata(self, file_path):
+    def save_file_metadata(self, file_path, group=None):
+        group = group or self.current_group
+        progress = None
         try:
-            with open(file_path, 'rb') as f:
-                content = base64.b64encode(f.read()).decode('utf-8')
-                self.current_group.file_metadata[file_path] = {
-                    "content": content,
+            stat = os.stat(file_path)
+            limit = self.settings.max_attachment_mb * 1024 * 1024
+            reference = limit > 0 and stat.st_size > limit
+            if reference:
+                QMessageBox.warning(
+                    self, "附件过大",
+                    f"{os.path.basename(file_path)} 大小为 {stat.st_size / 1024 / 1024:.1f} MB, "
+                    f"超过附件上限 {self.settings.max_attachment_mb} MB。\n"
+                    f"只记录文件路径和哈希, 不保存内容, 恢复时需要原文件仍然存在且没有修改。"
+                )
+
+            progress_callback = None
+            if stat.st_size >= self.PROGRESS_MIN_BYTES:
+                progress = QProgressDialog(f"正在处理 {os.path.basename(file_path)}...", None, 0, 1000, self)
+                progress.setWindowModality(Qt.WindowModality.WindowModal)
+                progress.setMinimumDuration(300)
+
+                def update_progress(done, total):
+                    progress.setValue(int(done * 1000 / total) if total else 1000)
+                    QApplication.processEvents()
+                progress_callback = update_progress
+
+            if reference:
+                # 只记录引用, 内容仍然分块计算哈希, 用于恢复时校验
+                digest, size = self.blobs.hash_file(file_path, progress_callback)
+                group.file_metadata[file_path] = {
+                    "hash": digest,
+                    "size": size,
+                    "name": os.path.basename(file_path),
+                    "reference": True,
+                    "path": file_path,
+                    "mtime": stat.st_mtime
+                }
+            else:
+                # 文件内容分块保存到按哈希命名的blob中, 元数据只记录哈希, 大小和文件名
+                digest, size = self.blobs.put_file(file_path, progress_callback)
+                group.file_metadata[file_path] = {
+                    "hash": digest,
+                    "size": size,
                     "name": os.path.basename(file_path)
                 }
         except Exception as e:
             print(f"Error saving file metadata: {str(e)}")
+        finally:
+            if progress is not None:
+                progress.close()
 
-    def restore_file(self, file_path):
+    def restore_file(self, file_path, dest_path):
+        """从blob存储中把文件内容流式写回 dest_path, 只保存了引用的附件从原文件复制"""
         try:
             metadata = self.get_file_metadata(file_path)
-            if metadata:
-                content = base64.b64decode(metadata["content"])
-                return content
+            if metadata and metadata.get("reference"):
+                source = metadata["path"]
+                if not os.path.exists(source):
+                    return False
+                stat = os.stat(source)
+                # 大小和修改时间不变时认为内容没有变化, 否则重新校验哈希
+                if stat.st_size != metadata["size"] or (
+                        stat.st_mtime != metadata["mtime"] and
+                        self.blobs.hash_file(source)[0] != metadata["hash"]):
+                    return False
+                shutil.copyfile(source, dest_path)
+                return True
+            if metadata and "hash" in metadata:
+                self.blobs.copy_to(metadata["hash"], dest_path)
+                return True
         except Exception as e:
             print(f"Error restoring file: {str(e)}")
-        return None
+        return False
 
-    def get_file_metadata(self, file_path):
-        for group in self.groups:
-            if file_path in group.files:
-                return group.file_metadata.get(file_path)
-        return None
+    def collect_garbage(self):
+        """删除不再被任何分组引用的附件blob"""
+        try:
+            # 队列中的附件记录还没写入时, 它们引用的blob会被误删
+            if not self.save_history():
+                QMessageBox.warning(self, "清理失败", "历史记录还没有全部保存, 请稍后再试")
+                return
+            # 归档的分组恢复时还需要附件内容
+            referenced = self.store.referenced_blobs() | self.archive.referenced_blobs()
+            removed, freed = self.blobs.collect_garbage(referenced)
+            QMessageBox.information(self, "清理完成", f"已删除 {removed} 个未引用的附件, 释放 {freed} 字节")
+        except Exception as e:
+            print(f"Error collecting garbage: {str(e)}")
 
-    def paste_to_window(self, text):
-        if not self.selected_window_handle:
-            QMessageBox.warning(self, "警告", "请先选择目标窗口")
-            return False
-            
+    def show_history_settings(self):
+        HistorySettingsDialog(self).exec()
+
+    def save_settings(self):
         try:
-            # 将文本复制到剪贴板
-            QApplication.clipboard().setText(text)
-            
-            # 获取窗口当前状态
-            window_state = win32gui.IsIconic(self.selected_window_handle)
-            
-            # 如果窗口最小化，恢复它
-            if window_state:
-                win32gui.ShowWindow(self.selected_window_handle, win32con.SW_RESTORE)
-            
-            # 激活窗口
-            win32gui.SetForegroundWindow(self.selected_window_handle)
-            
-            # 稍微延迟以确保窗口已经激活
-            time.sleep(0.1)
-            
-            # 模拟Ctrl+V按键
-            win32api.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            win32api.keybd_event(ord('V'), 0, 0, 0)
-            win32api.keybd_event(ord('V'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
-            
-            # 稍微延迟后模拟回车键
-            time.sleep(0.1)
-            win32api.keybd_event(win32con.VK_RETURN, 0, 0, 0)
-            win32api.keybd_event(win32con.VK_RETURN, 0, win32con.KEYEVENTF_KEYUP, 0)
-            
+            self.settings.save()
+        except Exception as e:
+            print(f"Error saving settings: {str(e)}")
+
+    def apply_retention(self):
+        """按保留策略把旧分组移到归档中, 返回归档的分组数"""
+        if self.store is None or not self.settings.retention_enabled:
+            return 0
+        # 当前分组和还有记录没有写入的分组之后还会写入, 不能归档
+        exclude = set()
+        if self.current_group is not None:
+            exclude.add(self.current_group.id)
+        if self.writer is not None:
+            exclude |= self.writer.pending_groups()
+        count = self.store.archive_groups(self.archive, self.settings.keep_groups, self.settings.keep_days,
+                                          exclude=exclude)
+        if count:
+            print(f"Archived {count} groups")
+        return count
+
+    def compact_history(self):
+        """归档旧分组, 删除未引用的附件并回收数据库空间"""
+        try:
+            if not self.save_history():
+                QMessageBox.warning(self, "压缩失败", "历史记录还没有全部保存, 请稍后再试")
+                return
+            archived = self.apply_retention()
+            referenced = self.store.referenced_blobs() | self.archive.referenced_blobs()
+            removed, freed = self.blobs.collect_garbage(referenced)
+            self.store.vacuum()
+            if archived:
+                self.load_first_page()
+            QMessageBox.information(
+                self, "压缩完成",
+                f"已归档 {archived} 个分组, 删除 {removed} 个未引用的附件, 释放 {freed} 字节"
+            )
+        except Exception as e:
+            print(f"Error compacting history: {str(e)}")
+
+    def restore_archived_group(self, group_id):
+        """把归档中的分组恢复到历史中"""
+        try:
+            record = self.archive.find_record(group_id)
+            if record is None:
+                return False
+            self.save_history()
+            self.store.restore_group(record)
+            self.archive.remove_record(group_id)
+            self.load_first_page()
             return True
-            
         except Exception as e:
-            QMessageBox.warning(self, "错误", f"粘贴到窗口失败: {str(e)}")
+            print(f"Error restoring group: {str(e)}")
             return False
 
-    def show_context_menu(self, position):
-        cursor = self.history_view.cursorForPosition(position)
-        cursor.select(cursor.SelectionType.LineUnderCursor)
-        line_text = cursor.selectedText().strip()
+    def get_file_metadata(self, file_path):
+        """使用过该文件的最早分组中的元数据, 索引在加载历史时载入了全部分组的元数据"""
+        return self.file_index.metadata(file_path)
 
-        if not line_text or line_text.startswith(("===", "Files:", "Prompts:")):
-            return
+    def groups_using(self, file_path):
+        """使用过该文件的分组编号, 还有未加载的分组时也在数据库中查找"""
+        group_ids = {group.id for group in self.file_index.groups_using(file_path)}
+        if self.store is not None and self.has_more_history:
+            group_ids.update(self.store.find_groups_using(file_path))
+        return sorted(group_ids)
+
+    def send(self, payload, kind=PASTE_TEXT, on_success=None):
+        """按当前粘贴目标发送文本或文件, 完成后在界面线程中调用 on_success(request)"""
+        def finished(request):
+            if request.error is not None:
+                QMessageBox.warning(self, "错误", f"粘贴失败: {request.error}")
+                return
+            self.send_status.setText(f"发送耗时 {request.latency * 1000:.0f} ms")
+            if on_success is not None:
+                on_success(request)
+
+        return self.paste_dispatcher.send(self.target_combo.currentText(), PasteRequest(payload, kind, finished))
+
+    def show_context_menu(self, position):
+        item = self.history_model.itemFromIndex(self.history_view.indexAt(position))
+        kind = item.data(ITEM_KIND_ROLE) if item is not None else None
 
         menu = QMenu()
-        if line_text.startswith("- "):  # 文件路径行
-            file_path = line_text[2:]
+        if kind == ITEM_FILE:  # 文件条目
+            file_path = item.data(ITEM_VALUE_ROLE)
             if os.path.exists(file_path):  # 检查文件是否存在
                 paste_file_action = menu.addAction("复制文件到剪贴板")
-                action = menu.exec(self.history_view.mapToGlobal(position))
+                action = menu.exec(self.history_view.viewport().mapToGlobal(position))
                 
                 if action == paste_file_action:
                     clipboard = QApplication.clipboard()
@@ -263,18 +606,21 @@ class PromptManagerWidget(QWidget):
                     data = QMimeData()
                     data.setUrls(urls)
                     clipboard.setMimeData(data)
-        else:  # 提示词行
+        elif kind == ITEM_PROMPT:  # 提示词条目
+            prompt = item.data(ITEM_VALUE_ROLE)
             paste_action = menu.addAction("粘贴此提示词")
-            action = menu.exec(self.history_view.mapToGlobal(position))
+            action = menu.exec(self.history_view.viewport().mapToGlobal(position))
             
             if action == paste_action:
-                target = self.target_combo.currentText()
-                if target == "当前prompt输入框":
-                    self.prompt_input.setText(line_text)
-                elif target == "系统剪贴板":
-                    QApplication.clipboard().setText(line_text)
-                elif target == "选择的窗口":
-                    self.paste_to_window(line_text)
+                self.send(prompt)
+        else:
+            gc_action = menu.addAction("清理未引用的附件")
+            compact_action = menu.addAction("压缩历史")
+            action = menu.exec(self.history_view.viewport().mapToGlobal(position))
+            if action == gc_action:
+                self.collect_garbage()
+            elif action == compact_action:
+                self.compact_history()
 
     def paste_file(self, content, filename):
         target = self.target_combo.currentText()
@@ -295,122 +641,447 @@ class PromptManagerWidget(QWidget):
     def confirm_prompt(self):
         text = self.prompt_input.toPlainText().strip()
         if text and self.current_group:
+            group = self.current_group
             # 检查是否是文件路径
             if text.startswith('file:///'):
                 # 转换文件 URL 为实际路径
                 file_path = text.replace('file:///', '')
                 if os.path.exists(file_path):
-                    # 根据选择的目标执行不同的操作
-                    target = self.target_combo.currentText()
-                    success = True
-                    
-                    if target == "当前prompt输入框":
-                        self.prompt_input.setText(text)
-                    elif target == "系统剪贴板":
-                        # 将文件复制到剪贴板
-                        clipboard = QApplication.clipboard()
-                        mime_data = QMimeData()
-                        url = QUrl.fromLocalFile(file_path)
-                        mime_data.setUrls([url])
-                        clipboard.setMimeData(mime_data)
-                    elif target == "选择的窗口":
-                        if not self.selected_window_handle:
-                            QMessageBox.warning(self, "警告", "请先选择目标窗口")
-                            return
-                        
-                        # 将文件复制到剪贴板
-                        clipboard = QApplication.clipboard()
-                        mime_data = QMimeData()
-                        url = QUrl.fromLocalFile(file_path)
-                        mime_data.setUrls([url])
-                        clipboard.setMimeData(mime_data)
-                        
-                        # 激活窗口并粘贴
-                        if win32gui.IsIconic(self.selected_window_handle):
-                            win32gui.ShowWindow(self.selected_window_handle, win32con.SW_RESTORE)
-                        win32gui.SetForegroundWindow(self.selected_window_handle)
-                        time.sleep(0.1)
-                        
-                        # 模拟Ctrl+V
-                        win32api.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-                        win32api.keybd_event(ord('V'), 0, 0, 0)
-                        win32api.keybd_event(ord('V'), 0, win32con.KEYEVENTF_KEYUP, 0)
-                        win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
-                        time.sleep(0.1)
-                    
-                    if success:
+                    def on_sent(request):
                         # 保存到历史记录
-                        self.current_group.files.append(file_path)
-                        self.save_file_metadata(file_path)
-                        self.prompt_input.clear()
-                        self.update_history()
-                        self.save_history()
+                        self.add_file_to_group(file_path, group)
+                        self.clear_sent_input(text)
+
+                    self.send(file_path, PASTE_FILE, on_sent)
             else:
-                # 原有的文本处理逻辑
-                target = self.target_combo.currentText()
-                success = True
-                
-                if target == "当前prompt输入框":
-                    self.prompt_input.setText(text)
-                elif target == "系统剪贴板":
-                    QApplication.clipboard().setText(text)
-                elif target == "选择的窗口":
-                    success = self.paste_to_window(text)
-                
-                if success:
-                    self.current_group.prompts.append(text)
-                    self.prompt_input.clear()
-                    self.update_history()
-                    self.save_history()
+                def on_sent(request):
+                    group.prompts.append(text)
+                    if self.writer is not None:
+                        self.writer.add_prompt(group, text)
+                    self.add_history_item(group, ITEM_PROMPTS, ITEM_PROMPT, text)
+                    self.record_recall(text)
+                    self.clear_sent_input(text)
+
+                self.send(text, PASTE_TEXT, on_sent)
+
+    def clear_sent_input(self, text):
+        """发送完成时清空输入框; 发送期间已经输入了新内容时保留"""
+        if self.prompt_input.toPlainText().strip() in (text, ""):
+            self.prompt_input.clear()
 
     def new_group(self):
         self.current_group = PromptGroup()
         self.groups.append(self.current_group)
-        self.update_history()
-        self.save_history()
+        if self.writer is not None:
+            self.store.reserve_group_id(self.current_group)
+            self.writer.add_group(self.current_group)
+        # 最新的分组显示在最上面
+        self.insert_group_item(0, self.current_group)
 
     def add_file(self):
         files, _ = QFileDialog.getOpenFileNames(self, "Select Files")
         if files and self.current_group:
+            # 后台写入线程会把这些文件合并在一个事务中写入
             for file_path in files:
-                self.current_group.files.append(file_path)
-                self.save_file_metadata(file_path)
-            self.update_history()
-            self.save_history()
+                self.add_file_to_group(file_path)
+
+    def add_file_to_group(self, file_path, group=None):
+        group = group or self.current_group
+        group.files.append(file_path)
+        self.save_file_metadata(file_path, group)
+        if self.writer is not None:
+            self.writer.add_file(group, file_path, group.file_metadata.get(file_path))
+        self.file_index.add(group, file_path)
+        self.add_history_item(group, ITEM_FILES, ITEM_FILE, file_path)
+
+    def timed(self, name, **fields):
+        """通过主窗口记录一段代码的耗时, 单独运行时不记录"""
+        if self.main_window is None:
+            return nullcontext(fields)
+        return self.main_window.timed(name, **fields)
+
+    def record_write(self, duration, count, error):
+        """HistoryWriter 每次写入后在写入线程中调用"""
+        if self.main_window is not None:
+            self.main_window.record_timing("prompt_manager.write_history", duration,
+                                           items=count, failed=error is not None)
+        if error is None:
+            self.history_written.emit()
+
+    def on_history_written(self):
+        if self.search_after_write:
+            self.search_after_write = False
+            self.run_search()
+
+    def report_dropped_writes(self, dropped):
+        """HistoryWriter 丢弃记录后在写入线程中调用"""
+        details = "\n".join(f"{op}: {error}" for op, error in dropped[:10])
+        self.history_error.emit(f"{len(dropped)} 条历史记录无法保存, 已丢弃:\n{details}")
+
+    def show_history_error(self, message):
+        QMessageBox.warning(self, "保存历史失败", message)
 
     def update_history(self):
-        history_text = []
-        for i, group in enumerate(reversed(self.groups), 1):
-            history_text.append(f"=== Group {len(self.groups)-i+1} ({group.timestamp}) ===")
-            if group.files:
-                history_text.append("Files:")
-                for file in group.files:
-                    history_text.append(f"- {file}")
-            if group.prompts:
-                history_text.append("Prompts:")
-                for prompt in group.prompts:
-                    history_text.append(prompt)
-            history_text.append("\n")
-        self.history_view.setText("\n".join(history_text))
+        """重建整个历史视图, 只在加载历史时使用, 之后的变化都增量更新"""
+        with self.timed("prompt_manager.update_history", items=len(self.groups)):
+            self.history_model.clear()
+            self.group_items = {}
+            for group in reversed(self.groups):
+                self.insert_group_item(self.history_model.rowCount(), group)
+
+    def insert_group_item(self, row, group):
+        group_item = QStandardItem(f"=== Group {group.id} ({group.timestamp}) ===")
+        group_item.setData(ITEM_GROUP, ITEM_KIND_ROLE)
+        group_item.setData(group.id, ITEM_VALUE_ROLE)
+        self.history_model.insertRow(row, group_item)
+        self.group_items[group.id] = group_item
+        for file in group.files:
+            self.add_history_item(group, ITEM_FILES, ITEM_FILE, file)
+        for prompt in group.prompts:
+            self.add_history_item(group, ITEM_PROMPTS, ITEM_PROMPT, prompt)
+        self.history_view.expand(group_item.index())
+
+    def add_history_item(self, group, section_kind, kind, value):
+        """在分组的 Files/Prompts 小节下追加一个条目"""
+        group_item = self.group_items.get(group.id)
+        if group_item is None:
+            return
+        section = None
+        for row in range(group_item.rowCount()):
+            child = group_item.child(row)
+            if child.data(ITEM_KIND_ROLE) == section_kind:
+                section = child
+                break
+        if section is None:
+            section = QStandardItem("Files:" if section_kind == ITEM_FILES else "Prompts:")
+            section.setData(section_kind, ITEM_KIND_ROLE)
+            # 文件小节总是排在提示词小节之前
+            group_item.insertRow(0 if section_kind == ITEM_FILES else group_item.rowCount(), section)
+            self.history_view.expand(section.index())
+
+        # 多行提示词只显示第一行, 完整内容保存在条目中
+        lines = value.splitlines() or [""]
+        label = f"- {value}" if kind == ITEM_FILE else lines[0] + (" ..." if len(lines) > 1 else "")
+        item = QStandardItem(label)
+        item.setToolTip(value)
+        item.setData(kind, ITEM_KIND_ROLE)
+        item.setData(value, ITEM_VALUE_ROLE)
+        section.appendRow(item)
 
     def save_history(self):
-        data = [group.to_dict() for group in self.groups]
+        """
+        立即写入后台队列中的记录并等待完成; 平时新增的记录由 HistoryWriter
+        在改动停止后合并写入, 只有需要读到全部记录时才调用.
+        全部写入时返回True, 失败或超时返回False
+        """
+        if self.writer is None:
+            return True
+        with self.timed("prompt_manager.save_history", items=self.writer.pending_writes):
+            saved = self.writer.flush(timeout=10)
+            if not saved:
+                print(f"Error saving history: {self.writer.pending_writes} pending writes")
+            return saved
+
+    def close_history(self):
+        if self.recall_worker is not None:
+            self.recall_worker.wait()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def persistence_metrics(self):
+        """后台写入的状态: 未写入的记录数, 上次写入耗时等"""
+        if self.writer is None:
+            return {}
+        return self.writer.metrics()
+
+    def load_history(self):
+        with self.timed("prompt_manager.load_history") as span:
+            try:
+                self.store = HistoryStore()
+                # 首次运行时导入旧的 prompt_history.json
+                migrated = self.store.migrate_json()
+                if migrated:
+                    print(f"Migrated {migrated} groups from prompt_history.json")
+                # 旧格式内嵌的base64附件转存到blob存储
+                self.store.migrate_inline_blobs(self.blobs)
+                # 旧版本数据库没有记录用过的最大编号, 不能重新使用已归档分组的编号
+                self.store.ensure_next_group_id(self.archive.max_group_id() + 1)
+                self.store.commit()
+                self.apply_retention()
+                self.load_recall()
+                self.load_templates()
+                self.writer = HistoryWriter(self.store.db_path, on_write=self.record_write,
+                                            on_error=self.report_dropped_writes)
+                self.load_first_page()
+            except Exception as e:
+                print(f"Error loading history: {e}")
+            span["items"] = len(self.groups)
+            if self.store is not None and os.path.exists(self.store.db_path):
+                span["bytes"] = os.path.getsize(self.store.db_path)
+
+    def load_recall(self):
+        """
+        在后台加载召回索引, 第一次运行时从最近的历史提示词建立;
+        索引只保留排名最高的条目, 启动时间不随历史增长
+        """
+        self.recall_worker = RecallLoadWorker(self.store.db_path, self.RECALL_BACKFILL, self)
+        self.recall_worker.loaded.connect(self.on_recall_loaded)
+        self.recall_worker.start()
+
+    def on_recall_loaded(self, index):
+        self.recall_worker = None
+        if index is not None:
+            self.recall = index
+            self.recall_persisted = True
+        pending, self.pending_recall = self.pending_recall, []
+        for text in pending:
+            self.record_recall(text)
+        self.refresh_recall()
+        self.update_suggestions()
+
+    def record_recall(self, text):
+        if self.recall_worker is not None:
+            self.pending_recall.append(text)
+            return
+        entry, variant = self.recall.record(text)
+        pruned = self.recall.prune()
+        if self.writer is not None and self.recall_persisted:
+            self.writer.save_recall_entry(entry)
+            if variant is not None:
+                self.writer.add_recall_variant(variant, entry.id)
+            if pruned:
+                self.writer.delete_recall_entries(pruned)
+        self.refresh_recall()
+
+    def refresh_recall(self):
+        self.recall_list.clear()
+        for entry in self.recall.top(self.RECALL_PANEL_SIZE):
+            first_line = entry.text.strip().splitlines()[0] if entry.text.strip() else ""
+            item = QListWidgetItem(f"[{entry.count}x] {first_line}")
+            item.setToolTip(entry.text)
+            item.setData(ITEM_VALUE_ROLE, entry.text)
+            self.recall_list.addItem(item)
+
+    def use_recalled_prompt(self, item):
+        self.prompt_input.setPlainText(item.data(ITEM_VALUE_ROLE))
+        self.prompt_input.setFocus()
+
+    def update_suggestions(self):
+        text = self.prompt_input.toPlainText()
+        prefix = normalize_prompt(text)
+        self.suggestion_list.clear()
+        suggestions = []
+        if len(prefix) >= self.SUGGEST_MIN_CHARS:
+            suggestions = [entry for entry in self.recall.suggest(prefix)
+                           if normalize_prompt(entry.text) != prefix]
+        for entry in suggestions:
+            item = QListWidgetItem(f"[{entry.count}x] {entry.text.strip().splitlines()[0]}")
+            item.setToolTip(entry.text)
+            item.setData(ITEM_VALUE_ROLE, entry.text)
+            self.suggestion_list.addItem(item)
+        self.suggestion_list.setVisible(bool(suggestions))
+
+    def accept_suggestion(self, item):
+        self.prompt_input.setPlainText(item.data(ITEM_VALUE_ROLE))
+        cursor = self.prompt_input.textCursor()
+        cursor.movePosition(cursor.MoveOperation.End)
+        self.prompt_input.setTextCursor(cursor)
+        self.prompt_input.setFocus()
+
+    def eventFilter(self, obj, event):
+        if (obj is self.prompt_input and event.type() == QEvent.Type.KeyPress
+                and event.key() == Qt.Key.Key_Tab and self.suggestion_list.isVisible()):
+            self.accept_suggestion(self.suggestion_list.item(0))
+            return True
+        return super().eventFilter(obj, event)
+
+    def load_templates(self):
+        self.templates = dict(self.store.list_templates())
+        current = self.template_combo.currentText()
+        self.template_combo.clear()
+        self.template_combo.addItems(list(self.templates))
+        if current in self.templates:
+            self.template_combo.setCurrentText(current)
+
+    def save_as_template(self):
+        body = self.prompt_input.toPlainText()
+        if not body.strip() or self.store is None:
+            return
+        name, ok = QInputDialog.getText(self, "保存为模板", "模板名称:", text=self.template_combo.currentText())
+        name = name.strip()
+        if not ok or not name:
+            return
+        if name in self.templates and self.templates[name] != body:
+            reply = QMessageBox.question(self, "保存为模板", f"模板 {name} 已存在, 是否覆盖?")
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+        self.store.save_template(name, body)
+        self.load_templates()
+        self.template_combo.setCurrentText(name)
+
+    def delete_template(self):
+        name = self.template_combo.currentText()
+        if not name or self.store is None:
+            return
+        if QMessageBox.question(self, "删除模板", f"删除模板 {name}?") == QMessageBox.StandardButton.Yes:
+            self.store.delete_template(name)
+            self.load_templates()
+
+    def use_template(self):
+        """渲染选中的模板并放入输入框, 用户变量通过对话框填写"""
+        body = self.templates.get(self.template_combo.currentText())
+        if body is None:
+            return
+        template = compile_template(body)
+        values = {}
+        if template.variables:
+            dialog = TemplateVariablesDialog(template.variables, self)
+            if not dialog.exec():
+                return
+            values = dialog.values()
         try:
-            with open('prompt_history.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2) 
+            text = template.render(lambda name, arg: self.resolve_template_value(name, arg, values))
         except Exception as e:
-            print(f"Error saving history: {e}")
+            QMessageBox.warning(self, "错误", f"渲染模板失败: {str(e)}")
+            return
+        self.prompt_input.setPlainText(text)
 
-    def load_history(self):
+    def file_reader_widget(self):
+        if self.main_window is None:
+            return None
+        plugin = self.main_window.plugins.get('file_reader')
+        return getattr(plugin, 'widget', None)
+
+    def resolve_template_value(self, name, arg, values):
+        if name == SOURCE_DUMP:
+            reader = self.file_reader_widget()
+            if reader is None:
+                return None
+            return reader.dump_file_text(arg) if arg else reader.dump_text()
+        if name == SOURCE_FILES:
+            return "\n".join(self.current_group.files) if self.current_group else ""
+        if name == SOURCE_FILE:
+            return self.read_attachment(arg)
+        return values.get(name)
+
+    def read_attachment(self, name):
+        """读取当前分组中路径或文件名为 name 的附件内容, 找不到时返回None"""
+        if self.current_group is None or not name:
+            return None
+        for file_path in self.current_group.files:
+            if file_path == name or os.path.basename(file_path) == name:
+                metadata = self.current_group.file_metadata.get(file_path)
+                if metadata and metadata.get("reference"):
+                    source = metadata["path"]
+                    if not os.path.exists(source):
+                        return None
+                    with open(source, 'rb') as f:
+                        return f.read().decode('utf-8', errors='replace')
+                if metadata and "hash" in metadata:
+                    with self.blobs.open(metadata["hash"]) as f:
+                        return f.read().decode('utf-8', errors='replace')
+        return None
+
+    def load_first_page(self):
+        """
+        启动时只加载最近的一页分组, 更早的分组在滚动时加载;
+        归档或恢复分组后也用它重新加载
+        """
+        self.save_history()
+        self.groups = self.store.load_groups(limit=self.HISTORY_PAGE_SIZE)
+        if self.current_group is not None:
+            # 保持当前分组是同一个对象
+            self.groups = [self.current_group if group.id == self.current_group.id else group
+                           for group in self.groups]
+            if self.current_group not in self.groups:
+                self.groups.append(self.current_group)
+        # 索引先载入数据库中每个附件最早的元数据, 之后新增的附件由 add_file_to_group 加入,
+        # 归档和恢复分组后都会重新调用这里
+        self.file_index.clear()
+        self.file_index.seed(self.store.earliest_file_metadata())
+        for group in self.groups:
+            self.file_index.add_group(group)
+        self.has_more_history = bool(self.groups) and self.store.has_groups_before(self.groups[0].id)
+        self.update_history()
+
+    def on_history_scrolled(self, value):
+        if self.has_more_history and value >= self.history_view.verticalScrollBar().maximum():
+            self.load_more_history()
+
+    def load_more_history(self):
+        """加载下一页更早的分组"""
+        if self.store is None or not self.groups:
+            return
         try:
-            if os.path.exists('prompt_history.json'):
-                with open('prompt_history.json', 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.groups = [PromptGroup.from_dict(group_data) for group_data in data]
-                    self.update_history()
+            older = self.store.load_groups(limit=self.HISTORY_PAGE_SIZE, before_id=self.groups[0].id)
+            self.has_more_history = bool(older) and self.store.has_groups_before(older[0].id)
+            if older:
+                self.groups = older + self.groups
+                for group in older:
+                    self.file_index.add_group(group)
+                # 更早的分组追加在视图底部
+                for group in reversed(older):
+                    self.insert_group_item(self.history_model.rowCount(), group)
         except Exception as e:
             print(f"Error loading history: {e}")
 
+    def run_search(self):
+        text = self.search_input.text().strip()
+        since = self.search_since.text().strip()
+        until = self.search_until.text().strip()
+        file_name = self.search_file.text().strip()
+        self.search_results.clear()
+        if self.store is None or not (text or since or until or file_name):
+            self.search_results.setVisible(False)
+            return
+        # 刚确认的提示词可能还在写入队列中: 先搜索已经写入的记录, 不在界面线程中等待,
+        # 让写入线程立即写入, 写入完成后再搜索一次
+        self.search_after_write = self.writer is not None and self.writer.request_flush()
+        rows = []
+        try:
+            rows = [(row, ITEM_GROUP) for row in
+                    self.store.search(text, since or None, until or None, file_name or None, self.SEARCH_LIMIT)]
+            if self.search_archive.isChecked() and len(rows) < self.SEARCH_LIMIT:
+                rows += [(row, ITEM_ARCHIVED) for row in self.archive.search(
+                    text, since or None, until or None, file_name or None, self.SEARCH_LIMIT - len(rows))]
+        except Exception as e:
+            print(f"Error searching history: {e}")
+        for (group_id, prompt, created_at), kind in rows:
+            first_line = prompt.splitlines()[0] if prompt else ""
+            label = "Archived " if kind == ITEM_ARCHIVED else ""
+            item = QListWidgetItem(f"[{label}Group {group_id}] {created_at}  {first_line}")
+            item.setToolTip(prompt)
+            item.setData(ITEM_KIND_ROLE, kind)
+            item.setData(ITEM_VALUE_ROLE, group_id)
+            self.search_results.addItem(item)
+        self.search_results.setVisible(True)
+
+    def on_search_result_clicked(self, item):
+        group_id = item.data(ITEM_VALUE_ROLE)
+        if item.data(ITEM_KIND_ROLE) == ITEM_ARCHIVED:
+            reply = QMessageBox.question(self, "恢复分组", f"Group {group_id} 已归档, 是否恢复到历史中?")
+            if reply != QMessageBox.StandardButton.Yes or not self.restore_archived_group(group_id):
+                return
+            item.setData(ITEM_KIND_ROLE, ITEM_GROUP)
+            item.setText(item.text().replace("[Archived ", "[", 1))
+        self.show_group(group_id)
+
+    def show_group(self, group_id):
+        """在历史视图中定位分组, 分组还没加载时先加载到它所在的页"""
+        while group_id not in self.group_items and self.has_more_history:
+            loaded = len(self.groups)
+            self.load_more_history()
+            if len(self.groups) == loaded:
+                break
+        group_item = self.group_items.get(group_id)
+        if group_item is not None:
+            self.history_view.setCurrentIndex(group_item.index())
+            self.history_view.scrollTo(group_item.index(), QTreeView.ScrollHint.PositionAtTop)
+
 class prompt_managerPlugin:
     def __init__(self):
         self.name = "Prompt Manager"
@@ -418,7 +1089,7 @@ class prompt_managerPlugin:
         self.widget = None
 
     def initialize(self, main_window):
-        self.widget = PromptManagerWidget()
+        self.widget = PromptManagerWidget(main_window=main_window)
         main_window.layout.addWidget(self.widget)
 
     def get_menu_items(self):
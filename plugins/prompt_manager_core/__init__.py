@@ -0,0 +1,11 @@
+from .archive import ARCHIVE_DIR, ArchiveStore
+from .blobs import BLOB_DIR, BlobStore
+from .index import FileIndex
+from .models import PromptGroup
+from .paste import (PASTE_FILE, PASTE_TEXT, FakeBackend, PasteBackend, PasteDispatcher, PasteRequest,
+                    WindowKeystrokeBackend)
+from .recall import RecallEntry, RecallIndex, build_recall_index
+from .settings import SETTINGS_FILE, PromptSettings
+from .store import HISTORY_DB, LEGACY_HISTORY_FILE, HistoryStore
+from .templates import CompiledTemplate, compile_template
+from .writer import HistoryWriter
@@ -0,0 +1,134 @@
+import os
+import re
+import gzip
+import json
+import tempfile
+
+ARCHIVE_DIR = "prompt_archive"
+SEGMENT_PATTERN = re.compile(r"^groups-(\d+)-(\d+)(?:-\d+)?\.jsonl\.gz$")
+
+
+class ArchiveStore:
+    """
+    超出保留策略的分组保存在 prompt_archive/ 下的gzip压缩JSON Lines分段中,
+    每行一个分组; 归档的分组仍然可以搜索, 也可以恢复到历史数据库
+    """
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+
+    def segments(self):
+        """返回 [(第一个分组编号, 最后一个分组编号, 路径)], 按编号排序"""
+        if not os.path.isdir(self.root):
+            return []
+        segments = []
+        for name in os.listdir(self.root):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                segments.append((int(match.group(1)), int(match.group(2)), os.path.join(self.root, name)))
+        segments.sort()
+        return segments
+
+    def max_group_id(self):
+        """归档中最大的分组编号, 没有归档时返回0"""
+        return max((last for _, last, _ in self.segments()), default=0)
+
+    def write_segment(self, records):
+        """
+        把一批分组记录写入新的分段, 先写临时文件再重命名,
+        记录格式见 HistoryStore.export_groups, 返回分段路径
+        """
+        os.makedirs(self.root, exist_ok=True)
+        base = f"groups-{records[0]['id']:08d}-{records[-1]['id']:08d}"
+        path = os.path.join(self.root, base + ".jsonl.gz")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.root, f"{base}-{suffix}.jsonl.gz")
+            suffix += 1
+        self._write(path, records)
+        return path
+
+    def _write(self, path, records):
+        fd, temp_path = tempfile.mkstemp(dir=self.root)
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9) as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False).encode('utf-8'))
+                        f.write(b"\n")
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _read(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_records(self, newest_first=False):
+        segments = self.segments()
+        if newest_first:
+            segments.reverse()
+        for _, _, path in segments:
+            records = self._read(path)
+            if newest_first:
+                records = reversed(list(records))
+            yield from records
+
+    def _segments_for(self, group_id):
+        return [path for first, last, path in self.segments() if first <= group_id <= last]
+
+    def find_record(self, group_id):
+        for path in self._segments_for(group_id):
+            for record in self._read(path):
+                if record['id'] == group_id:
+                    return record
+        return None
+
+    def remove_record(self, group_id):
+        """从归档中删除分组(恢复之后调用), 分段为空时删除分段文件"""
+        for path in self._segments_for(group_id):
+            records = list(self._read(path))
+            remaining = [record for record in records if record['id'] != group_id]
+            if len(remaining) == len(records):
+                continue
+            if remaining:
+                self._write(path, remaining)
+            else:
+                os.remove(path)
+
+    def search(self, text, since=None, until=None, file_name=None, limit=100):
+        """
+        在归档中按子串搜索提示词(不区分大小写), 参数和返回值同 HistoryStore.search,
+        结果按时间倒序; 归档是冷数据, 直接顺序扫描分段
+        """
+        terms = [term.lower() for term in text.split()]
+        if until and len(until) <= 10:
+            until += " 23:59:59"
+        file_name = file_name.lower() if file_name else None
+        results = []
+        for record in self.iter_records(newest_first=True):
+            if file_name and not any(file_name in entry['path'].lower() for entry in record['files']):
+                continue
+            for prompt in reversed(record['prompts']):
+                created_at = prompt['created_at']
+                if (since and created_at < since) or (until and created_at > until):
+                    continue
+                lowered = prompt['text'].lower()
+                if all(term in lowered for term in terms):
+                    results.append((record['id'], prompt['text'], created_at))
+                    if len(results) >= limit:
+                        return results
+        return results
+
+    def referenced_blobs(self):
+        """归档分组引用的blob哈希, 清理附件时需要保留"""
+        digests = set()
+        for record in self.iter_records():
+            for entry in record['files']:
+                digest = (entry.get('metadata') or {}).get('hash')
+                if digest:
+                    digests.add(digest)
+        return digests
@@ -0,0 +1,156 @@
+import os
+import re
+import gzip
+import shutil
+import hashlib
+import tempfile
+
+BLOB_DIR = "prompt_blobs"
+# 已经压缩过的格式不再压缩
+COMPRESSED_EXTENSIONS = {
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.mp3', '.mp4', '.mkv', '.avi', '.mov',
+    '.pdf', '.docx', '.xlsx', '.pptx',
+}
+COPY_CHUNK_SIZE = 1024 * 1024
+# blob文件名: SHA-256 十六进制摘要, 压缩时加 .gz
+BLOB_NAME = re.compile(r'([0-9a-f]{64})(\.gz)?')
+
+
+class BlobStore:
+    """
+    按内容寻址的附件存储: 文件内容以SHA-256命名保存在 prompt_blobs/ 下,
+    相同内容只保存一份, 可选gzip压缩
+    """
+    def __init__(self, root=BLOB_DIR, compress=True):
+        self.root = root
+        self.compress = compress
+
+    def _path(self, digest, compressed):
+        return os.path.join(self.root, digest[:2], digest + ('.gz' if compressed else ''))
+
+    def find(self, digest):
+        """返回 (路径, 是否压缩), 不存在时返回None"""
+        for compressed in (True, False):
+            path = self._path(digest, compressed)
+            if os.path.exists(path):
+                return path, compressed
+        return None
+
+    def exists(self, digest):
+        return self.find(digest) is not None
+
+    def put_bytes(self, data, name=""):
+        """保存内容, 返回 (digest, size)"""
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.exists(digest):
+            compressed = self.compress and os.path.splitext(name)[1].lower() not in COMPRESSED_EXTENSIONS
+            path = self._path(digest, compressed)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先在根目录写入临时文件再重命名, 避免留下不完整的blob, 也不会被 iter_blobs 当作blob
+            fd, temp_path = tempfile.mkstemp(dir=self.root)
+            try:
+                with os.fdopen(fd, 'wb') as raw:
+                    if compressed:
+                        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as f:
+                            f.write(data)
+                    else:
+                        raw.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        return digest, len(data)
+
+    def put_file(self, file_path, progress=None):
+        """
+        分块读取文件, 边计算哈希边写入临时文件, 内存占用和文件大小无关;
+        progress(已处理字节数, 总字节数) 在每块之后调用, 返回 (digest, size)
+        """
+        total = os.path.getsize(file_path)
+        compressed = self.compress and os.path.splitext(file_path)[1].lower() not in COMPRESSED_EXTENSIONS
+        os.makedirs(self.root, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.root)
+        try:
+            sha = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, 'wb') as raw, open(file_path, 'rb') as src:
+                dest = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) if compressed else raw
+                try:
+                    for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b''):
+                        sha.update(chunk)
+                        dest.write(chunk)
+                        size += len(chunk)
+                        if progress is not None:
+                            progress(size, total)
+                finally:
+                    if compressed:
+                        dest.close()
+            digest = sha.hexdigest()
+            if self.exists(digest):
+                os.remove(temp_path)
+            else:
+                path = self._path(digest, compressed)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return digest, size
+
+    @staticmethod
+    def hash_file(file_path, progress=None):
+        """分块计算文件的SHA-256, 不保存内容, 返回 (digest, size)"""
+        total = os.path.getsize(file_path)
+        sha = hashlib.sha256()
+        size = 0
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+                sha.update(chunk)
+                size += len(chunk)
+                if progress is not None:
+                    progress(size, total)
+        return sha.hexdigest(), size
+
+    def open(self, digest):
+        """以流的方式打开blob, 返回可读的文件对象"""
+        found = self.find(digest)
+        if found is None:
+            raise FileNotFoundError(f"Blob not found: {digest}")
+        path, compressed = found
+        return gzip.open(path, 'rb') if compressed else open(path, 'rb')
+
+    def copy_to(self, digest, dest_path):
+        """分块把blob内容写到目标文件"""
+        with self.open(digest) as src, open(dest_path, 'wb') as dest:
+            shutil.copyfileobj(src, dest, COPY_CHUNK_SIZE)
+
+    def iter_blobs(self):
+        """遍历所有blob, 产出 (digest, 路径); 忽略文件名不是摘要的文件"""
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                match = BLOB_NAME.fullmatch(name)
+                if match:
+                    yield match.group(1), os.path.join(prefix_dir, name)
+
+    def collect_garbage(self, referenced):
+        """删除不再被任何分组引用的blob, 返回 (删除数量, 释放字节数)"""
+        removed = 0
+        freed = 0
+        for digest, path in list(self.iter_blobs()):
+            if digest in referenced:
+                continue
+            try:
+                freed += os.path.getsize(path)
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed, freed
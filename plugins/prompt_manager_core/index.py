@@ -0,0 +1,55 @@
+class FileIndex:
+    """
+    附件路径到 (分组, 元数据) 的索引, 查找文件元数据和使用某个文件的分组时
+    不需要遍历全部分组; 用 seed 载入数据库中每个路径最早的元数据后,
+    元数据的查找也覆盖还没有加载的分组
+    """
+    def __init__(self):
+        self._groups = {}  # path -> {group_id: group}, 已加载的分组, 按加入顺序
+        self._first = {}  # path -> (group_id, group, metadata), 编号最小的分组; 只从数据库载入时 group 为None
+
+    def __len__(self):
+        return len(self._first)
+
+    def __contains__(self, path):
+        return path in self._first
+
+    def clear(self):
+        self._groups.clear()
+        self._first.clear()
+
+    def seed(self, rows):
+        """载入 [(path, group_id, metadata)], 例如 HistoryStore.earliest_file_metadata 的结果"""
+        for path, group_id, metadata in rows:
+            first = self._first.get(path)
+            if first is None or (first[0] is not None and group_id < first[0]):
+                self._first[path] = (group_id, None, metadata)
+
+    def add(self, group, path, metadata=None):
+        if metadata is None:
+            metadata = group.file_metadata.get(path)
+        self._groups.setdefault(path, {})[group.id] = group
+        first = self._first.get(path)
+        # 和原来按时间顺序查找一样, 返回最早分组中的元数据
+        if first is None or (group.id is not None and first[0] is not None and group.id < first[0]):
+            self._first[path] = (group.id, group, metadata)
+        elif first[0] == group.id and (first[1] is not group or first[2] is None):
+            # 从数据库载入的条目换成已加载的分组
+            self._first[path] = (group.id, group, metadata if metadata is not None else first[2])
+
+    def add_group(self, group):
+        for path in group.files:
+            self.add(group, path)
+
+    def lookup(self, path):
+        """返回 (分组, 元数据), 分组还没有加载时为None; 没有使用过该文件时返回 None"""
+        first = self._first.get(path)
+        return first[1:] if first is not None else None
+
+    def metadata(self, path):
+        first = self._first.get(path)
+        return first[2] if first is not None else None
+
+    def groups_using(self, path):
+        """使用过该文件的已加载分组"""
+        return list(self._groups.get(path, {}).values())
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+
+class PromptGroup:
+    def __init__(self):
+        self.id = None  # 在历史数据库中的编号
+        self.prompts = []
+        self.files = []  # 存储文件路径
+        self.file_metadata = {}  # 存储文件元数据 {path: {"hash": sha256, "size": size, "name": name}}
+        self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def to_dict(self):
+        return {
+            'prompts': self.prompts,
+            'files': self.files,
+            'file_metadata': self.file_metadata,
+            'timestamp': self.timestamp
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        group = cls()
+        group.prompts = data['prompts']
+        group.files = data['files']
+        group.file_metadata = data.get('file_metadata', {})
+        group.timestamp = data['timestamp']
+        return group
@@ -0,0 +1,253 @@
+import time
+from collections import deque
+
+# 只在Windows上可以向其它窗口发送按键, 其它平台上没有"选择的窗口"这个目标
+try:
+    import win32api
+    import win32con
+    import win32gui
+except ImportError:
+    win32api = win32con = win32gui = None
+
+PASTE_TEXT = "text"
+PASTE_FILE = "file"
+
+
+class PasteRequest:
+    """一次发送: 文本或文件路径, 完成后调用 callback(request)"""
+    def __init__(self, payload, kind=PASTE_TEXT, callback=None):
+        self.payload = payload
+        self.kind = kind
+        self.callback = callback
+        self.target = None
+        self.error = None
+        self.queued_at = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def ok(self):
+        return self.finished_at is not None and self.error is None
+
+    @property
+    def latency(self):
+        """从加入队列到完成的时间(秒), 包括排队等待"""
+        if self.finished_at is None or self.queued_at is None:
+            return None
+        return self.finished_at - self.queued_at
+
+    @property
+    def duration(self):
+        """从开始执行到完成的时间(秒)"""
+        if self.finished_at is None or self.started_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class PasteBackend:
+    """
+    粘贴目标的基类: check 在加入队列前检查能否发送, steps 返回依次执行的
+    [(执行前等待的毫秒数, 动作)], 动作出错时这次发送失败
+    """
+    name = ""
+
+    @property
+    def available(self):
+        return True
+
+    def check(self, request):
+        """返回错误信息, 可以发送时返回None"""
+        return None
+
+    def steps(self, request):
+        return []
+
+
+class WindowKeystrokeBackend(PasteBackend):
+    """
+    把内容放到剪贴板, 激活选择的窗口后模拟 Ctrl+V, 文本再模拟回车发送;
+    等待窗口激活用定时器完成, 不阻塞界面线程
+    """
+    name = "选择的窗口"
+
+    def __init__(self, clipboard, get_window, activate_delay=100, enter_delay=100):
+        self.clipboard = clipboard  # 提供 copy(request) 的剪贴板后端
+        self.get_window = get_window  # 返回当前选择的窗口句柄
+        self.activate_delay = activate_delay
+        self.enter_delay = enter_delay
+
+    @property
+    def available(self):
+        return win32gui is not None
+
+    def check(self, request):
+        if not self.available:
+            return "当前系统不支持向其它窗口发送按键"
+        if not self.get_window():
+            return "请先选择目标窗口"
+        return None
+
+    def steps(self, request):
+        handle = self.get_window()
+        steps = [
+            (0, lambda: self._activate(handle, request)),
+            (self.activate_delay, self._paste),
+        ]
+        # 文件只粘贴, 不发送
+        if request.kind == PASTE_TEXT:
+            steps.append((self.enter_delay, self._enter))
+        return steps
+
+    def _activate(self, handle, request):
+        self.clipboard.copy(request)
+        # 如果窗口最小化, 恢复它
+        if win32gui.IsIconic(handle):
+            win32gui.ShowWindow(handle, win32con.SW_RESTORE)
+        win32gui.SetForegroundWindow(handle)
+
+    @staticmethod
+    def _paste():
+        win32api.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
+        win32api.keybd_event(ord('V'), 0, 0, 0)
+        win32api.keybd_event(ord('V'), 0, win32con.KEYEVENTF_KEYUP, 0)
+        win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+
+    @staticmethod
+    def _enter():
+        win32api.keybd_event(win32con.VK_RETURN, 0, 0, 0)
+        win32api.keybd_event(win32con.VK_RETURN, 0, win32con.KEYEVENTF_KEYUP, 0)
+
+
+class FakeBackend(PasteBackend):
+    """在内存中记录发送内容的后端, 用于测试和基准测试"""
+    name = "fake"
+
+    def __init__(self, delays=(0,), error=None):
+        self.delays = delays  # 每一步之前等待的毫秒数
+        self.error = error  # 设置后 check 返回这个错误
+        self.sent = []
+
+    def check(self, request):
+        return self.error
+
+    def steps(self, request):
+        steps = [(delay, lambda: None) for delay in self.delays[:-1]]
+        steps.append((self.delays[-1], lambda: self.sent.append((request.kind, request.payload))))
+        return steps
+
+
+class PasteDispatcher:
+    """
+    按顺序执行发送请求: 同一时间只执行一个请求, 快速连续的发送排队依次执行;
+    schedule(毫秒, 回调) 负责延迟执行, 界面中使用 QTimer.singleShot
+    """
+    def __init__(self, schedule, clock=time.perf_counter, history=100):
+        self.schedule = schedule
+        self.clock = clock
+        self.backends = {}
+        self.queue = deque()
+        self.current = None
+        self.latencies = deque(maxlen=history)  # 最近完成的发送的延迟(秒)
+        self.sent_count = 0
+        self.failed_count = 0
+
+    def register(self, backend, name=None):
+        self.backends[name or backend.name] = backend
+
+    def available_targets(self):
+        return [name for name, backend in self.backends.items() if backend.available]
+
+    @property
+    def pending(self):
+        """排队和正在执行的请求数"""
+        return len(self.queue) + (1 if self.current is not None else 0)
+
+    @property
+    def last_latency(self):
+        return self.latencies[-1] if self.latencies else None
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "pending": self.pending,
+            "sent": self.sent_count,
+            "failed": self.failed_count,
+            "last_latency": self.last_latency,
+            "median_latency": latencies[len(latencies) // 2] if latencies else None,
+            "max_latency": latencies[-1] if latencies else None,
+        }
+
+    def send(self, target, request):
+        """
+        把请求加入队列; 目标不存在或 check 失败时请求立即以错误结束,
+        结果都通过 request.callback 通知
+        """
+        request.target = target
+        request.queued_at = self.clock()
+        backend = self.backends.get(target)
+        error = "未知的粘贴目标: %s" % target if backend is None else backend.check(request)
+        if error is not None:
+            self._finish(request, error)
+            return request
+        self.queue.append(request)
+        if self.current is None:
+            self._start_next()
+        return request
+
+    def _start_next(self):
+        if not self.queue:
+            return
+        request = self.queue.popleft()
+        self.current = request
+        request.started_at = self.clock()
+        try:
+            steps = list(self.backends[request.target].steps(request))
+        except Exception as e:
+            self._complete(request, str(e))
+            return
+        self._run_steps(request, steps, 0)
+
+    def _run_steps(self, request, steps, index):
+        if index >= len(steps):
+            self._complete(request, None)
+            return
+        delay, action = steps[index]
+
+        def run():
+            try:
+                action()
+            except Exception as e:
+                self._complete(request, str(e))
+                return
+            self._run_steps(request, steps, index + 1)
+
+        if delay > 0:
+            self.schedule(delay, run)
+        else:
+            run()
+
+    def _complete(self, request, error):
+        self.current = None
+        self._finish(request, error)
+        if self.queue and self.current is None:
+            # 下一个请求在事件循环中开始, 避免队列很长时递归过深
+            self.schedule(0, self._resume)
+
+    def _resume(self):
+        if self.current is None:
+            self._start_next()
+
+    def _finish(self, request, error):
+        request.error = error
+        request.finished_at = self.clock()
+        if error is None:
+            self.sent_count += 1
+            self.latencies.append(request.latency)
+        else:
+            self.failed_count += 1
+        if request.callback is not None:
+            # 回调出错不能中断队列, 否则后面的请求不会再开始
+            try:
+                request.callback(request)
+            except Exception as e:
+                print(f"Error in paste callback: {e}")
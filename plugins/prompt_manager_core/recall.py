@@ -0,0 +1,318 @@
+import math
+import time
+import heapq
+import zlib
+import operator
+import array
+import random
+import hashlib
+from datetime import datetime
+
+# 频率/时间综合评分的半衰期: 一周前用过一次的提示词分数只有刚用过的一半
+HALF_LIFE_SECONDS = 7 * 24 * 3600
+# MinHash签名长度和LSH分段, 8段x4行在相似度0.8附近有较好的召回率
+MINHASH_PERMUTATIONS = 32
+LSH_BANDS = 8
+SHINGLE_SIZE = 3
+# 近似去重的相似度阈值, 以及参与近似去重的最短文本和计算签名用的最大长度
+NEAR_DUPLICATE_THRESHOLD = 0.8
+NEAR_DUPLICATE_MIN_CHARS = 20
+SIGNATURE_MAX_CHARS = 1000
+# 前缀树只索引文本开头的字符, 每个节点保留分数最高的若干条目
+PREFIX_MAX_CHARS = 64
+PREFIX_TOP_K = 8
+# 每个条目在前缀树中最多保留的键(最近使用的版本), 相近版本很多时更新不会越来越慢
+ENTRY_MAX_KEYS = 4
+# 每个LSH桶最多保存的条目数, 重复性高的文本不会让候选集无限增长
+LSH_BUCKET_LIMIT = 16
+# 索引最多保留的条目数, 超出后删除排名最低的条目; 超出 PRUNE_SLACK 比例后才清理一次
+RECALL_MAX_ENTRIES = 2000
+PRUNE_SLACK = 0.1
+
+# 每个排列是和一个随机数异或, 这样取最小值可以用 map 在C层完成
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [_rng.getrandbits(32).__xor__ for _ in range(MINHASH_PERMUTATIONS)]
+
+
+def normalize_prompt(text):
+    """去掉首尾空白并合并连续空白, 只差空白的提示词视为相同"""
+    return " ".join(text.split())
+
+
+def prompt_digest(text):
+    return hashlib.sha1(normalize_prompt(text).encode('utf-8')).hexdigest()
+
+
+def minhash_signature(text):
+    """按字符3-gram计算MinHash签名, 中文等没有空格分隔的文本同样适用"""
+    text = normalize_prompt(text).lower()[:SIGNATURE_MAX_CHARS]
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+    return array.array('I', [min(map(permute, hashes)) for permute in _PERMUTATIONS])
+
+
+def similarity(a, b):
+    """两个签名估计的Jaccard相似度"""
+    return sum(map(operator.eq, a, b)) / len(a)
+
+
+def frecency_rank(rank, when):
+    """
+    在 when 时刻使用一次后的排名; 排名是 log2(衰减后的分数) + 时间/半衰期,
+    不随时间变化, 可以直接比较和排序, 使用时只需要更新这一条
+    """
+    now = when / HALF_LIFE_SECONDS
+    if rank is None:
+        return now
+    return math.log2(2 ** (rank - now) + 1) + now
+
+
+def parse_timestamp(timestamp):
+    return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timestamp()
+
+
+class RecallEntry:
+    """一条召回记录: 相同和相近的提示词合并在一起, text 是最近一次使用的版本"""
+    __slots__ = ('id', 'text', 'count', 'rank', 'last_used', 'signature', 'keys')
+
+    def __init__(self, entry_id, text, count=0, rank=None, last_used=0.0, signature=None):
+        self.id = entry_id
+        self.text = text
+        self.count = count
+        self.rank = rank
+        self.last_used = last_used
+        self.signature = signature
+        self.keys = {}  # 前缀树中指向这一条的键, 按使用顺序
+
+    def to_row(self):
+        return (self.id, self.text, self.count, self.rank, self.last_used,
+                self.signature.tobytes() if self.signature is not None else None)
+
+
+class PrefixTrie:
+    """
+    提示词前缀树, 每个节点保存其下排名最高的 PREFIX_TOP_K 个条目编号;
+    排名只会上升, 所以更新一个条目时只需要沿着它的路径调整
+    """
+    def __init__(self, entries):
+        self.entries = entries  # id -> RecallEntry, 用于比较排名
+        self.root = [{}, []]  # [子节点, 排名最高的条目编号]
+
+    @staticmethod
+    def key_for(text):
+        return normalize_prompt(text).lower()[:PREFIX_MAX_CHARS]
+
+    def _promote(self, node, entry):
+        top = node[1]
+        if entry.id in top:
+            top.remove(entry.id)
+        ranks = self.entries
+        index = 0
+        while index < len(top) and ranks[top[index]].rank >= entry.rank:
+            index += 1
+        if index < PREFIX_TOP_K:
+            top.insert(index, entry.id)
+            del top[PREFIX_TOP_K:]
+
+    def update(self, entry, key):
+        """插入条目的一个键, 或在条目排名上升后调整路径上的节点"""
+        node = self.root
+        self._promote(node, entry)
+        for char in key:
+            node = node[0].setdefault(char, [{}, []])
+            self._promote(node, entry)
+
+    def remove(self, entry_id, key):
+        """
+        从键的路径上删除条目, 不再包含任何条目的子节点一起删除; 删除的是排名最低的
+        条目时节点中其余条目仍然是排名最高的, 否则节点中可能暂时少于 PREFIX_TOP_K 个条目
+        """
+        path = [self.root]
+        for char in key:
+            node = path[-1][0].get(char)
+            if node is None:
+                break
+            path.append(node)
+        for node in path:
+            if entry_id in node[1]:
+                node[1].remove(entry_id)
+        for parent, char in zip(reversed(path[:-1]), reversed(key[:len(path) - 1])):
+            child = parent[0][char]
+            if child[1] or child[0]:
+                break
+            del parent[0][char]
+
+    def suggest(self, prefix, limit=PREFIX_TOP_K):
+        key = normalize_prompt(prefix).lower()
+        node = self.root
+        for char in key[:PREFIX_MAX_CHARS]:
+            node = node[0].get(char)
+            if node is None:
+                return []
+        entries = [self.entries[entry_id] for entry_id in node[1]]
+        if len(key) > PREFIX_MAX_CHARS:
+            entries = [entry for entry in entries if normalize_prompt(entry.text).lower().startswith(key)]
+        return entries[:limit]
+
+
+class RecallIndex:
+    """
+    提示词召回索引: 完全相同的提示词按哈希合并, 相近的按MinHash/LSH合并,
+    每条记录维护使用次数和频率/时间排名, 并提供前缀补全;
+    只在内存中维护, 由调用方保存 record 返回的条目和变体哈希, 删除 prune 返回的条目
+    """
+    def __init__(self, max_entries=RECALL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = {}  # id -> RecallEntry
+        self.by_digest = {}  # 规范化文本的哈希 -> 条目编号
+        self.buckets = {}  # (段号, 签名片段) -> {条目编号}
+        self.trie = PrefixTrie(self.entries)
+        self._next_id = 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self, rows, variants):
+        """从 HistoryStore.load_recall 的结果恢复索引"""
+        for entry_id, text, count, rank, last_used, signature in rows:
+            if signature is not None:
+                signature = array.array('I', signature)
+            entry = RecallEntry(entry_id, text, count, rank, last_used, signature)
+            self.entries[entry_id] = entry
+            self._index_signature(entry)
+            self._next_id = max(self._next_id, entry_id + 1)
+        for digest, entry_id in variants:
+            self.by_digest[digest] = entry_id
+        # 按排名从低到高插入, 前缀树节点中保留的就是排名最高的
+        for entry in sorted(self.entries.values(), key=lambda e: e.rank):
+            self._add_key(entry, entry.text)
+
+    def _bands(self, signature):
+        rows = MINHASH_PERMUTATIONS // LSH_BANDS
+        return [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(LSH_BANDS)]
+
+    def _index_signature(self, entry):
+        if entry.signature is not None:
+            for band in self._bands(entry.signature):
+                bucket = self.buckets.setdefault(band, set())
+                # 满了的桶中已经有足够多相近的条目可以比较
+                if len(bucket) < LSH_BUCKET_LIMIT:
+                    bucket.add(entry.id)
+
+    def _add_key(self, entry, text):
+        key = PrefixTrie.key_for(text)
+        entry.keys[key] = None
+        self.trie.update(entry, key)
+
+    def find_similar(self, signature):
+        best, best_score = None, NEAR_DUPLICATE_THRESHOLD
+        candidates = set()
+        for band in self._bands(signature):
+            candidates |= self.buckets.get(band, set())
+        for entry_id in candidates:
+            entry = self.entries[entry_id]
+            score = similarity(signature, entry.signature)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def record(self, text, when=None):
+        """
+        记录一次使用, 返回 (条目, 新的变体哈希或None);
+        变体哈希不为None时调用方需要保存 (哈希 -> 条目编号) 的对应关系
+        """
+        when = time.time() if when is None else when
+        digest = prompt_digest(text)
+        new_variant = None
+        entry_id = self.by_digest.get(digest)
+        entry = self.entries.get(entry_id) if entry_id is not None else None
+        if entry is None:
+            new_variant = digest
+            signature = None
+            if len(normalize_prompt(text)) >= NEAR_DUPLICATE_MIN_CHARS:
+                signature = minhash_signature(text)
+                entry = self.find_similar(signature)
+            if entry is None:
+                entry = RecallEntry(self._next_id, text, signature=signature)
+                self._next_id += 1
+                self.entries[entry.id] = entry
+                self._index_signature(entry)
+            self.by_digest[digest] = entry.id
+
+        entry.text = text
+        entry.count += 1
+        entry.rank = frecency_rank(entry.rank, when)
+        entry.last_used = max(entry.last_used, when)
+        # 新版本的文本也可以补全, 只保留最近使用的几个版本的键
+        key = PrefixTrie.key_for(text)
+        entry.keys.pop(key, None)
+        entry.keys[key] = None
+        if len(entry.keys) > ENTRY_MAX_KEYS:
+            oldest = next(iter(entry.keys))
+            del entry.keys[oldest]
+            self.trie.remove(entry.id, oldest)
+        # 排名上升后调整条目所有键的路径
+        for key in entry.keys:
+            self.trie.update(entry, key)
+        return entry, new_variant
+
+    def prune(self):
+        """
+        条目数超出 max_entries 较多时删除排名最低的条目, 返回删除的条目编号,
+        调用方需要从数据库中删除这些条目
+        """
+        if len(self.entries) <= self.max_entries * (1 + PRUNE_SLACK):
+            return []
+        removed = heapq.nsmallest(len(self.entries) - self.max_entries, self.entries.values(),
+                                  key=lambda e: e.rank)
+        removed_ids = {entry.id for entry in removed}
+        for entry in removed:
+            del self.entries[entry.id]
+            for key in entry.keys:
+                self.trie.remove(entry.id, key)
+            if entry.signature is not None:
+                for band in self._bands(entry.signature):
+                    bucket = self.buckets.get(band)
+                    if bucket is not None:
+                        bucket.discard(entry.id)
+                        if not bucket:
+                            del self.buckets[band]
+        self.by_digest = {digest: entry_id for digest, entry_id in self.by_digest.items()
+                          if entry_id not in removed_ids}
+        return sorted(removed_ids)
+
+    def top(self, limit=50):
+        return heapq.nlargest(limit, self.entries.values(), key=lambda e: e.rank)
+
+    def suggest(self, prefix, limit=PREFIX_TOP_K):
+        return self.trie.suggest(prefix, limit)
+
+
+def build_recall_index(store, backfill=1000, max_entries=RECALL_MAX_ENTRIES):
+    """
+    从 HistoryStore 加载排名最高的 max_entries 条召回记录并删除其余的记录,
+    第一次运行时从最近的 backfill 条历史提示词建立; 可以在后台线程中使用单独的连接调用
+    """
+    index = RecallIndex(max_entries)
+    if store.get_meta('recall_built'):
+        with store.conn:
+            store.prune_recall(max_entries)
+        index.load(*store.load_recall(max_entries))
+        return index
+    variants = []
+    for text, created_at in store.recent_prompts(backfill):
+        entry, variant = index.record(text, parse_timestamp(created_at))
+        if variant is not None:
+            variants.append((variant, entry.id))
+    index.prune()
+    with store.conn:
+        for variant, entry_id in variants:
+            if entry_id in index.entries:
+                store.add_recall_variant(variant, entry_id)
+        for entry in index.entries.values():
+            store.save_recall_entry(entry.to_row())
+        store.set_meta('recall_built', '1')
+    return index
@@ -0,0 +1,42 @@
+import os
+import json
+
+SETTINGS_FILE = "prompt_manager_settings.json"
+
+
+class PromptSettings:
+    """prompt_manager_settings.json 中保存的提示词管理设置"""
+    def __init__(self):
+        # 历史保留策略: 只保留最近的N个分组/N天内的分组, 更早的移到归档中, 0表示不限制
+        self.keep_groups = 0
+        self.keep_days = 0
+        # 超过这个大小的附件只保存路径, 大小, 哈希和修改时间, 不保存内容, 0表示不限制
+        self.max_attachment_mb = 100
+
+    @classmethod
+    def load(cls, path=SETTINGS_FILE):
+        settings = cls()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                settings.update(json.load(f))
+        return settings
+
+    def update(self, data):
+        self.keep_groups = data.get('keep_groups', self.keep_groups)
+        self.keep_days = data.get('keep_days', self.keep_days)
+        self.max_attachment_mb = data.get('max_attachment_mb', self.max_attachment_mb)
+
+    def to_dict(self):
+        return {
+            'keep_groups': self.keep_groups,
+            'keep_days': self.keep_days,
+            'max_attachment_mb': self.max_attachment_mb
+        }
+
+    def save(self, path=SETTINGS_FILE):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    @property
+    def retention_enabled(self):
+        return self.keep_groups > 0 or self.keep_days > 0
@@ -0,0 +1,524 @@
+import os
+import re
+import json
+import base64
+import sqlite3
+from datetime import datetime, timedelta
+from .models import PromptGroup
+
+HISTORY_DB = "prompt_history.db"
+LEGACY_HISTORY_FILE = "prompt_history.json"
+
+
+def now_timestamp():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# 连续的中日韩文字; 这些语言的搜索词常常只有两个字, trigram 索引无法匹配
+_CJK_RUN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]{2,}')
+
+
+def _cjk_bigrams(text):
+    """文本中相邻两个中日韩文字组成的二元组(去重), 以空格连接后写入 prompts_bigram"""
+    bigrams = {}
+    for run in _CJK_RUN.findall(text):
+        for i in range(len(run) - 1):
+            bigrams[run[i:i + 2]] = None
+    return " ".join(bigrams)
+
+
+class HistoryStore:
+    """
+    使用SQLite保存提示词历史, 新增提示词或文件时只写入对应的一条记录,
+    不再整体重写历史文件
+    """
+    def __init__(self, db_path=HISTORY_DB):
+        self.db_path = db_path
+        # 界面和后台写入线程各用一个连接, 写入冲突时等待对方提交
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        # WAL模式下写入只追加日志, 崩溃时不会损坏已提交的数据
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS groups ("
+            " id INTEGER PRIMARY KEY,"
+            " timestamp TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS prompts ("
+            " id INTEGER PRIMARY KEY,"
+            " group_id INTEGER NOT NULL,"
+            " text TEXT NOT NULL,"
+            " created_at TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS prompts_group ON prompts(group_id);"
+            "CREATE TABLE IF NOT EXISTS files ("
+            " id INTEGER PRIMARY KEY,"
+            " group_id INTEGER NOT NULL,"
+            " path TEXT NOT NULL,"
+            " metadata TEXT,"
+            " created_at TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS files_group ON files(group_id);"
+            "CREATE INDEX IF NOT EXISTS files_path ON files(path);"
+            "CREATE TABLE IF NOT EXISTS recall ("
+            " id INTEGER PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " count INTEGER NOT NULL,"
+            " rank REAL NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " signature BLOB);"
+            "CREATE TABLE IF NOT EXISTS recall_variants ("
+            " digest TEXT PRIMARY KEY,"
+            " recall_id INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS recall_variants_recall ON recall_variants(recall_id);"
+            "CREATE INDEX IF NOT EXISTS recall_rank ON recall(rank);"
+            "CREATE TABLE IF NOT EXISTS templates ("
+            " name TEXT PRIMARY KEY,"
+            " body TEXT NOT NULL,"
+            " updated_at TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS meta ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT);"
+        )
+        self._add_column("groups", "pinned", "INTEGER NOT NULL DEFAULT 0")
+        self.conn.commit()
+        self.has_fts = self._create_fts()
+        # 分组编号只增不减: 最新的分组被归档或删除后编号也不会被重新使用
+        self._next_group_id = max(
+            self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM groups").fetchone()[0],
+            int(self.get_meta('next_group_id', 0))
+        )
+
+    def _add_column(self, table, column, definition):
+        """给旧版本数据库中的表添加新列"""
+        columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            try:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            except sqlite3.OperationalError:
+                pass  # 另一个连接已经添加
+
+    def _create_fts(self):
+        """
+        建立提示词的FTS5全文索引, 用触发器和 prompts 表保持同步;
+        trigram分词可以匹配中文等没有空格分隔的文本, 两个字的中日韩搜索词使用
+        只保存二元组的 prompts_bigram 索引, 由 add_prompt/delete_groups 维护;
+        SQLite不支持FTS5时返回False
+        """
+        try:
+            exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'prompts_fts'"
+            ).fetchone() is not None
+            bigram_exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'prompts_bigram'"
+            ).fetchone() is not None
+            with self.conn:
+                self.conn.executescript(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS prompts_fts USING fts5("
+                    " text, content='prompts', content_rowid='id', tokenize='trigram');"
+                    "CREATE TRIGGER IF NOT EXISTS prompts_fts_insert AFTER INSERT ON prompts BEGIN"
+                    " INSERT INTO prompts_fts (rowid, text) VALUES (new.id, new.text); END;"
+                    "CREATE TRIGGER IF NOT EXISTS prompts_fts_delete AFTER DELETE ON prompts BEGIN"
+                    " INSERT INTO prompts_fts (prompts_fts, rowid, text) VALUES ('delete', old.id, old.text); END;"
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS prompts_bigram USING fts5("
+                    " text, content='', tokenize='unicode61');"
+                )
+                if not exists:
+                    # 为已有的历史建立索引
+                    self.conn.execute("INSERT INTO prompts_fts (prompts_fts) VALUES ('rebuild')")
+                if not bigram_exists:
+                    for prompt_id, text in self.conn.execute("SELECT id, text FROM prompts").fetchall():
+                        self._index_bigrams(prompt_id, text)
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    def _index_bigrams(self, prompt_id, text, delete=False):
+        """
+        prompts_bigram 不保存原文, 删除时需要提供和写入时相同的内容, 所以两者都从原文计算;
+        没有二元组的提示词不写入
+        """
+        bigrams = _cjk_bigrams(text)
+        if not bigrams:
+            return
+        if delete:
+            self.conn.execute("INSERT INTO prompts_bigram (prompts_bigram, rowid, text) VALUES ('delete', ?, ?)",
+                              (prompt_id, bigrams))
+        else:
+            self.conn.execute("INSERT INTO prompts_bigram (rowid, text) VALUES (?, ?)", (prompt_id, bigrams))
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM groups LIMIT 1").fetchone() is None
+
+    def reserve_group_id(self, group):
+        """分配分组编号, 记录由 HistoryWriter 在后台写入"""
+        group.id = self._next_group_id
+        self._next_group_id += 1
+        return group.id
+
+    def ensure_next_group_id(self, next_id):
+        """保证之后分配的分组编号不小于 next_id, 例如归档中已经用过的编号"""
+        self._next_group_id = max(self._next_group_id, next_id)
+        self._save_next_group_id(self._next_group_id)
+
+    def _save_next_group_id(self, next_id):
+        """在 meta 中记录已经用过的最大编号, 只会增大"""
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('next_group_id', ?)"
+            " ON CONFLICT(key) DO UPDATE SET value = MAX(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER))",
+            (next_id,)
+        )
+
+    def add_group(self, group):
+        if group.id is None:
+            self.reserve_group_id(group)
+        self.conn.execute("INSERT INTO groups (id, timestamp) VALUES (?, ?)", (group.id, group.timestamp))
+        self._save_next_group_id(group.id + 1)
+
+    def add_prompt(self, group, text, created_at=None):
+        cursor = self.conn.execute(
+            "INSERT INTO prompts (group_id, text, created_at) VALUES (?, ?, ?)",
+            (group.id, text, created_at or now_timestamp())
+        )
+        if self.has_fts:
+            self._index_bigrams(cursor.lastrowid, text)
+
+    def add_file(self, group, path, metadata, created_at=None):
+        self.conn.execute(
+            "INSERT INTO files (group_id, path, metadata, created_at) VALUES (?, ?, ?, ?)",
+            (group.id, path, json.dumps(metadata, ensure_ascii=False) if metadata is not None else None,
+             created_at or now_timestamp())
+        )
+
+    def load_groups(self, limit=None, before_id=None):
+        """
+        按时间顺序加载分组; 指定 limit 时只加载 before_id 之前最近的 limit 个分组,
+        附件只加载元数据, 内容保存在blob中按需读取
+        """
+        query = "SELECT id, timestamp FROM groups"
+        params = []
+        if before_id is not None:
+            query += " WHERE id < ?"
+            params.append(before_id)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        groups = {}
+        for group_id, timestamp in reversed(self.conn.execute(query, params).fetchall()):
+            group = PromptGroup()
+            group.id = group_id
+            group.timestamp = timestamp
+            groups[group_id] = group
+        if not groups:
+            return []
+
+        # 编号在这一页最小和最大编号之间的分组都在这一页中(编号可能因归档等原因不连续),
+        # 用范围查询可以走索引, 只需过滤掉不属于任何分组的记录
+        id_range = (min(groups), max(groups))
+        for group_id, text in self.conn.execute(
+                "SELECT group_id, text FROM prompts WHERE group_id BETWEEN ? AND ? ORDER BY id", id_range):
+            if group_id in groups:
+                groups[group_id].prompts.append(text)
+        for group_id, path, metadata in self.conn.execute(
+                "SELECT group_id, path, metadata FROM files WHERE group_id BETWEEN ? AND ? ORDER BY id", id_range):
+            if group_id in groups:
+                group = groups[group_id]
+                group.files.append(path)
+                if metadata is not None:
+                    group.file_metadata[path] = json.loads(metadata)
+        return list(groups.values())
+
+    def has_groups_before(self, group_id):
+        return self.conn.execute("SELECT 1 FROM groups WHERE id < ? LIMIT 1", (group_id,)).fetchone() is not None
+
+    def search(self, text, since=None, until=None, file_name=None, limit=100):
+        """
+        搜索提示词, 返回 [(group_id, text, created_at)], 全文索引可用时按相关度排序,
+        否则按时间倒序; since/until 是 "%Y-%m-%d" 或完整时间戳, file_name 匹配分组附件的路径
+        """
+        terms = text.split()
+        # trigram分词至少需要3个字符; 两个中日韩文字的词使用二元组索引, 其它更短的词用 LIKE 过滤
+        fts_terms = [t for t in terms if self.has_fts and len(t) >= 3]
+        bigram_terms = [t for t in terms if self.has_fts and len(t) == 2 and _CJK_RUN.fullmatch(t)]
+        like_terms = [t for t in terms if t not in fts_terms and t not in bigram_terms]
+        bigram_match = " ".join('"%s"' % t for t in bigram_terms)
+
+        where = []
+        params = []
+        if fts_terms:
+            query = ("SELECT p.group_id, p.text, p.created_at FROM prompts_fts"
+                     " JOIN prompts p ON p.id = prompts_fts.rowid")
+            where.append("prompts_fts MATCH ?")
+            params.append(" ".join('"%s"' % t.replace('"', '""') for t in fts_terms))
+            order = "bm25(prompts_fts), p.id DESC"
+            if bigram_terms:
+                where.append("p.id IN (SELECT rowid FROM prompts_bigram WHERE prompts_bigram MATCH ?)")
+                params.append(bigram_match)
+        elif bigram_terms:
+            query = ("SELECT p.group_id, p.text, p.created_at FROM prompts_bigram"
+                     " JOIN prompts p ON p.id = prompts_bigram.rowid")
+            where.append("prompts_bigram MATCH ?")
+            params.append(bigram_match)
+            order = "p.id DESC"
+        else:
+            query = "SELECT p.group_id, p.text, p.created_at FROM prompts p"
+            order = "p.id DESC"
+        for term in like_terms:
+            where.append("p.text LIKE ? ESCAPE '\\'")
+            params.append("%" + _escape_like(term) + "%")
+        if since:
+            where.append("p.created_at >= ?")
+            params.append(since)
+        if until:
+            # 只给日期时包含当天全部记录
+            where.append("p.created_at <= ?")
+            params.append(until if len(until) > 10 else until + " 23:59:59")
+        if file_name:
+            where.append("EXISTS (SELECT 1 FROM files f WHERE f.group_id = p.group_id"
+                         " AND f.path LIKE ? ESCAPE '\\')")
+            params.append("%" + _escape_like(file_name) + "%")
+
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY " + order + " LIMIT ?"
+        params.append(limit)
+        return self.conn.execute(query, params).fetchall()
+
+    def find_file_metadata(self, path):
+        """在全部历史(包括尚未加载的分组)中查找文件元数据, 返回最早分组中的"""
+        row = self.conn.execute(
+            "SELECT metadata FROM files WHERE path = ? ORDER BY group_id, id LIMIT 1", (path,)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def earliest_file_metadata(self):
+        """
+        每个附件路径在最早分组中的元数据, 产出 (path, group_id, metadata), 用于 FileIndex.seed;
+        SQLite 中和 MIN() 一起查询的其它列取自最小值所在的行
+        """
+        for path, group_id, metadata in self.conn.execute(
+                "SELECT path, MIN(group_id), metadata FROM files GROUP BY path"):
+            yield path, group_id, json.loads(metadata) if metadata is not None else None
+
+    def find_groups_using(self, path):
+        """在全部历史中查找使用过该文件的分组编号"""
+        rows = self.conn.execute("SELECT DISTINCT group_id FROM files WHERE path = ? ORDER BY group_id", (path,))
+        return [group_id for group_id, in rows]
+
+    def list_templates(self):
+        """返回 [(名称, 内容)], 按名称排序"""
+        return self.conn.execute("SELECT name, body FROM templates ORDER BY name").fetchall()
+
+    def save_template(self, name, body):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO templates (name, body, updated_at) VALUES (?, ?, ?)",
+                (name, body, now_timestamp())
+            )
+
+    def delete_template(self, name):
+        with self.conn:
+            self.conn.execute("DELETE FROM templates WHERE name = ?", (name,))
+
+    def load_recall(self, limit=None):
+        """返回排名最高的 limit 条召回记录和它们的变体哈希, 用于 RecallIndex.load"""
+        query = "SELECT id, text, count, rank, last_used, signature FROM recall ORDER BY rank DESC"
+        rows = self.conn.execute(query + (" LIMIT ?" if limit else ""), (limit,) if limit else ()).fetchall()
+        if limit:
+            variants = self.conn.execute(
+                "SELECT digest, recall_id FROM recall_variants WHERE recall_id IN"
+                " (SELECT id FROM recall ORDER BY rank DESC LIMIT ?)", (limit,)).fetchall()
+        else:
+            variants = self.conn.execute("SELECT digest, recall_id FROM recall_variants").fetchall()
+        return rows, variants
+
+    def prune_recall(self, keep):
+        """只保留排名最高的 keep 条召回记录, 返回删除的记录数"""
+        cursor = self.conn.execute(
+            "DELETE FROM recall WHERE id NOT IN (SELECT id FROM recall ORDER BY rank DESC LIMIT ?)", (keep,))
+        self.conn.execute("DELETE FROM recall_variants WHERE recall_id NOT IN (SELECT id FROM recall)")
+        return cursor.rowcount
+
+    def delete_recall_entries(self, recall_ids):
+        params = [(recall_id,) for recall_id in recall_ids]
+        self.conn.executemany("DELETE FROM recall WHERE id = ?", params)
+        self.conn.executemany("DELETE FROM recall_variants WHERE recall_id = ?", params)
+
+    def save_recall_entry(self, row):
+        """row 是 RecallEntry.to_row() 的结果"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO recall (id, text, count, rank, last_used, signature)"
+            " VALUES (?, ?, ?, ?, ?, ?)", row)
+
+    def add_recall_variant(self, digest, recall_id):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO recall_variants (digest, recall_id) VALUES (?, ?)", (digest, recall_id))
+
+    def recent_prompts(self, limit):
+        """最近的 limit 条提示词, 按时间顺序返回 [(text, created_at)]"""
+        rows = self.conn.execute(
+            "SELECT text, created_at FROM prompts ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return rows[::-1]
+
+    def groups_to_archive(self, keep_groups=0, keep_days=0, exclude=()):
+        """
+        超出保留策略的分组编号: 不在最近 keep_groups 个分组中, 并且早于 keep_days 天;
+        两个条件都为0时不归档, 从归档恢复的分组和 exclude 中的分组(当前分组,
+        还有记录没有写入的分组)不归档
+        """
+        if keep_groups <= 0 and keep_days <= 0:
+            return []
+        query = "SELECT id FROM groups WHERE pinned = 0"
+        params = []
+        if keep_groups > 0:
+            query += " AND id < (SELECT id FROM groups ORDER BY id DESC LIMIT 1 OFFSET ?)"
+            params.append(keep_groups - 1)
+        if keep_days > 0:
+            query += " AND timestamp < ?"
+            params.append((datetime.now() - timedelta(days=keep_days)).strftime("%Y-%m-%d %H:%M:%S"))
+        query += " ORDER BY id"
+        return [group_id for group_id, in self.conn.execute(query, params) if group_id not in exclude]
+
+    def export_groups(self, group_ids):
+        """导出分组的全部记录, 用于写入归档"""
+        records = []
+        for group_id in group_ids:
+            row = self.conn.execute("SELECT timestamp FROM groups WHERE id = ?", (group_id,)).fetchone()
+            if row is None:
+                continue
+            prompts = self.conn.execute(
+                "SELECT text, created_at FROM prompts WHERE group_id = ? ORDER BY id", (group_id,))
+            files = self.conn.execute(
+                "SELECT path, metadata, created_at FROM files WHERE group_id = ? ORDER BY id", (group_id,))
+            records.append({
+                'id': group_id,
+                'timestamp': row[0],
+                'prompts': [{'text': text, 'created_at': created_at} for text, created_at in prompts],
+                'files': [{'path': path, 'metadata': json.loads(metadata) if metadata is not None else None,
+                           'created_at': created_at} for path, metadata, created_at in files],
+            })
+        return records
+
+    def delete_groups(self, group_ids):
+        params = [(group_id,) for group_id in group_ids]
+        if self.has_fts:
+            for group_id, in params:
+                for prompt_id, text in self.conn.execute(
+                        "SELECT id, text FROM prompts WHERE group_id = ?", (group_id,)).fetchall():
+                    self._index_bigrams(prompt_id, text, delete=True)
+        self.conn.executemany("DELETE FROM prompts WHERE group_id = ?", params)
+        self.conn.executemany("DELETE FROM files WHERE group_id = ?", params)
+        self.conn.executemany("DELETE FROM groups WHERE id = ?", params)
+
+    def archive_groups(self, archive, keep_groups=0, keep_days=0, segment_size=1000, exclude=()):
+        """
+        把超出保留策略的分组移到归档分段中, 返回归档的分组数;
+        先写入分段再删除记录, 中途出错时分组最多同时存在于两边, 不会丢失
+        """
+        group_ids = self.groups_to_archive(keep_groups, keep_days, exclude)
+        for start in range(0, len(group_ids), segment_size):
+            batch = group_ids[start:start + segment_size]
+            archive.write_segment(self.export_groups(batch))
+            with self.conn:
+                self.delete_groups(batch)
+        return len(group_ids)
+
+    def restore_group(self, record):
+        """
+        把归档中的分组恢复到历史数据库, 恢复的分组不再被保留策略归档;
+        数据库中已有同一编号的其它分组时抛出 ValueError, 归档中的记录需要保留
+        """
+        with self.conn:
+            row = self.conn.execute("SELECT timestamp FROM groups WHERE id = ?", (record['id'],)).fetchone()
+            if row is not None and row[0] != record['timestamp']:
+                raise ValueError(f"group {record['id']} already exists with different content")
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO groups (id, timestamp, pinned) VALUES (?, ?, 1)",
+                    (record['id'], record['timestamp'])
+                )
+                group = PromptGroup()
+                group.id = record['id']
+                for prompt in record['prompts']:
+                    self.add_prompt(group, prompt['text'], prompt['created_at'])
+                for entry in record['files']:
+                    self.add_file(group, entry['path'], entry['metadata'], entry['created_at'])
+            else:
+                self.conn.execute("UPDATE groups SET pinned = 1 WHERE id = ?", (record['id'],))
+        self._next_group_id = max(self._next_group_id, record['id'] + 1)
+
+    def vacuum(self):
+        """整理全文索引并回收删除记录后的空间"""
+        self.conn.commit()
+        if self.has_fts:
+            self.conn.execute("INSERT INTO prompts_fts (prompts_fts) VALUES ('optimize')")
+            self.conn.execute("INSERT INTO prompts_bigram (prompts_bigram) VALUES ('optimize')")
+            self.conn.commit()
+        self.conn.execute("VACUUM")
+
+    def migrate_json(self, json_path=LEGACY_HISTORY_FILE):
+        """
+        一次性导入旧的 prompt_history.json, 导入后将其重命名为 .migrated,
+        返回导入的分组数
+        """
+        if not os.path.exists(json_path) or not self.is_empty():
+            return 0
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self.conn:
+            for group_data in data:
+                group = PromptGroup.from_dict(group_data)
+                self.add_group(group)
+                for text in group.prompts:
+                    self.add_prompt(group, text, group.timestamp)
+                for path in group.files:
+                    self.add_file(group, path, group.file_metadata.get(path), group.timestamp)
+        os.replace(json_path, json_path + ".migrated")
+        return len(data)
+
+    def migrate_inline_blobs(self, blobs):
+        """
+        把旧格式中以base64内嵌在元数据里的文件内容转存到 BlobStore,
+        元数据只保留哈希, 大小和文件名, 返回转存的文件数; 只在第一次调用时扫描
+        """
+        if self.get_meta('inline_blobs_migrated'):
+            return 0
+        rows = self.conn.execute(
+            "SELECT id, path, metadata FROM files WHERE json_extract(metadata, '$.content') IS NOT NULL"
+        ).fetchall()
+        with self.conn:
+            for file_id, path, metadata in rows:
+                metadata = json.loads(metadata)
+                name = metadata.get("name", os.path.basename(path))
+                digest, size = blobs.put_bytes(base64.b64decode(metadata["content"]), name)
+                self.conn.execute(
+                    "UPDATE files SET metadata = ? WHERE id = ?",
+                    (json.dumps({"hash": digest, "size": size, "name": name}, ensure_ascii=False), file_id)
+                )
+            self.set_meta('inline_blobs_migrated', '1')
+        return len(rows)
+
+    def referenced_blobs(self):
+        """所有分组引用的blob哈希"""
+        rows = self.conn.execute(
+            "SELECT DISTINCT json_extract(metadata, '$.hash') FROM files WHERE metadata IS NOT NULL"
+        )
+        return {digest for digest, in rows if digest}
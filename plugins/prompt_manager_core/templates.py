@@ -0,0 +1,78 @@
+import re
+import hashlib
+from collections import OrderedDict
+
+# {{name}} 或 {{name:参数}}, 例如 {{language}}, {{dump}}, {{dump:src/main.py}}, {{file:notes.md}}
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([A-Za-z_][\w.-]*)\s*(?::\s*(.*?)\s*)?\}\}", re.DOTALL)
+# 内置的数据来源, 其它名字都是需要用户填写的变量
+SOURCE_DUMP = "dump"    # File Reader 的dump, 带参数时只取一个文件
+SOURCE_FILES = "files"  # 当前分组附件的路径列表
+SOURCE_FILE = "file"    # 当前分组中一个附件的内容, 参数是路径或文件名
+SOURCES = {SOURCE_DUMP, SOURCE_FILES, SOURCE_FILE}
+# 缓存的已编译模板数量
+TEMPLATE_CACHE_SIZE = 128
+
+
+def template_digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class CompiledTemplate:
+    """
+    编译后的模板: 文本被切分成固定文本和占位符交替的片段,
+    渲染时每个占位符只取一次值, 最后一次 join 成结果
+    """
+    def __init__(self, text):
+        self.digest = template_digest(text)
+        self.parts = []  # 固定文本为 str, 占位符为 (名字, 参数)
+        self.placeholders = []  # 按出现顺序去重
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            if match.start() > position:
+                self.parts.append(text[position:match.start()])
+            placeholder = (match.group(1), match.group(2) or None)
+            self.parts.append(placeholder)
+            if placeholder not in self.placeholders:
+                self.placeholders.append(placeholder)
+            position = match.end()
+        if position < len(text):
+            self.parts.append(text[position:])
+
+    @property
+    def variables(self):
+        """需要用户填写的变量名, 按出现顺序"""
+        names = []
+        for name, _ in self.placeholders:
+            if name not in SOURCES and name not in names:
+                names.append(name)
+        return names
+
+    def render(self, resolve):
+        """
+        resolve(名字, 参数) 返回占位符的值, 返回None时保留占位符原文;
+        值可能有几MB, 所以只拼接一次
+        """
+        values = {}
+        for name, arg in self.placeholders:
+            value = resolve(name, arg)
+            if value is None:
+                value = "{{%s}}" % (name if arg is None else "%s:%s" % (name, arg))
+            values[(name, arg)] = value
+        return "".join(part if isinstance(part, str) else values[part] for part in self.parts)
+
+
+_cache = OrderedDict()
+
+
+def compile_template(text):
+    """编译模板, 相同内容的模板按哈希缓存, 只编译一次"""
+    digest = template_digest(text)
+    template = _cache.get(digest)
+    if template is None:
+        template = CompiledTemplate(text)
+        _cache[digest] = template
+        if len(_cache) > TEMPLATE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(digest)
+    return template
@@ -0,0 +1,226 @@
+import time
+import threading
+from .store import HISTORY_DB, HistoryStore, now_timestamp
+
+# 第一个参数是分组的写入操作
+GROUP_OPS = {"add_group", "add_prompt", "add_file"}
+
+
+class HistoryWriter:
+    """
+    在后台线程中写入历史: 界面只把新增记录放进队列, 写入线程在一段时间内
+    没有新的改动后把队列中的全部记录放在一个事务中提交, 事务保证写入是原子的;
+    写入线程使用自己的数据库连接; 一批记录连续失败 max_attempts 次后逐条写入,
+    丢弃出错的记录, 不让一条坏记录阻塞之后的全部写入
+    """
+    def __init__(self, db_path=HISTORY_DB, delay=0.5, max_delay=2.0, max_attempts=3, on_write=None,
+                 on_error=None):
+        self.db_path = db_path
+        # 每次写入后在写入线程中调用 on_write(耗时秒数, 记录数, 错误或None)
+        self.on_write = on_write
+        # 丢弃记录后在写入线程中调用 on_error([(操作, 错误信息)])
+        self.on_error = on_error
+        self.delay = delay  # 最后一次改动后等待的时间
+        self.max_delay = max_delay  # 持续有改动时最多推迟的时间
+        self.max_attempts = max_attempts
+        self.last_write_duration = 0.0
+        self.last_write_count = 0
+        self.write_count = 0
+        self.last_error = None
+        self.dropped = []  # 被丢弃的记录 [(操作, 错误信息)]
+        self._attempts = 0
+        self._failures = 0  # 当前这批记录连续失败的次数
+        self._ops = []
+        self._batch = []  # 正在写入的记录
+        self._scheduled_at = None  # 第一次未写入的改动的时间
+        self._changed_at = None  # 最近一次改动的时间
+        self._writing = 0  # 正在写入的记录数
+        self._flush_now = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="HistoryWriter", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending_writes(self):
+        """还没有提交的记录数, 包括正在写入的"""
+        with self._cond:
+            return len(self._ops) + self._writing
+
+    def pending_groups(self):
+        """队列中和正在写入的记录所属的分组编号, 这些分组还不能归档"""
+        with self._cond:
+            return {args[0].id for op, args in self._ops + self._batch if op in GROUP_OPS}
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "pending_writes": len(self._ops) + self._writing,
+                "last_write_duration": self.last_write_duration,
+                "last_write_count": self.last_write_count,
+                "write_count": self.write_count,
+                "last_error": self.last_error,
+                "dropped_writes": len(self.dropped),
+            }
+
+    def add_group(self, group):
+        """分组编号需要事先由界面的 HistoryStore.reserve_group_id 分配"""
+        self._enqueue("add_group", group)
+
+    def add_prompt(self, group, text, created_at=None):
+        # 时间在加入队列时记录, 不受写入延迟影响
+        self._enqueue("add_prompt", group, text, created_at or now_timestamp())
+
+    def add_file(self, group, path, metadata, created_at=None):
+        self._enqueue("add_file", group, path, metadata, created_at or now_timestamp())
+
+    def save_recall_entry(self, entry):
+        # 条目之后还会在界面线程中修改, 这里保存当时的值
+        self._enqueue("save_recall_entry", entry.to_row())
+
+    def add_recall_variant(self, digest, recall_id):
+        self._enqueue("add_recall_variant", digest, recall_id)
+
+    def delete_recall_entries(self, recall_ids):
+        self._enqueue("delete_recall_entries", list(recall_ids))
+
+    def _enqueue(self, op, *args):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("HistoryWriter is closed")
+            self._ops.append((op, args))
+            now = time.monotonic()
+            self._changed_at = now
+            if self._scheduled_at is None:
+                self._scheduled_at = now
+            self._cond.notify_all()
+
+    def request_flush(self):
+        """
+        让写入线程立即写入队列中的记录, 不等待完成;
+        返回是否还有未提交的记录(包括正在写入的), 没有时之后不会有写入完成的通知
+        """
+        with self._cond:
+            if not self._ops:
+                return self._writing > 0
+            self._flush_now = True
+            self._cond.notify_all()
+            return True
+
+    def flush(self, timeout=None):
+        """
+        立即写入队列中的记录并等待完成, 全部写入返回True;
+        写入失败, 有记录被丢弃或超时返回False
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            attempts = self._attempts
+            dropped = len(self.dropped)
+            self._flush_now = True
+            self._cond.notify_all()
+            while self._ops or self._writing:
+                if self._attempts > attempts and self.last_error is not None:
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return len(self.dropped) == dropped
+
+    def close(self, timeout=None):
+        """写入剩余的记录并结束写入线程, 程序退出时调用"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _next_batch(self):
+        """等待到应该写入的时候, 取出队列中的全部记录; 线程结束时返回None"""
+        with self._cond:
+            while True:
+                if self._ops:
+                    now = time.monotonic()
+                    due = min(self._changed_at + self.delay, self._scheduled_at + self.max_delay)
+                    if self._flush_now or self._closed or now >= due:
+                        break
+                    self._cond.wait(due - now)
+                elif self._closed:
+                    return None
+                else:
+                    self._flush_now = False
+                    self._cond.wait()
+            ops, self._ops = self._ops, []
+            self._batch = ops
+            self._writing = len(ops)
+            self._scheduled_at = self._changed_at = None
+            self._flush_now = False
+            return ops
+
+    def _run(self):
+        store = HistoryStore(self.db_path)
+        try:
+            while True:
+                ops = self._next_batch()
+                if ops is None:
+                    break
+                start = time.perf_counter()
+                error = self._apply(store, ops)
+                dropped = []
+                if error is not None and (self._closed or self._failures + 1 >= self.max_attempts):
+                    # 多次失败或即将退出时逐条写入, 只丢弃出错的记录
+                    dropped = self._apply_each(store, ops)
+                    error = None
+                duration = time.perf_counter() - start
+                with self._cond:
+                    self._writing = 0
+                    self._batch = []
+                    self._attempts += 1
+                    if error is None:
+                        self._failures = 0
+                        self.last_write_duration = duration
+                        self.last_write_count = len(ops) - len(dropped)
+                        self.write_count += 1
+                        self.dropped.extend(dropped)
+                        self.last_error = dropped[-1][1] if dropped else None
+                    else:
+                        self._failures += 1
+                        self.last_error = str(error)
+                        # 事务已回滚, 记录放回队列等下次重试
+                        self._ops[:0] = ops
+                        now = time.monotonic()
+                        self._scheduled_at = now
+                        self._changed_at = now
+                    self._cond.notify_all()
+                if self.on_write is not None:
+                    self.on_write(duration, len(ops), error)
+                if dropped and self.on_error is not None:
+                    self.on_error(dropped)
+        finally:
+            store.close()
+
+    @staticmethod
+    def _apply(store, ops):
+        """在一个事务中写入一批记录, 返回错误或None"""
+        try:
+            with store.conn:
+                for op, args in ops:
+                    getattr(store, op)(*args)
+        except Exception as e:
+            print(f"Error saving history: {e}")
+            return e
+        return None
+
+    @staticmethod
+    def _apply_each(store, ops):
+        """逐条写入, 返回出错被丢弃的记录 [(操作, 错误信息)]"""
+        dropped = []
+        for op, args in ops:
+            try:
+                with store.conn:
+                    getattr(store, op)(*args)
+            except Exception as e:
+                print(f"Error saving history, dropped {op}: {e}")
+                dropped.append((op, str(e)))
+        return dropped
@@ -0,0 +1,106 @@
+# profiler.py
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class SpanStats:
+    """同名计时的汇总: 次数, 总耗时, 最大耗时, 最近一次耗时以及处理的字节数和条目数"""
+    __slots__ = ('name', 'count', 'total', 'max', 'last', 'bytes', 'items')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.bytes = 0
+        self.items = 0
+
+    def add(self, duration: float, nbytes: int = 0, items: int = 0):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.last = duration
+        self.bytes += nbytes
+        self.items += items
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class Profiler:
+    """
+    记录启动和常用操作的耗时, 可以在多个线程中使用;
+    每条记录可以附带 bytes(处理的字节数), items(处理的条目数) 等字段,
+    设置日志文件后每条记录以一行JSON追加写入
+    """
+    def __init__(self, log_path: Optional[str] = None, history: int = 1000):
+        self._lock = threading.Lock()
+        self.stats: Dict[str, SpanStats] = {}
+        self.recent = deque(maxlen=history)  # 最近的记录
+        self.log_path = log_path
+        self._log = None
+
+    def set_log_path(self, log_path: Optional[str]):
+        """设置JSON Lines日志文件, None表示不写日志"""
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            self.log_path = log_path
+
+    def record(self, name: str, duration: float, **fields):
+        """记录一次耗时(秒), fields 中的 bytes 和 items 计入汇总"""
+        entry = {"ts": time.time(), "name": name, "duration_ms": round(duration * 1000, 3)}
+        entry.update(fields)
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = SpanStats(name)
+            stats.add(duration, fields.get("bytes", 0) or 0, fields.get("items", 0) or 0)
+            self.recent.append(entry)
+            if self.log_path:
+                try:
+                    if self._log is None:
+                        self._log = open(self.log_path, 'a', encoding='utf-8')
+                    self._log.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    self._log.flush()
+                except OSError as e:
+                    print(f"Error writing profile log: {e}")
+                    self.log_path = None
+
+    @contextmanager
+    def span(self, name: str, **fields):
+        """
+        计时一段代码, 可以在代码块中补充字段:
+
+            with profiler.span("load_history") as span:
+                span["items"] = len(groups)
+        """
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.record(name, time.perf_counter() - start, **fields)
+
+    def snapshot(self) -> List[SpanStats]:
+        """当前的汇总, 按总耗时从高到低排序"""
+        with self._lock:
+            stats = [SpanStats(s.name) for s in self.stats.values()]
+            for copy, s in zip(stats, self.stats.values()):
+                copy.count, copy.total, copy.max, copy.last = s.count, s.total, s.max, s.last
+                copy.bytes, copy.items = s.bytes, s.items
+        return sorted(stats, key=lambda s: s.total, reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.recent.clear()
+
+    def close(self):
+        self.set_log_path(None)
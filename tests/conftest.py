@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试按 plugins.xxx_core 导入核心模块, 与基准测试相同, 不依赖 PyQt6
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
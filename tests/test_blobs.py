@@ -0,0 +1,92 @@
+import os
+import gzip
+import tempfile
+
+import pytest
+
+from plugins.prompt_manager_core import BlobStore
+
+
+@pytest.fixture
+def blobs(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"))
+
+
+def test_same_content_is_stored_once(blobs):
+    digest, size = blobs.put_bytes(b"hello world", "a.txt")
+    assert (digest, size) == blobs.put_bytes(b"hello world", "b.txt")
+    assert size == 11
+    assert len(list(blobs.iter_blobs())) == 1
+    with blobs.open(digest) as f:
+        assert f.read() == b"hello world"
+
+
+def test_compressed_formats_are_stored_as_is(blobs):
+    text_digest, _ = blobs.put_bytes(b"text", "notes.txt")
+    image_digest, _ = blobs.put_bytes(b"\x89PNG data", "image.png")
+    text_path, text_compressed = blobs.find(text_digest)
+    image_path, image_compressed = blobs.find(image_digest)
+    assert text_compressed and text_path.endswith(".gz")
+    with gzip.open(text_path, "rb") as f:
+        assert f.read() == b"text"
+    assert not image_compressed
+    with open(image_path, "rb") as f:
+        assert f.read() == b"\x89PNG data"
+
+
+def test_copy_to_and_missing_blob(tmp_path, blobs):
+    digest, _ = blobs.put_bytes(b"content", "a.txt")
+    dest = str(tmp_path / "out.txt")
+    blobs.copy_to(digest, dest)
+    with open(dest, "rb") as f:
+        assert f.read() == b"content"
+    assert not blobs.exists("0" * 64)
+    with pytest.raises(FileNotFoundError):
+        blobs.open("0" * 64)
+    assert os.listdir(blobs.root) == [digest[:2]]
+
+
+def test_put_file_streams_in_chunks(tmp_path, blobs, monkeypatch):
+    monkeypatch.setattr("plugins.prompt_manager_core.blobs.COPY_CHUNK_SIZE", 1000)
+    path = str(tmp_path / "large.log")
+    data = os.urandom(2500)
+    with open(path, "wb") as f:
+        f.write(data)
+    progress = []
+    digest, size = blobs.put_file(path, lambda done, total: progress.append((done, total)))
+    assert size == 2500
+    assert progress == [(1000, 2500), (2000, 2500), (2500, 2500)]
+    assert BlobStore.hash_file(path) == (digest, size)
+    with blobs.open(digest) as f:
+        assert f.read() == data
+    # 相同内容再次保存时不留下临时文件
+    assert blobs.put_file(path) == (digest, size)
+    assert [name for name in os.listdir(blobs.root) if name != digest[:2]] == []
+
+
+def test_collect_garbage_removes_unreferenced_blobs(blobs):
+    keep, _ = blobs.put_bytes(b"keep", "a.txt")
+    drop, _ = blobs.put_bytes(b"drop" * 100, "b.bin")
+    removed, freed = blobs.collect_garbage({keep})
+    assert removed == 1 and freed > 0
+    assert blobs.exists(keep)
+    assert not blobs.exists(drop)
+
+
+def test_garbage_collection_ignores_files_that_are_not_blobs(blobs, monkeypatch):
+    digest, _ = blobs.put_bytes(b"keep", "a.txt")
+    prefix_dir = os.path.join(blobs.root, digest[:2])
+    # 正在写入的临时文件或其他程序留下的文件不是blob
+    stray = os.path.join(prefix_dir, "tmpabc123")
+    open(stray, "wb").close()
+    assert [d for d, _ in blobs.iter_blobs()] == [digest]
+    removed, _ = blobs.collect_garbage(set())
+    assert removed == 1
+    assert os.path.exists(stray)
+
+    # put_bytes 的临时文件在根目录中
+    temp_dirs = []
+    real_mkstemp = tempfile.mkstemp
+    monkeypatch.setattr(tempfile, "mkstemp", lambda dir: temp_dirs.append(dir) or real_mkstemp(dir=dir))
+    blobs.put_bytes(b"new", "b.txt")
+    assert temp_dirs == [blobs.root]
@@ -0,0 +1,64 @@
+import os
+
+from plugins.file_reader_core import ContentCache, FilterMatcher, FolderReader
+
+
+def test_hit_requires_same_size_and_mtime(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache.db"))
+    cache.put("a.txt", 5, 100, "hello", digest="d")
+    assert cache.get("a.txt", 5, 100) == ("hello", None, None, "d")
+    assert cache.get("a.txt", 5, 101) is None
+    assert cache.get("a.txt", 6, 100) is None
+    assert cache.get("b.txt", 5, 100) is None
+    assert (cache.hits, cache.misses) == (1, 3)
+    cache.close()
+
+
+def test_entries_persist_across_sessions(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache = ContentCache(db_path)
+    cache.put("a.txt", 1, 1, None, skipped="binary file")
+    cache.close()
+
+    cache = ContentCache(db_path)
+    assert cache.get("a.txt", 1, 1) == (None, None, "binary file", None)
+    cache.clear()
+    assert cache.get("a.txt", 1, 1) is None
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache.db"), max_bytes=300)
+    for name in ("a", "b", "c"):
+        cache.put(name, 1, 1, name * 80)
+    cache.get("a", 1, 1)
+    cache.put("d", 1, 1, "d" * 80)
+    cache.commit()
+    assert cache.total_bytes <= 300
+    assert cache.get("b", 1, 1) is None
+    assert cache.get("a", 1, 1) is not None
+    # 超过容量的单个条目不缓存
+    cache.put("huge", 1, 1, "x" * 1000)
+    assert cache.get("huge", 1, 1) is None
+    cache.close()
+
+
+def test_reader_uses_cache_until_file_changes(tmp_path):
+    root = tmp_path / "tree"
+    root.mkdir()
+    path = root / "a.txt"
+    path.write_text("first version")
+    cache = ContentCache(str(tmp_path / "cache.db"))
+    reader = FolderReader(FilterMatcher(set(), set()), cache=cache)
+
+    def read():
+        return [r for r in reader.iter_results(str(root)) if r.name == "a.txt"][0]
+
+    assert not read().cached
+    result = read()
+    assert result.cached and result.content == "first version"
+    path.write_text("second version!")
+    os.utime(path, ns=(result.mtime_ns + 10 ** 9, result.mtime_ns + 10 ** 9))
+    result = read()
+    assert not result.cached and result.content == "second version!"
+    cache.close()
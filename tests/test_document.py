@@ -0,0 +1,74 @@
+from plugins.file_reader_core import DumpDocument
+
+
+def make_document():
+    document = DumpDocument()
+    document.append_section("/root", "Directory: /root", "/root")
+    document.append_section("/root/a.txt", "\nFile: a.txt\nline 1\nline 2", "a.txt", 1)
+    document.append_section(None, "\nnotice", "notice")
+    return document
+
+
+def test_lines_and_text():
+    document = make_document()
+    assert document.line_count == 1 + 4 + 2
+    assert document.line(0) == "Directory: /root"
+    assert document.line(3) == "line 1"
+    assert document.line(100) == ""
+    assert document.text(3, 5) == "line 1\nline 2"
+    assert document.text() == "Directory: /root\n\nFile: a.txt\nline 1\nline 2\n\nnotice"
+    assert document.max_line_length == len("Directory: /root")
+    assert document.section_start_line(2) == 5
+    document.close()
+
+
+def test_insert_remove_and_replace_reindex():
+    document = make_document()
+    document.insert_section(1, "/root/0.txt", "\nFile: 0.txt\nzero", "0.txt", 1)
+    assert document.find_section("/root/a.txt") == 2
+    assert document.section_start_line(2) == 4
+    assert document.line(3) == "zero"
+
+    document.replace_section(2, "\nFile: a.txt\nnew content")
+    assert document.line(6) == "new content"
+    assert document.line_count == 1 + 3 + 3 + 2
+
+    document.remove_section(1)
+    assert document.find_section("/root/0.txt") is None
+    assert document.find_section("/root/a.txt") == 1
+    assert document.text() == "Directory: /root\n\nFile: a.txt\nnew content\n\nnotice"
+    document.close()
+
+
+def test_clear_resets_document():
+    document = make_document()
+    document.clear()
+    assert document.line_count == 0
+    assert document.sections == []
+    assert document.find_section("/root") is None
+    document.append_section("/other", "Directory: /other")
+    assert document.text() == "Directory: /other"
+    document.close()
+
+
+def test_line_cache_is_bounded():
+    document = DumpDocument()
+    for index in range(DumpDocument.CACHED_SECTIONS * 2):
+        document.append_section(f"/f{index}", f"section {index}")
+    for index in range(DumpDocument.CACHED_SECTIONS * 2):
+        assert document.line(index) == f"section {index}"
+    assert len(document._cache) == DumpDocument.CACHED_SECTIONS
+    document.close()
+
+
+def test_replace_compacts_dead_bytes(monkeypatch):
+    monkeypatch.setattr(DumpDocument, "COMPACT_THRESHOLD", 1000)
+    document = make_document()
+    for i in range(50):
+        document.replace_section(1, f"\nFile: a.txt\n{'x' * 100}{i}")
+        # 无用字节不会超过阈值和有效字节中较大的一个
+        assert document._dead <= max(1000, document._end - document._dead)
+    document.remove_section(2)
+    assert document.text() == f"Directory: /root\n\nFile: a.txt\n{'x' * 100}49"
+    assert document._end < 2000
+    document.close()
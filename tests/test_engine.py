@@ -0,0 +1,209 @@
+import os
+
+from plugins.file_reader_core import (PRIORITY_RECENT, PRIORITY_SMALLEST, PRIORITY_TREE, FilterMatcher,
+                                      FolderReader, ReadResult, is_binary)
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def make_reader(**kwargs):
+    return FolderReader(FilterMatcher(set(), {".png"}), **kwargs)
+
+
+def files_of(results):
+    return [r for r in results if r.kind == ReadResult.FILE]
+
+
+def make_tree(root):
+    for index in range(20):
+        write(os.path.join(root, f"f{index}.txt"), f"root file {index}\n")
+        write(os.path.join(root, "a", f"f{index}.txt"), f"a file {index}\n")
+        write(os.path.join(root, "a", "b", f"f{index}.txt"), f"b file {index}\n")
+        write(os.path.join(root, "c", f"f{index}.txt"), f"c file {index}\n")
+
+
+def walk_order(root):
+    order = []
+    for dirpath, _, filenames in os.walk(root):
+        order.append(dirpath)
+        order.extend(os.path.join(dirpath, name) for name in filenames)
+    return order
+
+
+def test_parallel_read_keeps_os_walk_order(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    for workers in (1, 8):
+        results = list(make_reader(workers=workers).iter_results(root))
+        assert [r.path for r in results] == walk_order(root)
+        for result in files_of(results):
+            with open(result.path, encoding="utf-8") as f:
+                assert result.content == f.read()
+
+
+def test_cancel_stops_enumeration(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    results = list(make_reader().iter_results(root, is_cancelled=lambda: True))
+    assert len(results) < len(walk_order(root))
+
+
+def test_subdirectory_read_uses_parent_ignore_rules(tmp_path):
+    root = str(tmp_path)
+    write(os.path.join(root, ".gitignore"), "*.log\n")
+    write(os.path.join(root, "sub", "keep.txt"), "keep")
+    write(os.path.join(root, "sub", "drop.log"), "drop")
+    write(os.path.join(root, "sub", "image.png"), "png")
+    reader = make_reader()
+    sub = os.path.join(root, "sub")
+    names = [r.name for r in files_of(reader.iter_results(sub, context=reader.context_for(root, sub)))]
+    assert names == ["keep.txt"]
+
+
+def test_binary_and_large_files_are_skipped(tmp_path):
+    root = str(tmp_path)
+    with open(os.path.join(root, "data.bin"), "wb") as f:
+        f.write(b"\x00\x01\x02")
+    write(os.path.join(root, "big.txt"), "x" * 2000)
+    results = {r.name: r for r in files_of(make_reader(max_file_size=1000).iter_results(root))}
+    assert results["data.bin"].skipped == "binary file"
+    assert results["big.txt"].skipped.startswith("file too large")
+    assert results["big.txt"].content is None
+
+
+def test_is_binary():
+    assert is_binary(b"abc\x00def")
+    assert is_binary(bytes(range(128, 256)) * 4)
+    assert not is_binary("中文内容".encode("utf-8"))
+    # 截断在多字节字符中间的开头不算无效字符
+    assert not is_binary("中文".encode("utf-8")[:-1])
+    assert not is_binary(b"")
+
+
+def test_total_size_limit_stops_reading(tmp_path):
+    root = str(tmp_path)
+    for index in range(5):
+        write(os.path.join(root, f"f{index}.txt"), "x" * 100)
+    results = list(make_reader(max_total_size=250).iter_results(root))
+    assert len(files_of(results)) == 2
+    assert results[-1].kind == ReadResult.NOTICE
+    assert "total size limit" in results[-1].name
+
+
+def test_token_budget_stops_in_tree_order(tmp_path):
+    root = str(tmp_path)
+    for index in range(5):
+        write(os.path.join(root, f"f{index}.txt"), f"{index} " * 200)
+    reader = make_reader(token_budget=250)
+    results = list(reader.iter_results(root))
+    files = files_of(results)
+    assert 0 < len(files) < 5
+    assert sum(r.tokens for r in files) <= 250
+    assert [r.path for r in files] == [p for p in walk_order(root) if p in {r.path for r in files}]
+    assert results[-1].kind == ReadResult.NOTICE
+
+
+def test_smallest_priority_prefers_small_files_in_tree_order(tmp_path):
+    root = str(tmp_path)
+    write(os.path.join(root, "large.txt"), "large " * 500)
+    write(os.path.join(root, "small1.txt"), "small " * 10)
+    write(os.path.join(root, "small2.txt"), "small " * 20)
+    reader = make_reader(token_budget=100, budget_priority=PRIORITY_SMALLEST)
+    results = list(reader.iter_results(root))
+    names = [r.name for r in files_of(results)]
+    assert sorted(names) == ["small1.txt", "small2.txt"]
+    assert [r.path for r in files_of(results)] == [p for p in walk_order(root) if os.path.basename(p) in names]
+    assert results[-1].name.startswith("Skipped 1 files")
+
+
+def test_recent_priority_prefers_recently_modified_files(tmp_path):
+    root = str(tmp_path)
+    for index in range(3):
+        path = os.path.join(root, f"f{index}.txt")
+        write(path, "recent " * 50)
+        os.utime(path, ns=(index * 10 ** 9, index * 10 ** 9))
+    reader = make_reader(token_budget=200, budget_priority=PRIORITY_RECENT)
+    names = sorted(r.name for r in files_of(reader.iter_results(root)))
+    assert names == ["f1.txt", "f2.txt"]
+
+
+def test_duplicates_are_output_as_references(tmp_path):
+    root = str(tmp_path)
+    content = "shared content line\n" * 10
+    write(os.path.join(root, "a", "one.txt"), content)
+    write(os.path.join(root, "b", "two.txt"), content)
+    write(os.path.join(root, "short1.txt"), "tiny")
+    write(os.path.join(root, "short2.txt"), "tiny")
+    results = list(make_reader(deduplicate=True).iter_results(root))
+    by_name = {r.name: r for r in files_of(results)}
+    first, second = sorted((by_name["one.txt"], by_name["two.txt"]), key=results.index)
+    assert first.content == content
+    assert second.content is None
+    assert second.duplicate_of == first.path
+    assert "Same content as " + first.path in second.format()
+    # 很短的文件不去重
+    assert by_name["short1.txt"].content == by_name["short2.txt"].content == "tiny"
+    assert results[-1].kind == ReadResult.NOTICE
+    assert results[-1].name.startswith("Deduplicated 1 files")
+
+
+def test_duplicates_are_charged_reference_cost_in_budget(tmp_path):
+    root = str(tmp_path)
+    content = "duplicated text " * 20
+    for index in range(4):
+        write(os.path.join(root, f"d{index}", "copy.txt"), content)
+    full = files_of(make_reader(deduplicate=True).iter_results(root))
+    used = sum(r.tokens for r in full)
+    for priority in (PRIORITY_TREE, PRIORITY_SMALLEST, PRIORITY_RECENT):
+        reader = make_reader(deduplicate=True, token_budget=used, budget_priority=priority)
+        results = list(reader.iter_results(root))
+        assert len(files_of(results)) == 4, priority
+        assert not any(r.kind == ReadResult.NOTICE and "budget" in r.name for r in results)
+
+
+def test_skipped_files_do_not_use_budget(tmp_path):
+    root = str(tmp_path)
+    write(os.path.join(root, "a.txt"), "a" * 120)
+    with open(os.path.join(root, "b.bin"), "wb") as f:
+        f.write(b"\x00" * 400 * 1024)
+    write(os.path.join(root, "c.txt"), "c" * 100)
+    write(os.path.join(root, "d.txt"), "d" * 5000)
+    for priority in (PRIORITY_TREE, PRIORITY_SMALLEST, PRIORITY_RECENT):
+        for max_file_size in (0, 4000):
+            reader = make_reader(token_budget=1000, budget_priority=priority, max_file_size=max_file_size)
+            results = {r.name: r for r in files_of(reader.iter_results(root))}
+            assert results["a.txt"].content == "a" * 120, priority
+            assert results["c.txt"].content == "c" * 100, priority
+            if max_file_size:
+                assert results["b.bin"].skipped.startswith("file too large"), priority
+                assert results["d.txt"].skipped.startswith("file too large"), priority
+            else:
+                assert results["b.bin"].skipped == "binary file", priority
+                assert "d.txt" not in results, priority
+
+
+def test_file_over_budget_is_skipped_and_reading_continues(tmp_path):
+    root = str(tmp_path)
+    write(os.path.join(root, "a.txt"), "a" * 100)
+    write(os.path.join(root, "big", "b.txt"), "b" * 4000)
+    write(os.path.join(root, "c", "c.txt"), "c" * 100)
+    results = list(make_reader(token_budget=100).iter_results(root))
+    assert sorted(r.name for r in files_of(results)) == ["a.txt", "c.txt"]
+    assert results[-1].name == "Skipped 1 files: token budget of 100 tokens reached"
+
+
+def test_dedupe_summary_comes_before_budget_notice(tmp_path):
+    root = str(tmp_path)
+    content = "shared content line\n" * 10
+    write(os.path.join(root, "one.txt"), content)
+    write(os.path.join(root, "two.txt"), content)
+    write(os.path.join(root, "sub", "big.txt"), "x" * 4000)
+    results = list(make_reader(deduplicate=True, token_budget=200).iter_results(root))
+    notices = [r.name for r in results if r.kind == ReadResult.NOTICE]
+    assert len(notices) == 2
+    assert notices[0].startswith("Deduplicated 1 files")
+    assert notices[1].startswith("Skipped 1 files")
@@ -0,0 +1,52 @@
+from plugins.prompt_manager_core import FileIndex, PromptGroup
+
+
+def make_group(group_id, files):
+    group = PromptGroup()
+    group.id = group_id
+    group.files = list(files)
+    group.file_metadata = {path: {"hash": f"{path}-{group_id}"} for path in files}
+    return group
+
+
+def test_metadata_comes_from_earliest_group():
+    index = FileIndex()
+    later = make_group(5, ["/a.py", "/b.py"])
+    earlier = make_group(2, ["/a.py"])
+    index.add_group(later)
+    index.add_group(earlier)
+    assert index.metadata("/a.py") == {"hash": "/a.py-2"}
+    assert index.lookup("/b.py") == (later, {"hash": "/b.py-5"})
+    assert index.metadata("/missing.py") is None
+    assert "/a.py" in index and len(index) == 2
+
+
+def test_groups_using_and_clear():
+    index = FileIndex()
+    first = make_group(1, ["/a.py"])
+    second = make_group(2, ["/a.py"])
+    index.add_group(first)
+    index.add_group(second)
+    assert index.groups_using("/a.py") == [first, second]
+    assert index.groups_using("/missing.py") == []
+    index.clear()
+    assert len(index) == 0 and index.lookup("/a.py") is None
+
+
+def test_seeded_metadata_covers_unloaded_groups():
+    index = FileIndex()
+    index.seed([("/a.py", 1, {"hash": "/a.py-1"}), ("/old.py", 2, {"hash": "/old.py-2"})])
+    loaded = make_group(7, ["/a.py", "/new.py"])
+    index.add_group(loaded)
+    # 已加载的分组更晚, 仍然返回数据库中最早的元数据
+    assert index.metadata("/a.py") == {"hash": "/a.py-1"}
+    assert index.lookup("/a.py") == (None, {"hash": "/a.py-1"})
+    assert index.metadata("/old.py") == {"hash": "/old.py-2"}
+    assert index.metadata("/new.py") == {"hash": "/new.py-7"}
+    assert index.groups_using("/old.py") == []
+
+    # 最早的分组加载后换成已加载的分组对象
+    earliest = make_group(1, ["/a.py"])
+    index.add_group(earliest)
+    assert index.lookup("/a.py") == (earliest, {"hash": "/a.py-1"})
+    assert index.groups_using("/a.py") == [loaded, earliest]
@@ -0,0 +1,73 @@
+import os
+
+from plugins.file_reader_core.filters import FilterMatcher, IgnoreContext, IgnoreRules
+
+
+def test_unanchored_pattern_matches_any_level():
+    rules = IgnoreRules(["*.log", "build/"])
+    assert rules.match("app.log", False)
+    assert rules.match("a/b/app.log", False)
+    assert rules.match("src/build", True)
+    # 以/结尾的模式只匹配目录
+    assert rules.match("src/build", False) is None
+    assert rules.match("app.py", False) is None
+
+
+def test_anchored_pattern_matches_relative_to_ignore_file():
+    rules = IgnoreRules(["/dist", "docs/*.html"])
+    assert rules.match("dist", True)
+    assert rules.match("src/dist", True) is None
+    assert rules.match("docs/index.html", False)
+    assert rules.match("docs/api/index.html", False) is None
+
+
+def test_double_star_and_character_classes():
+    rules = IgnoreRules(["a/**/z", "file?.[ch]", "[!x]y"])
+    assert rules.match("a/z", False)
+    assert rules.match("a/b/c/z", False)
+    assert rules.match("file1.c", False)
+    assert rules.match("file12.c", False) is None
+    assert rules.match("ay", False)
+    assert rules.match("xy", False) is None
+
+
+def test_negation_later_rule_wins():
+    rules = IgnoreRules(["*.log", "!keep.log", "# comment", "", "\\#literal"])
+    assert rules.match("debug.log", False)
+    assert rules.match("keep.log", False) is False
+    assert rules.match("#literal", False)
+
+
+def test_trailing_spaces_are_trimmed_unless_escaped():
+    rules = IgnoreRules(["tmp   ", "space\\ "])
+    assert rules.match("tmp", False)
+    assert rules.match("space ", False)
+
+
+def test_child_rules_override_parent(tmp_path):
+    root = str(tmp_path)
+    sub = os.path.join(root, "sub")
+    os.makedirs(sub)
+    with open(os.path.join(root, ".gitignore"), "w") as f:
+        f.write("*.txt\n")
+    with open(os.path.join(sub, ".gitignore"), "w") as f:
+        f.write("!keep.txt\n")
+
+    context = IgnoreContext(root).child(root)
+    child = context.child(sub)
+    assert context.is_ignored(os.path.join(root, "a.txt"), False)
+    assert child.is_ignored(os.path.join(sub, "a.txt"), False)
+    assert not child.is_ignored(os.path.join(sub, "keep.txt"), False)
+    assert not child.is_ignored(os.path.join(sub, "a.py"), False)
+    # 没有忽略文件的目录沿用父目录的规则
+    assert child.child(os.path.join(sub, "none")) is child
+
+
+def test_filter_matcher():
+    matcher = FilterMatcher({"Thumbs.db", "node_modules", "*.min.js"}, {".png"})
+    assert matcher.skip_file("image.PNG")
+    assert matcher.skip_file("Thumbs.db")
+    assert matcher.skip_file("app.min.js")
+    assert not matcher.skip_file("app.js")
+    assert matcher.skip_directory("node_modules")
+    assert not matcher.skip_directory("src")
@@ -0,0 +1,234 @@
+import os
+import json
+import base64
+
+import pytest
+
+from plugins.prompt_manager_core import ArchiveStore, BlobStore, HistoryStore, PromptGroup
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    yield store
+    store.close()
+
+
+def add_group(store, prompts, files=(), timestamp="2024-01-01 10:00:00"):
+    group = PromptGroup()
+    group.timestamp = timestamp
+    with store.conn:
+        store.add_group(group)
+        for text in prompts:
+            store.add_prompt(group, text, timestamp)
+        for path in files:
+            store.add_file(group, path, {"hash": path + "-hash", "size": 1, "name": os.path.basename(path)},
+                           timestamp)
+    return group
+
+
+def test_groups_round_trip(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    store = HistoryStore(db_path)
+    assert store.is_empty()
+    add_group(store, ["first", "second"], ["/src/a.py"], "2024-01-01 10:00:00")
+    add_group(store, ["third"], timestamp="2024-01-02 10:00:00")
+    store.close()
+
+    store = HistoryStore(db_path)
+    groups = store.load_groups()
+    assert [(g.id, g.timestamp, g.prompts, g.files) for g in groups] == [
+        (1, "2024-01-01 10:00:00", ["first", "second"], ["/src/a.py"]),
+        (2, "2024-01-02 10:00:00", ["third"], []),
+    ]
+    assert groups[0].file_metadata["/src/a.py"] == {"hash": "/src/a.py-hash", "size": 1, "name": "a.py"}
+    store.close()
+
+
+def test_migrate_json_imports_once(tmp_path, store):
+    json_path = str(tmp_path / "prompt_history.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump([{
+            "prompts": ["old prompt"],
+            "files": ["/src/hello.py"],
+            "file_metadata": {"/src/hello.py": {"hash": "h", "size": 3, "name": "hello.py"}},
+            "timestamp": "2023-05-01 08:00:00",
+        }], f)
+
+    assert store.migrate_json(json_path) == 1
+    assert not os.path.exists(json_path)
+    assert os.path.exists(json_path + ".migrated")
+    group = store.load_groups()[0]
+    assert group.prompts == ["old prompt"]
+    assert group.timestamp == "2023-05-01 08:00:00"
+    assert group.file_metadata["/src/hello.py"]["hash"] == "h"
+    # 数据库中已有数据时不再导入
+    os.replace(json_path + ".migrated", json_path)
+    assert store.migrate_json(json_path) == 0
+
+
+def test_migrate_inline_blobs(tmp_path, store):
+    json_path = str(tmp_path / "prompt_history.json")
+    content = b"print('hello')\n"
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump([{
+            "prompts": ["old prompt"],
+            "files": ["/src/hello.py"],
+            "file_metadata": {"/src/hello.py": {"content": base64.b64encode(content).decode("ascii"),
+                                                "size": len(content), "name": "hello.py"}},
+            "timestamp": "2023-05-01 08:00:00",
+        }], f)
+    store.migrate_json(json_path)
+
+    blobs = BlobStore(str(tmp_path / "blobs"))
+    assert store.migrate_inline_blobs(blobs) == 1
+    assert store.migrate_inline_blobs(blobs) == 0
+    metadata = store.load_groups()[0].file_metadata["/src/hello.py"]
+    assert metadata == {"hash": metadata["hash"], "size": len(content), "name": "hello.py"}
+    with blobs.open(metadata["hash"]) as f:
+        assert f.read() == content
+    assert store.referenced_blobs() == {metadata["hash"]}
+
+
+def test_load_groups_pages_from_newest(store):
+    ids = [add_group(store, [f"prompt {index}"], [f"/src/f{index}.py"]).id for index in range(5)]
+    assert ids == [1, 2, 3, 4, 5]
+
+    page = store.load_groups(limit=2)
+    assert [g.id for g in page] == [4, 5]
+    assert page[0].prompts == ["prompt 3"]
+    assert page[0].files == ["/src/f3.py"]
+
+    older = store.load_groups(limit=2, before_id=page[0].id)
+    assert [g.id for g in older] == [2, 3]
+    assert store.has_groups_before(2)
+    assert not store.has_groups_before(1)
+    assert store.load_groups(limit=2, before_id=1) == []
+
+
+def test_search_filters(store):
+    add_group(store, ["refactor the parser", "ok"], ["/src/parser.py"], "2024-01-01 10:00:00")
+    add_group(store, ["parser error messages"], ["/src/errors.py"], "2024-02-01 10:00:00")
+
+    assert {text for _, text, _ in store.search("parser")} == {"refactor the parser", "parser error messages"}
+    # 短于3个字符的词用 LIKE 匹配
+    assert [text for _, text, _ in store.search("ok")] == ["ok"]
+    assert [text for _, text, _ in store.search("parser", file_name="errors")] == ["parser error messages"]
+    assert [text for _, text, _ in store.search("parser", since="2024-01-15")] == ["parser error messages"]
+    assert [text for _, text, _ in store.search("parser", until="2024-01-01")] == ["refactor the parser"]
+    assert store.search("100%") == []
+
+
+def test_short_cjk_terms_use_bigram_index(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    add_group(store, ["优化数据库查询", "数据"])
+    later = add_group(store, ["修改界面布局", "数据库连接 timeout"])
+
+    # 两个字的中文词通过二元组索引匹配, 可以和更长的词组合
+    assert [text for _, text, _ in store.search("数据")] == ["数据库连接 timeout", "数据", "优化数据库查询"]
+    assert [text for _, text, _ in store.search("界面 布局")] == ["修改界面布局"]
+    assert [text for _, text, _ in store.search("数据 timeout")] == ["数据库连接 timeout"]
+    plan = store.conn.execute("EXPLAIN QUERY PLAN SELECT rowid FROM prompts_bigram WHERE prompts_bigram MATCH ?",
+                              ('"数据"',)).fetchall()
+    assert any("VIRTUAL TABLE INDEX" in row[-1] for row in plan)
+
+    # 删除分组时同时从二元组索引中删除
+    with store.conn:
+        store.delete_groups([later.id])
+    assert [text for _, text, _ in store.search("数据")] == ["数据", "优化数据库查询"]
+    assert store.search("界面") == []
+    store.close()
+
+    # 旧数据库第一次打开时为已有的提示词建立二元组索引
+    reopened = HistoryStore(store.db_path)
+    with reopened.conn:
+        reopened.conn.execute("DROP TABLE prompts_bigram")
+    reopened.close()
+    reopened = HistoryStore(store.db_path)
+    assert [text for _, text, _ in reopened.search("查询")] == ["优化数据库查询"]
+    reopened.close()
+
+
+def test_find_file_metadata_returns_earliest(store):
+    add_group(store, ["a"], ["/src/a.py"])
+    group = add_group(store, ["b"])
+    with store.conn:
+        store.add_file(group, "/src/a.py", {"hash": "newer", "size": 2, "name": "a.py"})
+    assert store.find_file_metadata("/src/a.py")["hash"] == "/src/a.py-hash"
+    assert store.find_groups_using("/src/a.py") == [1, 2]
+    assert store.find_file_metadata("/src/missing.py") is None
+
+
+def test_earliest_file_metadata_per_path(store):
+    later = add_group(store, ["later"], ["/src/a.py", "/src/b.py"])
+    with store.conn:
+        # 恢复的分组编号更小, 记录却写在后面
+        store.restore_group({"id": 0, "timestamp": "2023-01-01 10:00:00", "prompts": [],
+                             "files": [{"path": "/src/a.py", "metadata": {"hash": "restored"},
+                                        "created_at": "2023-01-01 10:00:00"}]})
+    rows = sorted(store.earliest_file_metadata())
+    assert rows == [("/src/a.py", 0, {"hash": "restored"}),
+                    ("/src/b.py", later.id, {"hash": "/src/b.py-hash", "size": 1, "name": "b.py"})]
+    assert store.find_file_metadata("/src/a.py") == {"hash": "restored"}
+
+
+def test_group_ids_are_not_reused_after_delete(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    store = HistoryStore(db_path)
+    for index in range(3):
+        add_group(store, [f"prompt {index}"])
+    with store.conn:
+        store.delete_groups([2, 3])
+    store.close()
+
+    store = HistoryStore(db_path)
+    assert store.reserve_group_id(PromptGroup()) == 4
+    with store.conn:
+        store.ensure_next_group_id(10)
+    store.close()
+
+    store = HistoryStore(db_path)
+    assert add_group(store, ["later"]).id == 10
+    store.close()
+
+
+def test_archive_and_restore(tmp_path, store):
+    archive = ArchiveStore(str(tmp_path / "archive"))
+    for index in range(4):
+        add_group(store, [f"prompt {index}"], timestamp=f"2024-01-0{index + 1} 10:00:00")
+    assert store.archive_groups(archive, keep_groups=2) == 2
+    assert [g.id for g in store.load_groups()] == [3, 4]
+    assert archive.max_group_id() == 2
+    assert [record["id"] for record in archive.iter_records()] == [1, 2]
+
+    store.restore_group(archive.find_record(1))
+    restored = store.load_groups()[0]
+    assert restored.id == 1
+    assert restored.prompts == ["prompt 0"]
+    # 恢复的分组不再被归档
+    assert 1 not in store.groups_to_archive(keep_groups=1)
+
+    # 编号已被其它分组使用时拒绝恢复
+    conflicting = dict(archive.find_record(2), id=3)
+    with pytest.raises(ValueError):
+        store.restore_group(conflicting)
+    assert store.load_groups()[1].prompts == ["prompt 2"]
+
+
+def test_archive_skips_excluded_groups(tmp_path, store):
+    archive = ArchiveStore(str(tmp_path / "archive"))
+    for index in range(4):
+        add_group(store, [f"prompt {index}"])
+    # 当前分组或还有记录没有写入的分组不归档
+    assert store.groups_to_archive(keep_groups=1, exclude={2}) == [1, 3]
+    assert store.archive_groups(archive, keep_groups=1, exclude={1, 3}) == 1
+    assert [g.id for g in store.load_groups()] == [1, 3, 4]
+
+
+def test_load_groups_page_with_id_gaps(store):
+    for index in range(6):
+        add_group(store, [f"prompt {index}"])
+    with store.conn:
+        store.delete_groups([2, 4])
+    page = store.load_groups(limit=2, before_id=6)
+    assert [(g.id, g.prompts) for g in page] == [(3, ["prompt 2"]), (5, ["prompt 4"])]
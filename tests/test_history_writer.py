@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+from plugins.prompt_manager_core import HistoryStore, HistoryWriter, PromptGroup
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "history.db")
+    # 先建好表, 写入线程和测试各自打开连接
+    HistoryStore(path).close()
+    return path
+
+
+def make_group(group_id, timestamp="2024-01-01 10:00:00"):
+    group = PromptGroup()
+    group.id = group_id
+    group.timestamp = timestamp
+    return group
+
+
+def load(db_path):
+    store = HistoryStore(db_path)
+    try:
+        return store.load_groups()
+    finally:
+        store.close()
+
+
+def test_flush_writes_queued_records_in_one_batch(db_path):
+    writes = []
+    writer = HistoryWriter(db_path, delay=60, max_delay=60,
+                           on_write=lambda duration, count, error: writes.append((count, error)))
+    try:
+        group = make_group(1)
+        writer.add_group(group)
+        writer.add_prompt(group, "first")
+        writer.add_file(group, "/src/a.py", {"hash": "h", "size": 1, "name": "a.py"})
+        assert writer.pending_writes == 3
+        assert writer.flush(timeout=10)
+        assert writer.pending_writes == 0
+        assert writes == [(3, None)]
+        assert writer.metrics()["write_count"] == 1
+    finally:
+        writer.close()
+
+    groups = load(db_path)
+    assert [(g.id, g.prompts, g.files) for g in groups] == [(1, ["first"], ["/src/a.py"])]
+
+
+def test_pending_groups_lists_unwritten_groups(db_path):
+    writer = HistoryWriter(db_path, delay=60, max_delay=60)
+    try:
+        first, second = make_group(1), make_group(2)
+        writer.add_group(first)
+        writer.add_prompt(second, "later")
+        writer.delete_recall_entries([5])
+        assert writer.pending_groups() == {1, 2}
+        assert writer.flush(timeout=10)
+        assert writer.pending_groups() == set()
+    finally:
+        writer.close()
+
+
+def test_request_flush_does_not_wait(db_path):
+    written = threading.Event()
+    writer = HistoryWriter(db_path, delay=60, max_delay=60, on_write=lambda *args: written.set())
+    try:
+        assert not writer.request_flush()
+        writer.add_group(make_group(1))
+        assert writer.request_flush()
+        assert written.wait(10)
+        assert not writer.request_flush()
+    finally:
+        writer.close()
+    assert [g.id for g in load(db_path)] == [1]
+
+
+def test_failing_record_is_dropped_after_retries(db_path):
+    errors = []
+    writer = HistoryWriter(db_path, delay=0.01, max_delay=0.02, max_attempts=2, on_error=errors.extend)
+    try:
+        group = make_group(1)
+        writer.add_group(group)
+        # 重复的分组编号违反主键约束, 整批事务都会失败
+        writer.add_group(make_group(1))
+        writer.add_prompt(group, "kept")
+        assert not writer.flush(timeout=10)
+        assert writer.metrics()["last_error"] is not None
+        # 再失败一次后逐条写入, 只丢弃出错的记录
+        for _ in range(100):
+            if not writer.pending_writes:
+                break
+            writer.flush(timeout=0.1)
+        assert writer.pending_writes == 0
+        assert [op for op, _ in errors] == ["add_group"]
+        assert writer.metrics()["dropped_writes"] == 1
+        # 之后的写入不受影响
+        writer.add_prompt(group, "later")
+        assert writer.flush(timeout=10)
+    finally:
+        writer.close()
+    assert load(db_path)[0].prompts == ["kept", "later"]
+
+
+def test_close_writes_remaining_records(db_path):
+    writer = HistoryWriter(db_path, delay=60, max_delay=60)
+    group = make_group(1)
+    writer.add_group(group)
+    writer.add_group(make_group(1))
+    writer.add_prompt(group, "saved on close")
+    writer.close(timeout=10)
+
+    with pytest.raises(RuntimeError):
+        writer.add_prompt(group, "too late")
+    assert load(db_path)[0].prompts == ["saved on close"]
+    assert len(writer.dropped) == 1
@@ -0,0 +1,131 @@
+from plugins.prompt_manager_core.paste import PASTE_FILE, PASTE_TEXT, FakeBackend, PasteDispatcher, PasteRequest
+
+
+class FakeScheduler:
+    """代替 QTimer.singleShot: 记录延迟执行的回调, 由测试按顺序执行并推进时钟"""
+    def __init__(self):
+        self.now = 0.0
+        self.pending = []
+
+    def __call__(self, delay, callback):
+        self.pending.append((delay, callback))
+
+    def clock(self):
+        return self.now
+
+    def run_all(self):
+        while self.pending:
+            delay, callback = self.pending.pop(0)
+            self.now += delay / 1000
+            callback()
+
+
+def make_dispatcher(backend):
+    scheduler = FakeScheduler()
+    dispatcher = PasteDispatcher(scheduler, clock=scheduler.clock)
+    dispatcher.register(backend)
+    return dispatcher, scheduler
+
+
+def test_queued_sends_run_in_order():
+    backend = FakeBackend(delays=(100, 50))
+    dispatcher, scheduler = make_dispatcher(backend)
+    finished = []
+    for index in range(3):
+        dispatcher.send("fake", PasteRequest(f"text {index}", PASTE_TEXT, lambda r: finished.append(r.payload)))
+    dispatcher.send("fake", PasteRequest("a.txt", PASTE_FILE, lambda r: finished.append(r.payload)))
+
+    # 第一个请求在等待定时器, 其余的在排队
+    assert dispatcher.pending == 4
+    assert backend.sent == []
+    scheduler.run_all()
+    assert backend.sent == [(PASTE_TEXT, "text 0"), (PASTE_TEXT, "text 1"), (PASTE_TEXT, "text 2"),
+                            (PASTE_FILE, "a.txt")]
+    assert finished == ["text 0", "text 1", "text 2", "a.txt"]
+    assert dispatcher.pending == 0
+
+
+def test_send_without_delay_completes_immediately():
+    backend = FakeBackend()
+    dispatcher, _ = make_dispatcher(backend)
+    request = dispatcher.send("fake", PasteRequest("hello"))
+    assert request.ok
+    assert backend.sent == [(PASTE_TEXT, "hello")]
+
+
+def test_unknown_target_fails_without_queueing():
+    dispatcher, _ = make_dispatcher(FakeBackend())
+    results = []
+    request = dispatcher.send("missing", PasteRequest("hello", callback=results.append))
+    assert results == [request]
+    assert not request.ok
+    assert "missing" in request.error
+    assert dispatcher.pending == 0
+    assert dispatcher.stats()["failed"] == 1
+
+
+def test_check_error_fails_request():
+    backend = FakeBackend(error="no window")
+    dispatcher, _ = make_dispatcher(backend)
+    request = dispatcher.send("fake", PasteRequest("hello"))
+    assert request.error == "no window"
+    assert backend.sent == []
+
+
+def test_failing_step_does_not_block_queue():
+    class BrokenBackend(FakeBackend):
+        name = "broken"
+
+        def steps(self, request):
+            def fail():
+                raise OSError("window closed")
+            return [(10, fail)]
+
+    backend = FakeBackend(delays=(10,))
+    dispatcher, scheduler = make_dispatcher(backend)
+    dispatcher.register(BrokenBackend())
+    first = dispatcher.send("broken", PasteRequest("lost"))
+    second = dispatcher.send("fake", PasteRequest("kept"))
+    scheduler.run_all()
+
+    assert first.error == "window closed"
+    assert second.ok
+    assert backend.sent == [(PASTE_TEXT, "kept")]
+    stats = dispatcher.stats()
+    assert stats["sent"] == 1
+    assert stats["failed"] == 1
+
+
+def test_failing_callback_does_not_block_queue(capsys):
+    def broken_callback(request):
+        raise RuntimeError("callback failed")
+
+    backend = FakeBackend(delays=(10,))
+    dispatcher, scheduler = make_dispatcher(backend)
+    first = dispatcher.send("fake", PasteRequest("first", callback=broken_callback))
+    second = dispatcher.send("fake", PasteRequest("second", callback=broken_callback))
+    scheduler.run_all()
+
+    assert first.ok and second.ok
+    assert backend.sent == [(PASTE_TEXT, "first"), (PASTE_TEXT, "second")]
+    assert dispatcher.pending == 0
+    assert "callback failed" in capsys.readouterr().out
+
+
+def test_latency_includes_queue_wait():
+    backend = FakeBackend(delays=(100,))
+    dispatcher, scheduler = make_dispatcher(backend)
+    first = dispatcher.send("fake", PasteRequest("one"))
+    second = dispatcher.send("fake", PasteRequest("two"))
+    scheduler.run_all()
+
+    assert first.latency == 0.1
+    assert first.duration == 0.1
+    # 第二个请求排队等待了第一个请求的执行时间
+    assert abs(second.latency - 0.2) < 1e-9
+    assert abs(second.duration - 0.1) < 1e-9
+    stats = dispatcher.stats()
+    assert stats["last_latency"] == second.latency
+    assert stats["max_latency"] == second.latency
+    assert stats["median_latency"] == second.latency
+    assert stats["pending"] == 0
@@ -0,0 +1,95 @@
+import array
+
+from plugins.prompt_manager_core import HistoryStore, PromptGroup, RecallIndex, build_recall_index
+from plugins.prompt_manager_core.recall import (HALF_LIFE_SECONDS, LSH_BUCKET_LIMIT, MINHASH_PERMUTATIONS,
+                                                PREFIX_MAX_CHARS, minhash_signature)
+
+LONG_PROMPT = "Please review this function and suggest improvements to the error handling"
+
+
+def test_whitespace_variants_merge_into_one_entry():
+    index = RecallIndex()
+    entry, variant = index.record("explain  this code", when=0)
+    assert variant is not None
+    # 哈希按规范化后的文本计算, 只差空白的提示词不产生新的变体
+    same, variant = index.record("  explain this code ", when=10)
+    assert same is entry and variant is None
+    assert entry.count == 2
+    assert entry.text == "  explain this code "
+    assert len(index) == 1
+
+
+def test_near_duplicates_merge_and_keep_latest_text():
+    index = RecallIndex()
+    first, _ = index.record(LONG_PROMPT, when=0)
+    edited, _ = index.record(LONG_PROMPT + ".", when=10)
+    assert edited is first
+    assert first.text == LONG_PROMPT + "."
+    other, _ = index.record("Translate the following paragraph into English", when=20)
+    assert other is not first
+    assert len(index) == 2
+
+
+def test_suggest_orders_by_frecency():
+    index = RecallIndex()
+    index.record("write unit tests", when=0)
+    for when in range(5):
+        index.record("write documentation", when=when)
+    index.record("refactor module", when=0)
+    assert [e.text for e in index.suggest("WRITE")] == ["write documentation", "write unit tests"]
+    assert index.suggest("missing") == []
+    # 较新的一次使用可以超过很久以前的多次使用
+    index.record("write unit tests", when=10 * HALF_LIFE_SECONDS)
+    assert index.suggest("write")[0].text == "write unit tests"
+    long_text = "x" * PREFIX_MAX_CHARS + " tail"
+    index.record(long_text, when=0)
+    assert [e.text for e in index.suggest(long_text)] == [long_text]
+    assert index.suggest("x" * PREFIX_MAX_CHARS + " other") == []
+
+
+def test_prune_removes_lowest_ranked_entries():
+    index = RecallIndex(max_entries=10)
+    for number in range(12):
+        index.record(f"prompt number {number}", when=number * 3600)
+    assert len(index) == 12  # 没有超出 PRUNE_SLACK 时不删除
+    for number in range(12, 20):
+        index.record(f"prompt number {number}", when=number * 3600)
+    removed = index.prune()
+    assert len(removed) == 10
+    assert len(index) == 10
+    assert {e.text for e in index.entries.values()} == {f"prompt number {n}" for n in range(10, 20)}
+    assert index.suggest("prompt number 0") == []
+    # 删除的条目的原文再次使用时成为新的条目
+    entry, variant = index.record("prompt number 0", when=0)
+    assert entry.id not in removed and variant is not None
+
+
+def test_lsh_buckets_are_bounded():
+    signature = array.array('I', range(MINHASH_PERMUTATIONS)).tobytes()
+    rows = [(entry_id, f"prompt {entry_id}", 1, float(entry_id), 0.0, signature) for entry_id in range(1, 50)]
+    index = RecallIndex()
+    index.load(rows, [])
+    assert index.buckets
+    assert all(len(bucket) <= LSH_BUCKET_LIMIT for bucket in index.buckets.values())
+    assert index.find_similar(array.array('I', range(MINHASH_PERMUTATIONS))) is not None
+    assert index.find_similar(minhash_signature(LONG_PROMPT)) is None
+
+
+def test_build_recall_index_backfills_then_loads(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    group = PromptGroup()
+    with store.conn:
+        store.add_group(group)
+        for number in range(6):
+            store.add_prompt(group, f"saved prompt {number}", f"2024-01-01 10:00:0{number}")
+        store.add_prompt(group, "saved prompt 5", "2024-01-01 10:00:09")
+
+    built = build_recall_index(store, backfill=100, max_entries=4)
+    assert len(built) == 4
+    assert built.suggest("saved")[0].text == "saved prompt 5"
+
+    loaded = build_recall_index(store, max_entries=4)
+    assert {e.id: e.count for e in loaded.entries.values()} == {e.id: e.count for e in built.entries.values()}
+    entry, variant = loaded.record("saved prompt 5")
+    assert variant is None and entry.count == 3
+    store.close()
@@ -0,0 +1,33 @@
+from plugins.prompt_manager_core import templates
+from plugins.prompt_manager_core.templates import compile_template
+
+
+def test_placeholders_and_variables():
+    template = compile_template("Review {{language}} code:\n{{dump:src/main.py}}\n{{ language }} {{files}}")
+    assert template.placeholders == [("language", None), ("dump", "src/main.py"), ("files", None)]
+    assert template.variables == ["language"]
+
+
+def test_render_resolves_each_placeholder_once():
+    calls = []
+
+    def resolve(name, arg):
+        calls.append((name, arg))
+        return {"language": "Python", "dump": "print()"}.get(name)
+
+    template = compile_template("{{language}} {{language}} {{dump:a.py}} {{unknown:x}}")
+    assert template.render(resolve) == "Python Python print() {{unknown:x}}"
+    assert calls == [("language", None), ("dump", "a.py"), ("unknown", "x")]
+
+
+def test_compiled_templates_are_cached_by_content(monkeypatch):
+    monkeypatch.setattr(templates, "TEMPLATE_CACHE_SIZE", 2)
+    monkeypatch.setattr(templates, "_cache", templates.OrderedDict())
+    first = compile_template("a {{x}}")
+    assert compile_template("a {{x}}") is first
+    compile_template("b {{x}}")
+    compile_template("a {{x}}")
+    compile_template("c {{x}}")
+    # 最近使用的保留, 最久未使用的被淘汰
+    assert compile_template("a {{x}}") is first
+    assert list(templates._cache) == [templates.template_digest("c {{x}}"), templates.template_digest("a {{x}}")]
@@ -0,0 +1,108 @@
+import os
+import shutil
+
+import pytest
+
+from plugins.file_reader_core import DumpDocument, FilterMatcher, FolderReader, LiveDump
+
+
+def write(path, text, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def live(tmp_path):
+    root = str(tmp_path)
+    write(os.path.join(root, "a.txt"), "alpha")
+    write(os.path.join(root, "sub", "b.txt"), "beta")
+    reader = FolderReader(FilterMatcher(set(), set()), deduplicate=True)
+    live = LiveDump(DumpDocument(), reader, root)
+    for result in reader.iter_results(root):
+        live.append(result)
+    yield live
+    live.document.close()
+
+
+def keys(live):
+    return [section.key for section in live.document.sections]
+
+
+def test_modified_file_is_replaced(live):
+    path = os.path.join(live.folder_path, "a.txt")
+    write(path, "alpha changed", mtime=10 ** 9)
+    changes = live.refresh_file(path)
+    assert [op for op, _, _ in changes] == ["replace"]
+    assert "alpha changed" in live.document.text()
+    # 没有变化时不重新读取
+    assert live.refresh_file(path) == []
+
+
+def test_deleted_file_is_removed(live):
+    path = os.path.join(live.folder_path, "a.txt")
+    os.remove(path)
+    changes = live.refresh_file(path)
+    assert [op for op, _, _ in changes] == ["remove"]
+    assert path not in keys(live)
+    assert path not in live.file_stats
+
+
+def test_new_file_is_added_to_its_directory(live):
+    sub = os.path.join(live.folder_path, "sub")
+    path = os.path.join(sub, "c.txt")
+    write(path, "gamma")
+    changes = live.refresh_file(path)
+    assert [op for op, _, _ in changes] == ["insert"]
+    assert keys(live).index(path) == keys(live).index(os.path.join(sub, "b.txt")) + 1
+
+
+def test_new_subdirectory_is_read_separately(live):
+    sub = os.path.join(live.folder_path, "sub")
+    new_dir = os.path.join(sub, "new")
+    write(os.path.join(new_dir, "d.txt"), "delta")
+    assert live.refresh_directory(sub) == []
+    path, context = live.take_pending_directory()
+    assert path == new_dir
+    assert live.take_pending_directory() is None
+
+    changes = live.insert_directory(path, list(live.reader.iter_results(path, context=context)))
+    assert [op for op, _, _ in changes] == ["insert", "insert"]
+    assert keys(live)[-2:] == [new_dir, os.path.join(new_dir, "d.txt")]
+    # 已经插入的目录再次到达的结果被忽略
+    assert live.insert_directory(path, []) == []
+
+
+def test_removed_subdirectory_removes_subtree(live):
+    sub = os.path.join(live.folder_path, "sub")
+    shutil.rmtree(sub)
+    changes = live.refresh_directory(live.folder_path)
+    assert [op for op, _, _ in changes] == ["remove", "remove"]
+    assert keys(live) == [live.folder_path, os.path.join(live.folder_path, "a.txt")]
+    assert sub not in live.directories
+
+
+def test_reference_is_promoted_when_original_changes(live):
+    content = "duplicated content " * 10
+    first = os.path.join(live.folder_path, "sub", "first.txt")
+    second = os.path.join(live.folder_path, "sub", "second.txt")
+    write(first, content)
+    write(second, content)
+    live.refresh_directory(os.path.join(live.folder_path, "sub"))
+    original, duplicate = sorted((first, second), key=keys(live).index)
+    assert live.duplicates == {duplicate: original}
+
+    write(original, "edited " * 20, mtime=10 ** 9)
+    changes = live.refresh_file(original)
+    assert [op for op, _, _ in changes] == ["replace", "replace"]
+    assert live.duplicates == {}
+    text = live.document.section_text(live.document.find_section(duplicate))
+    assert content in text and "Same content as" not in text
+
+    os.remove(duplicate)
+    write(original, content, mtime=2 * 10 ** 9)
+    live.refresh_file(duplicate)
+    live.refresh_file(original)
+    assert live.duplicates == {}